@@ -0,0 +1,87 @@
+"""
+Compare the in-memory and the file-backed streaming paths of Audio2FaceStream.
+
+Both paths build the full PushAudioStream request generator (without a server)
+from a synthetic WAV file, measuring throughput and peak Python memory.
+
+Usage: python benchmarks/bench_audio_file.py [duration_in_minutes]
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import soundfile
+
+from audio2face_api.A2F import Audio2FaceStream
+from audio2face_api.AudioFile import iter_audio_file_chunks
+
+SAMPLE_RATE = 16000
+CHUNCK_SIZE = 4000
+
+
+def write_synthetic_wav(path, duration_s):
+    # Written block by block so the benchmark itself stays light
+    with soundfile.SoundFile(
+        path, mode="w", samplerate=SAMPLE_RATE, channels=1, subtype="PCM_16"
+    ) as f:
+        block = SAMPLE_RATE * 10
+        t = np.arange(block) / SAMPLE_RATE
+        tone = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+        for _ in range(int(duration_s // 10)):
+            f.write(tone)
+
+
+def consume(generator):
+    n_bytes = 0
+    for request in generator:
+        n_bytes += len(request.audio_data)
+    return n_bytes
+
+
+def run(label, make_generator):
+    tracemalloc.start()
+    start = time.perf_counter()
+    n_bytes = consume(make_generator())
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    audio_s = n_bytes / 4 / SAMPLE_RATE
+    print(
+        f"{label:>12}: {elapsed:6.2f} s, {audio_s / elapsed:8.0f}x realtime, "
+        f"peak memory {peak / 2**20:8.2f} MiB"
+    )
+
+
+def bench_audio_file(duration_min=30):
+    a2f = Audio2FaceStream(
+        grpc_url="localhost:50051",
+        chunk_size=CHUNCK_SIZE,
+        block_until_playback_is_finished=False,
+        use_livelink=False,
+        scene_path="./assets/mark_solved_streaming.usd",
+    )
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "long.wav")
+        write_synthetic_wav(path, duration_min * 60)
+        print(f"Audio: {duration_min} min at {SAMPLE_RATE} Hz, chunk {CHUNCK_SIZE}")
+
+        def in_memory():
+            data, samplerate = soundfile.read(path, dtype="float32")
+            return a2f._make_request_generator(a2f._iter_audio_chunks(data), samplerate)
+
+        def from_file():
+            return a2f._make_request_generator(
+                iter_audio_file_chunks(path, CHUNCK_SIZE), SAMPLE_RATE
+            )
+
+        run("in-memory", in_memory)
+        run("file-backed", from_file)
+
+
+if __name__ == "__main__":
+    bench_audio_file(float(sys.argv[1]) if len(sys.argv) > 1 else 30)
@@ -0,0 +1,57 @@
+"""
+Single-core decode throughput of LiveLink payloads: the JSON path of
+LiveLinkListener against WeightsDecoder, which only parses the weights.
+
+The weights path is about 1.3-1.5x faster with 52 or 200 blendshapes: it
+skips the names, but both paths convert every weight to a float.
+
+Usage: python benchmarks/bench_decoder.py [n_frames] [n_blendshapes]
+"""
+
+import sys
+import time
+
+import numpy as np
+
+from audio2face_api.Decoder import WeightsDecoder
+from audio2face_api.LiveLink import LiveLinkListener
+from audio2face_api.LiveLinkSender import make_synthetic_blocks
+
+
+def run(label, decode, blocks):
+    start = time.perf_counter()
+    for block in blocks:
+        decode(block)
+    elapsed = time.perf_counter() - start
+    fps = len(blocks) / elapsed
+    print(f"{label:>14}: {fps:10.0f} frames/s, {1e6 / fps:6.2f} us/frame")
+    return fps
+
+
+def bench_decoder(n_frames=50000, n_blendshapes=52):
+    blocks = make_synthetic_blocks(n_frames, n_blendshapes)
+    print(f"{n_frames} frames of {n_blendshapes} blendshapes ({len(blocks[0])} bytes)")
+
+    listener = LiveLinkListener()
+    decoder = WeightsDecoder()
+
+    # Both paths must agree
+    for block in blocks[:2]:
+        row = decoder.decode_block(block)
+        frame = listener._unpack_block(block)
+        assert np.allclose(row, frame["Audio2Face"]["Facial"]["Weights"])
+        assert decoder.names == frame["Audio2Face"]["Facial"]["Names"]
+
+    json_fps = run("json", listener._unpack_block, blocks)
+    weights_fps = run("weights", decoder.decode_block, blocks)
+    print(
+        f"Speed-up: {weights_fps / json_fps:.2f}x "
+        f"({decoder.fast_decodes} fast / {decoder.full_decodes} full decodes)"
+    )
+
+
+if __name__ == "__main__":
+    bench_decoder(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 52,
+    )
@@ -0,0 +1,64 @@
+"""
+Benchmark suite of the LiveLink receive path (LiveLinkListener + decoder + Buffer).
+
+Frames are sent by a synthetic LiveLink sender over loopback. For each decoder,
+buffer, sender fps and blendshape count, the suite measures frames/sec, p50/p99
+decode-to-consumer latency and memory per frame, and saves them as JSON.
+
+Usage:
+    python benchmarks/bench_livelink.py --output results.json
+    python benchmarks/bench_livelink.py --output new.json --compare old.json
+"""
+
+import argparse
+import logging
+import sys
+
+from audio2face_api.Benchmark import compare_results, run_suite, save_results
+
+
+def bench_livelink():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--output", default="bench_livelink.json")
+    parser.add_argument("--compare", help="Baseline results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--max-speed-frames", type=int, default=20000)
+    parser.add_argument(
+        "--fps", type=int, nargs="+", default=[30, 60, 120, 0], help="0: max speed"
+    )
+    parser.add_argument("--blendshapes", type=int, nargs="+", default=[52, 200])
+    args = parser.parse_args()
+
+    results = run_suite(
+        fps_list=[fps or None for fps in args.fps],
+        blendshape_counts=args.blendshapes,
+        duration=args.duration,
+        max_speed_frames=args.max_speed_frames,
+    )
+    save_results(results, args.output)
+
+    print(
+        f"{'decoder':>8} {'buffer':>8} {'fps':>5} {'shapes':>6} {'frames/s':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'B/frame':>8}"
+    )
+    for r in results["results"]:
+        print(
+            f"{r['decoder']:>8} {r['buffer']:>8} {r['fps'] or 'max':>5} "
+            f"{r['n_blendshapes']:>6} {r['frames_per_sec']:>10.0f} "
+            f"{r['latency_p50_ms']:>8.3f} {r['latency_p99_ms']:>8.3f} "
+            f"{r['memory_per_frame_bytes']:>8.0f}"
+        )
+    print(f"Results saved to {args.output}")
+
+    if args.compare:
+        regressions = compare_results(args.compare, args.output, args.tolerance)
+        for key, metric, old, new in regressions:
+            print(f"REGRESSION {key} {metric}: {old:.3f} -> {new:.3f}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    bench_livelink()
@@ -0,0 +1,64 @@
+"""
+Frames/sec reached by LiveLinkListener with each ack policy, against a local
+synthetic LiveLink sender over loopback.
+
+Usage: python benchmarks/bench_livelink_ack.py [n_frames]
+"""
+
+import multiprocessing
+import sys
+import time
+
+from audio2face_api.Buffer import Buffer
+from audio2face_api.LiveLink import (
+    ACK_BATCH,
+    ACK_NONE,
+    ACK_PER_FRAME,
+    LiveLinkListener,
+)
+from audio2face_api.LiveLinkSender import SyntheticLiveLinkSender, make_synthetic_blocks
+
+
+def send(port, blocks, wait_for_ack):
+    sender = SyntheticLiveLinkSender("localhost", port)
+    sender.connect(wait_for_ack=wait_for_ack)
+    sender.send_blocks(blocks, wait_for_ack=wait_for_ack)
+    sender.close()
+
+
+def run(label, blocks, ack_policy, wait_for_ack=False):
+    listener = LiveLinkListener(
+        ip="localhost", port=0, buffer=Buffer(), ack_policy=ack_policy
+    )
+    listener.daemon = True  # The accept timeout would delay the exit
+    listener.start()
+    listener.wait_until_ready(5.0)
+
+    # The sender runs in its own process, so it does not share the GIL
+    start = time.perf_counter()
+    sender = multiprocessing.Process(
+        target=send, args=(listener.port, blocks, wait_for_ack)
+    )
+    sender.start()
+    while listener.frames_received < len(blocks):
+        time.sleep(0.0005)
+    elapsed = time.perf_counter() - start
+    sender.join()
+    listener.stop()
+    print(
+        f"{label:>28}: {len(blocks) / elapsed:10.0f} frames/s, "
+        f"{listener.acks_sent:6d} acks sent"
+    )
+
+
+def bench_livelink_ack(n_frames=20000):
+    blocks = make_synthetic_blocks(n_frames)
+    print(f"{n_frames} frames of {len(blocks[0])} bytes")
+    run("frame, stop-and-wait sender", blocks, ACK_PER_FRAME, wait_for_ack=True)
+    run("frame", blocks, ACK_PER_FRAME)
+    run("batch (10 frames / 50 ms)", blocks, ACK_BATCH)
+    run("none", blocks, ACK_NONE)
+
+
+if __name__ == "__main__":
+    bench_livelink_ack(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
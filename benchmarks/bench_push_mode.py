@@ -0,0 +1,132 @@
+"""
+Time to the first LiveLink frame with the unary PushAudio call against the
+PushAudioStream call, across clip lengths and link bandwidths, to tune
+unary_max_seconds of Audio2FaceStream.
+
+The calls go to a StandInA2F player, which starts sending frames as soon as it
+has audio: with the unary call once the whole clip is transferred, with the
+stream once the first chunk is. --link-mbps models the bandwidth between the
+client and the server (loopback speed if 0), where the whole-clip transfer of
+the unary call starts to cost more than the stream setup. The summary is the
+longest clip up to which the unary call is not slower.
+
+Usage: python benchmarks/bench_push_mode.py [--link-mbps 0 1000 100] [--repeat 10]
+"""
+
+import argparse
+import statistics
+import threading
+import time
+
+import numpy as np
+
+from audio2face_api.A2F import PUSH_MODE_STREAM, PUSH_MODE_UNARY, Audio2FaceStream
+from audio2face_api.A2F_CONFIG import DEFAULT_STREAM_LIVELINK
+from audio2face_api.Buffer import Buffer
+from audio2face_api.LiveLink import LiveLinkListener
+from audio2face_api.StandIn import StandInA2F
+
+SAMPLE_RATE = 16000
+CHUNK_SIZE = 4000
+FPS = 30
+CLIP_SECONDS = [0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.0]
+
+
+class FirstFrameProbe:
+    """Times the first frame of each push, and waits for its last frame."""
+
+    def __init__(self, listener: LiveLinkListener):
+        self.listener = listener
+        self.first_frame = threading.Event()
+        self.first_frame_time = None
+        listener.add_consumer(self._on_frame)
+
+    def _on_frame(self, frame):
+        if not self.first_frame.is_set():
+            self.first_frame_time = time.perf_counter()
+            self.first_frame.set()
+
+    def push(self, a2f, audio) -> float:
+        """
+        :return: Time from the push to the first frame, in ms.
+        """
+        expected = self.listener.frames_received + round(len(audio) * FPS / SAMPLE_RATE)
+        self.first_frame.clear()
+        start_time = time.perf_counter()
+        a2f._push_audio_stream(audio, SAMPLE_RATE)
+        if not self.first_frame.wait(30):
+            raise TimeoutError("No frame received.")
+        ttff = (self.first_frame_time - start_time) * 1000
+        # The frames of this push must not count for the next one
+        while self.listener.frames_received < expected:
+            time.sleep(0.001)
+        self.listener.buffer.flush()
+        return ttff
+
+
+def bench_link(link_mbps, repeat):
+    stand_in = StandInA2F(fps=FPS, speed=1000.0, link_mbps=link_mbps or None)
+    stand_in.start()
+    listener = LiveLinkListener(port=0, buffer=Buffer())
+    listener.start()
+    listener.wait_until_ready(5)
+    stand_in.node_ports[DEFAULT_STREAM_LIVELINK] = listener.port
+    probe = FirstFrameProbe(listener)
+    clients = {
+        mode: Audio2FaceStream(
+            stand_in.grpc_url,
+            CHUNK_SIZE,
+            False,
+            False,
+            api_url=stand_in.api_url,
+            scene_path="./assets/mark_solved_streaming.usd",
+            fps=FPS,
+            push_mode=mode,
+        )
+        for mode in (PUSH_MODE_UNARY, PUSH_MODE_STREAM)
+    }
+    link = f"{link_mbps:g} Mbit/s" if link_mbps else "loopback"
+    print(f"\n{link}, {SAMPLE_RATE} Hz float32, stream chunk {CHUNK_SIZE} samples")
+    print(f"{'clip (s)':>9} {'unary p50 (ms)':>15} {'stream p50 (ms)':>16}")
+    rng = np.random.default_rng(0)
+    unary_max_seconds = 0.0
+    unary_wins = True
+    for seconds in CLIP_SECONDS:
+        audio = (0.1 * rng.standard_normal(int(seconds * SAMPLE_RATE))).astype(
+            np.float32
+        )
+        results = {}
+        for mode, a2f in clients.items():
+            probe.push(a2f, audio)  # Warm-up
+            results[mode] = statistics.median(
+                probe.push(a2f, audio) for _ in range(repeat)
+            )
+        unary_wins &= results[PUSH_MODE_UNARY] <= results[PUSH_MODE_STREAM]
+        if unary_wins:
+            unary_max_seconds = seconds
+        print(
+            f"{seconds:9.2f} {results[PUSH_MODE_UNARY]:15.2f} "
+            f"{results[PUSH_MODE_STREAM]:16.2f}"
+        )
+    print(f"Unary not slower up to {unary_max_seconds:g} s")
+    listener.stop()
+    listener.join()
+    stand_in.stop()
+    return unary_max_seconds
+
+
+def bench_push_mode(links, repeat=10):
+    results = {link: bench_link(link, repeat) for link in links}
+    print("\nlink (Mbit/s)  unary_max_seconds")
+    for link, seconds in results.items():
+        print(f"{link or 'loopback':>13}  {seconds:g}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--link-mbps", type=float, nargs="+", default=[0, 1000, 300, 100]
+    )
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    bench_push_mode(args.link_mbps, args.repeat)
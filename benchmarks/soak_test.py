@@ -0,0 +1,115 @@
+"""
+Soak test of the streaming and direct sessions of the client, against a local
+stand-in A2F server running in its own process (or a real server with
+--api-url/--grpc-url, whose scene has the players and nodes given).
+
+Ramps concurrent streaming sessions, holds them for the duration, and tracks
+frames/sec, latency percentiles, thread count, RSS and open sockets. Exits with
+status 1 on leaks, failed or incomplete sessions, or throughput collapse.
+
+Usage:
+    python benchmarks/soak_test.py --sessions 8 --duration 3600 --output soak.json
+"""
+
+import argparse
+import logging
+import socket
+import sys
+
+from audio2face_api.Soak import SoakTest, save_report
+from audio2face_api.StandIn import start_stand_in_process
+
+
+def free_ports(n):
+    sockets = [socket.socket() for _ in range(n)]
+    for sock in sockets:
+        sock.bind(("localhost", 0))
+    ports = [sock.getsockname()[1] for sock in sockets]
+    for sock in sockets:
+        sock.close()
+    return ports
+
+
+def print_report(report):
+    print(f"{'PASSED' if report['passed'] else 'FAILED'}")
+    for failure in report["failures"]:
+        print(f"  - {failure}")
+    print(
+        f"{report['sessions_completed']} sessions, {report['exports_completed']} "
+        f"exports, {report['errors']} errors in {report['duration_s']:.0f} s"
+    )
+    print(
+        f"frames/s {report['frames_per_sec']:.1f}, per session "
+        f"{report['session_frames_per_sec_start'] or 0:.1f} -> "
+        f"{report['session_frames_per_sec_end'] or 0:.1f}"
+    )
+    for key in ("first_frame_ms", "session_s", "export_s"):
+        stats = report[key]
+        if stats["count"]:
+            print(
+                f"{key:>15}: p50 {stats['p50']:.3f} p95 {stats['p95']:.3f} "
+                f"p99 {stats['p99']:.3f} max {stats['max']:.3f}"
+            )
+    for key in ("threads", "sockets", "files"):
+        print(f"{key:>15}: {report[key]['baseline']} -> {report[key]['end']}")
+    rss = report["rss_mb"]
+    print(
+        f"{'rss MB':>15}: {rss['baseline']:.1f} -> {rss['end']:.1f} "
+        f"(peak {rss['peak'] or 0:.1f})"
+    )
+
+
+def soak_test():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sessions", type=int, default=4, help="Max concurrency")
+    parser.add_argument("--ramp-step", type=int, default=1)
+    parser.add_argument("--ramp-interval", type=float, default=30.0)
+    parser.add_argument("--duration", type=float, default=300.0)
+    parser.add_argument("--clip-seconds", type=float, default=2.0)
+    parser.add_argument("--direct-workers", type=int, default=0)
+    parser.add_argument(
+        "--speed", type=float, default=1.0, help="Frame pace of the stand-in"
+    )
+    parser.add_argument("--max-rss-growth-mb", type=float, default=50.0)
+    parser.add_argument("--api-url", help="Real A2F server instead of the stand-in")
+    parser.add_argument("--grpc-url")
+    parser.add_argument("--output", default="soak_report.json")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+    logging.basicConfig(level=args.log_level.upper())
+
+    players = [
+        f"/World/audio2face/PlayerStreaming_{i:02d}" for i in range(args.sessions)
+    ]
+    nodes = [f"/World/audio2face/StreamLivelink_{i:02d}" for i in range(args.sessions)]
+    stop = None
+    if args.api_url is None:
+        api_url, grpc_url, stop = start_stand_in_process(
+            players=dict(zip(players, nodes)), speed=args.speed
+        )
+    else:
+        api_url, grpc_url = args.api_url, args.grpc_url
+    try:
+        report = SoakTest(
+            api_url,
+            grpc_url,
+            players,
+            nodes,
+            free_ports(args.sessions),
+            ramp_step=args.ramp_step,
+            ramp_interval=args.ramp_interval,
+            duration=args.duration,
+            clip_seconds=args.clip_seconds,
+            direct_workers=args.direct_workers,
+            max_rss_growth_mb=args.max_rss_growth_mb,
+        ).run()
+    finally:
+        if stop is not None:
+            stop()
+    save_report(report, args.output)
+    print_report(report)
+    return 0 if report["passed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(soak_test())
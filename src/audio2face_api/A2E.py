@@ -19,7 +19,9 @@ class Audio2Emotion(ABC):
         Detects emotions in the audio file.
         :return: response from the server.
         """
-        res = self.http_client.post("A2F/A2E/GenerateKeys", payload=self.a2e_settings)
+        res = self.http_client.post(
+            "A2F/A2E/GenerateKeys", payload=self.a2e_settings, long_running=True
+        )
         logging.debug(f"Audio2Emotion: Emotion detection result: {res}")
         if res.get("status") == "OK":
             logging.info("Audio2Emotion: Emotion detection completed successfully.")
@@ -61,6 +63,39 @@ class Audio2Emotion(ABC):
         """
         Set the global emotion for the character.
         """
+        payload = self._global_emotion_payload(
+            amazement=amazement,
+            anger=anger,
+            cheekiness=cheekiness,
+            disgust=disgust,
+            fear=fear,
+            grief=grief,
+            joy=joy,
+            outofbreath=outofbreath,
+            pain=pain,
+            sadness=sadness,
+            update_settings=update_settings,
+        )
+        res = self.http_client.post("A2F/A2E/SetEmotion", payload=payload)
+        return self._check_global_emotion(res)
+
+    def _global_emotion_payload(
+        self,
+        amazement: float | None = 0.0,
+        anger: float | None = 0.0,
+        cheekiness: float | None = 0.0,
+        disgust: float | None = 0.0,
+        fear: float | None = 0.0,
+        grief: float | None = 0.0,
+        joy: float | None = 0.0,
+        outofbreath: float | None = 0.0,
+        pain: float | None = 0.0,
+        sadness: float | None = 0.0,
+        update_settings: bool = True,
+    ):
+        """
+        Build the payload of the A2F/A2E/SetEmotion request.
+        """
         emotion_strength = {}
         emotion_strength["Amazement"] = amazement if amazement is not None else 0.0
         emotion_strength["Anger"] = anger if anger is not None else 0.0
@@ -80,11 +115,12 @@ class Audio2Emotion(ABC):
                 {"preferred_emotion": list(emotion_strength.values())}
             )
 
-        payload = {
+        return {
             "a2f_instance": self.a2e_settings["a2f_instance"],
             "emotion": list(emotion_strength.values()),
         }
-        res = self.http_client.post("A2F/A2E/SetEmotion", payload=payload)
+
+    def _check_global_emotion(self, res):
         logging.debug(f"Audio2Emotion: Set global emotion result: {res}")
         if res.get("status") == "OK":
             logging.info("Audio2Emotion: Global emotion set successfully.")
@@ -92,6 +128,29 @@ class Audio2Emotion(ABC):
             logging.error("Audio2Emotion: Failed to set global emotion.")
         return res
 
+    def set_emotion(self, auto_detect: bool = None, global_emotion: dict = None):
+        """
+        Set the auto emotion detection mode and the global emotion together.
+        Both requests are independent, so they are sent concurrently.
+        :param auto_detect: Enable or disable auto emotion detection, unchanged if None.
+        :param global_emotion: Keyword arguments of set_gloabl_emotion, unchanged if None.
+        :return: List of the responses from the server.
+        """
+        requests_batch = []
+        checks = []
+        if auto_detect is not None:
+            requests_batch.append(
+                (self.auto_emotion_detect_route, self._auto_detect_payload(auto_detect))
+            )
+            checks.append(self._check_auto_emotion_detect)
+        if global_emotion is not None:
+            requests_batch.append(
+                ("A2F/A2E/SetEmotion", self._global_emotion_payload(**global_emotion))
+            )
+            checks.append(self._check_global_emotion)
+        results = self.http_client.post_many(requests_batch)
+        return [check(res) for check, res in zip(checks, results)]
+
     def _update_emotion_settings(self, settings: dict = None):
         """
         Update the emotion settings.
@@ -100,25 +159,42 @@ class Audio2Emotion(ABC):
         for key, value in settings.items():
             self.a2e_settings[key] = value
 
+    # Route of the auto emotion detection request, depends on the mode
+    auto_emotion_detect_route = None
+
+    def _auto_detect_payload(self, auto_detect: bool):
+        return {
+            "a2f_instance": self.a2e_settings["a2f_instance"],
+            "enable": auto_detect,
+        }
+
     @abstractmethod
+    def _check_auto_emotion_detect(self, res):
+        """
+        Log the response of the auto emotion detection request.
+        """
+        pass
+
     def set_auto_emotion_detect(self, auto_detect: bool = True):
         """
         Set the auto emotion detection mode.
         :param auto_detect: Boolean to enable or disable auto emotion detection.
         """
-        pass
+        res = self.http_client.post(
+            self.auto_emotion_detect_route,
+            payload=self._auto_detect_payload(auto_detect),
+        )
+        return self._check_auto_emotion_detect(res)
 
 
 class Audio2EmotionStream(Audio2Emotion):
-    def set_auto_emotion_detect(self, auto_detect: bool = True):
-        """
-        Set the auto emotion detection mode on streaming mode.
-        """
-        payload = {
-            "a2f_instance": self.a2e_settings["a2f_instance"],
-            "enable": auto_detect,
-        }
-        res = self.http_client.post("/A2F/A2E/EnableStreaming", payload=payload)
+    """
+    Audio2Emotion requests on streaming mode.
+    """
+
+    auto_emotion_detect_route = "/A2F/A2E/EnableStreaming"
+
+    def _check_auto_emotion_detect(self, res):
         logging.debug(f"Audio2EmotionStream: Set auto emotion detection result: {res}")
         if res.get("status") == "OK":
             logging.info(
@@ -133,17 +209,13 @@ class Audio2EmotionStream(Audio2Emotion):
 
 
 class Audio2EmotionDirect(Audio2Emotion):
-    def set_auto_emotion_detect(self, auto_detect: bool = True):
-        """
-        Set the auto emotion detection mode on audio change.
-        """
-        payload = {
-            "a2f_instance": self.a2e_settings["a2f_instance"],
-            "enable": auto_detect,
-        }
-        res = self.http_client.post(
-            "/A2F/A2E/EnableAutoGenerateOnTrackChange", payload=payload
-        )
+    """
+    Audio2Emotion requests on direct mode (emotion detected on audio change).
+    """
+
+    auto_emotion_detect_route = "/A2F/A2E/EnableAutoGenerateOnTrackChange"
+
+    def _check_auto_emotion_detect(self, res):
         logging.debug(f"Audio2EmotionDirect: Set auto emotion detection result: {res}")
         if res.get("status") == "OK":
             logging.info(
@@ -1,5 +1,10 @@
+import functools
+import json
 import os
+import threading
 import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from contextlib import contextmanager
 from audio2face_api.A2E_CONFIG import A2E_DEFAULT_SETTINGS
 from audio2face_api.A2F_CONFIG import (
     DEFAULT_PLAYER_INSTANCE,
@@ -16,20 +21,58 @@ from typing import override
 
 from audio2face_api.A2E_CONFIG import DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE
 from audio2face_api.A2F_CONFIG import (
+    API_READINESS_INITIAL_DELAY,
+    API_READINESS_MAX_DELAY,
     DEFAULT_STREAM_LIVELINK,
+    LIVELINK_AUDIO_PORT,
     LIVELINK_DEFAULT_SETTINGS,
     LIVELINK_LISTENING_INTERFACE,
     LIVELINK_LISTENING_PORT,
+    LIVELINK_READY_TIMEOUT,
     PATH_PING_AUDIO,
+    SESSION_LOCK_POLL_INTERVAL,
+    UNARY_PUSH_MAX_BYTES,
+    UNARY_PUSH_MAX_SECONDS,
 )
+from audio2face_api.AudioFile import get_audio_file_info, iter_audio_file_chunks
+from audio2face_api.AudioStream import AVSyncBuffer, LiveLinkAudioReceiver
 from audio2face_api.Buffer import Buffer
+from audio2face_api.Chunking import AdaptiveChunkSizer
+from audio2face_api.Deadline import Deadline, current_deadline
+from audio2face_api.FanOut import FrameHub
 from audio2face_api.LiveLink import LiveLinkListener
+from audio2face_api.Recording import SessionRecorder
+from audio2face_api.Resample import LINEAR, resample_export
+from audio2face_api.Scenes import SCENE_REGISTRY
+from audio2face_api.Sinks import BackgroundSinkWriter, FrameSink
+from audio2face_api.Tracing import span, traced
+from audio2face_api.VAD import SilenceTrimmer, iter_trimmed_file_chunks
 import audio2face_api.grpc.audio2face_pb2 as audio2face_pb2
 import audio2face_api.grpc.audio2face_pb2_grpc as audio2face_pb2_grpc
 import grpc
 import numpy as np
+import requests
 import soundfile
 
+# How Audio2FaceStream pushes the audio to A2F
+PUSH_MODE_AUTO = "auto"  # Unary for audios up to unary_max_seconds, else stream
+PUSH_MODE_UNARY = "unary"  # One PushAudio call with the whole audio
+PUSH_MODE_STREAM = "stream"  # PushAudioStream, chunk by chunk
+
+
+@functools.lru_cache(maxsize=1)
+def load_ping_audio():
+    """
+    Decode the warm-up audio once per process.
+    :return: Tuple (read-only mono float32 samples, sample rate).
+    """
+    data, samplerate = soundfile.read(PATH_PING_AUDIO, dtype="float32")
+    # Only Mono audio is supported
+    if len(data.shape) > 1:
+        data = np.average(data, axis=1).astype(np.float32)
+    data.flags.writeable = False
+    return data, samplerate
+
 
 class Audio2Face(ABC):
     def __init__(
@@ -41,6 +84,7 @@ class Audio2Face(ABC):
         use_keyframes: bool = False,
         use_global_emotion: bool = False,
         global_emotion: dict = None,
+        vad: SilenceTrimmer = None,
     ):
 
         # API : Audio2Face Server
@@ -62,33 +106,224 @@ class Audio2Face(ABC):
         self.a2e_settings = a2e_settings
         self.fps = fps
 
-    def init_A2F(self):
+        # Removes the silences of the audio before inference, if set
+        self.vad = vad
+
+        # Duration of each startup step, in seconds
+        self.startup_timings = {}
+
+        # Held for the server-state critical sections (track, buffer), so that
+        # threads sharing this object do not overwrite each other's state
+        self.lock = threading.RLock()
+
+        # Deadlines of the running sessions, cancelled by cancel()
+        self._active_deadlines = set()
+        self._deadlines_lock = threading.Lock()
+
+    @contextmanager
+    def _session(self, timeout: float = None):
+        """
+        Run a block under a session deadline, that cancel() can cancel.
+        Nested sessions share the deadline of the outer one.
+        :param timeout: Time budget of the session in seconds, None for no limit.
+        """
+        deadline = current_deadline()
+        if deadline is not None and timeout is None:
+            yield deadline
+            return
+        deadline = Deadline(timeout)
+        with self._deadlines_lock:
+            self._active_deadlines.add(deadline)
+        try:
+            with deadline:
+                yield deadline
+        finally:
+            with self._deadlines_lock:
+                self._active_deadlines.discard(deadline)
+
+    @contextmanager
+    def _locked_session(self, timeout: float = None):
+        """
+        Run a block under a session deadline, holding the lock of this object.
+        The wait for a session already holding the lock is bounded by the
+        deadline, and cancel() stops it.
+        :param timeout: Time budget of the session in seconds, None for no limit.
+        """
+        with self._session(timeout) as deadline:
+            while True:
+                if deadline.cancelled:
+                    raise CancelledError(
+                        "Audio2Face: Session cancelled while waiting for another one."
+                    )
+                remaining = deadline.remaining()
+                if remaining == 0:
+                    raise TimeoutError(
+                        "Audio2Face: Deadline exceeded while waiting for another session."
+                    )
+                wait = SESSION_LOCK_POLL_INTERVAL
+                if remaining is not None:
+                    wait = min(wait, remaining)
+                if self.lock.acquire(timeout=wait):
+                    break
+            try:
+                yield deadline
+            finally:
+                self.lock.release()
+
+    def cancel(self):
+        """
+        Cancel the running sessions: pending HTTP calls are not sent, the audio
+        push and the frame waits stop promptly, raising CancelledError.
+        """
+        with self._deadlines_lock:
+            deadlines = list(self._active_deadlines)
+        for deadline in deadlines:
+            deadline.cancel()
+        logging.info(f"Audio2Face: Cancelled {len(deadlines)} session(s).")
+
+    def _timed(self, step: str, func, *args, **kwargs):
+        """
+        Run a startup step and record its duration in startup_timings.
+        """
+        start_time = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            self.startup_timings[step] = time.perf_counter() - start_time
+
+    @traced()
+    def init_A2F(
+        self,
+        load_scene: bool = True,
+        wait_timeout: float = 0.0,
+        force_reload: bool = False,
+    ):
         """
         Initializes the A2F API by checking if A2F is running and loading the scene.
+        :param load_scene: Set to False if the scene is already loaded on the server.
+        :param wait_timeout: Max time in seconds to wait for a server that is still
+            starting. The status is checked once if set to 0.
+        :param force_reload: Load the scene even if it is already resident.
         """
         # Check if the API is running and load the scene
-        if self.get_api_status():
+        if self._timed("api_status", self.wait_for_api, wait_timeout):
+            if not load_scene:
+                return
+            self._timed("scene_load", self.load_scene, force_reload=force_reload)
+        else:
+            raise ConnectionError(
+                "Audio2Face: API is not running. Please check the server status."
+            )
+
+    @traced()
+    def load_scene(self, scene_path: str = None, force_reload: bool = False):
+        """
+        Load a USD scene, unless it is already the scene loaded on the endpoint.
+        :param scene_path: Path of the scene, defaults to the current scene_path.
+        :param force_reload: Load the scene even if it is already resident.
+        :return: True if the scene is loaded.
+        """
+        with self.lock:
+            if scene_path is not None:
+                if not os.path.isabs(scene_path):
+                    scene_path = os.path.abspath(scene_path)
+                self.scene_path = scene_path
+
+            if (
+                not force_reload
+                and SCENE_REGISTRY.is_loaded(self.api_url, self.scene_path)
+                and self._scene_is_resident()
+            ):
+                SCENE_REGISTRY.record_skip(self.api_url)
+                self.scene_loaded = True
+                logging.info(f"Audio2Face: Scene {self.scene_path} already loaded.")
+                return self.scene_loaded
+
+            # Load the scene
+            SCENE_REGISTRY.forget(self.api_url)
+            start_time = time.perf_counter()
             payload = {"file_name": self.scene_path}
             res = self.http_client.post("A2F/USD/Load", payload)
-            # Load the scene
             self.scene_loaded = res.get("status") == "OK"
             if self.scene_loaded:
+                SCENE_REGISTRY.record_load(
+                    self.api_url, self.scene_path, time.perf_counter() - start_time
+                )
                 logging.info(
                     f"Audio2Face: Scene {self.scene_path} loaded successfully."
                 )
             else:
                 logging.error("Audio2Face: Failed to load the scene.")
-        else:
-            raise ConnectionError(
-                "Audio2Face: API is not running. Please check the server status."
+            return self.scene_loaded
+
+    def _expected_players(self) -> list:
+        """
+        Player instances driven by this object, that its scene must hold.
+        """
+        return [DEFAULT_PLAYER_INSTANCE]
+
+    def _scene_is_resident(self) -> bool:
+        """
+        Check that the stage still holds the players of this object, as A2F may
+        have restarted, or another process loaded a scene without them, since
+        the registry recorded the load.
+        """
+        try:
+            res = self.http_client.post("A2F/Player/GetInstances", {})
+        except (requests.RequestException, ValueError) as e:
+            logging.info(f"Audio2Face: Could not check the loaded scene: {e}")
+            return False
+        result = res.get("result")
+        if res.get("status") != "OK" or not isinstance(result, dict):
+            return False
+        players = {
+            player
+            for instances in result.values()
+            if isinstance(instances, list)
+            for player in instances
+        }
+        missing = [p for p in self._expected_players() if p not in players]
+        if missing:
+            logging.info(
+                f"Audio2Face: The stage has no {', '.join(missing)}, reloading the scene."
             )
+            return False
+        return True
 
+    @traced()
     def get_api_status(self):
         """
         Check if the API is running
         """
         return self.http_client.get("status") == "OK"
 
+    @traced()
+    def wait_for_api(self, timeout: float = 0.0):
+        """
+        Poll the API status with exponential backoff until it is running.
+        :param timeout: Max time to wait in seconds, the status is checked once if 0.
+        :return: True if the API is running, False if the timeout expired.
+        """
+        deadline = time.monotonic() + timeout
+        delay = API_READINESS_INITIAL_DELAY
+        while True:
+            try:
+                if self.get_api_status():
+                    return True
+            except requests.RequestException:
+                if timeout <= 0:
+                    raise
+            # The server is (re)starting, its scene is no longer known
+            SCENE_REGISTRY.forget(self.api_url)
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            logging.info(
+                f"Audio2Face: API not ready, retrying in {min(delay, remaining):.2f} s."
+            )
+            time.sleep(min(delay, remaining))
+            delay = min(delay * 2, API_READINESS_MAX_DELAY)
+
 
 class Audio2FaceDirect(Audio2Face):
 
@@ -106,6 +341,7 @@ class Audio2FaceDirect(Audio2Face):
             http_client=self.http_client,
         )
 
+    @traced()
     def set_audio_root_path(self, dir_path: str = None):
         """
         Set the root path for audio files.
@@ -194,7 +430,9 @@ class Audio2FaceDirect(Audio2Face):
             "fps": self.fps,
         }
 
-        res = self.http_client.post("A2F/Exporter/ExportBlendshapes", payload=payload)
+        res = self.http_client.post(
+            "A2F/Exporter/ExportBlendshapes", payload=payload, long_running=True
+        )
         logging.debug(f"Audio2FaceDirect: {res}")
         if res.get("status") == "OK":
             logging.info(
@@ -204,32 +442,122 @@ class Audio2FaceDirect(Audio2Face):
             logging.error("Audio2FaceDirect: Failed to export blendshapes.")
         return res
 
+    def _write_trimmed_audio(self, audio_name: str):
+        """
+        Write the audio file without its silences next to the original one.
+        :return: Tuple (name of the trimmed file, TrimPlan).
+        """
+        audio_path = os.path.join(self.audio_root_path, audio_name)
+        if not os.path.exists(audio_path):
+            raise FileNotFoundError(
+                f"Audio2FaceDirect: Audio file {audio_name} not found in {self.audio_root_path}."
+            )
+        audio_data, sample_rate = soundfile.read(audio_path, dtype="float32")
+        if len(audio_data.shape) > 1:
+            audio_data = np.average(audio_data, axis=1).astype(np.float32)
+        trimmed, plan = self.vad.trim(audio_data, sample_rate)
+        trimmed_name = f"{os.path.splitext(audio_name)[0]}.vad.wav"
+        soundfile.write(
+            os.path.join(self.audio_root_path, trimmed_name), trimmed, sample_rate
+        )
+        return trimmed_name, plan
+
+    @staticmethod
+    def get_export_path(output_dir: str, output_name: str):
+        """
+        Path of the JSON file written by an export, None if it does not exist.
+        """
+        candidates = [
+            os.path.join(output_dir, name)
+            for name in (f"{output_name}_bsweight.json", f"{output_name}.json")
+        ]
+        return next((p for p in candidates if os.path.exists(p)), None)
+
+    def _restore_export(self, output_dir: str, output_name: str, plan):
+        """
+        Put the exported blendshapes back on the timeline of the original audio,
+        with zero weights on the removed silences.
+        """
+        export_path = self.get_export_path(output_dir, output_name)
+        if export_path is None:
+            logging.error(
+                f"Audio2FaceDirect: Exported blendshapes of {output_name} not found, silences not restored."
+            )
+            return
+        with open(export_path) as f:
+            export = json.load(f)
+        weights = plan.restore_weights(
+            export["weightMat"], export.get("exportFps", self.fps)
+        )
+        export["weightMat"] = weights.tolist()
+        export["numFrames"] = len(weights)
+        with open(export_path, "w") as f:
+            json.dump(export, f)
+        logging.info(
+            f"Audio2FaceDirect: Restored {plan.removed_seconds:.2f}s of silence in {export_path}."
+        )
+
+    @traced()
     def export_blendshapes(
         self,
         audio_name: str = None,
         output_dir: str = None,
         output_name: str = None,
+        timeout: float = None,
+        output_fps: float = None,
+        resample_mode: str = LINEAR,
     ):
-        """Export Blendshapes from the audio file."""
+        """Export Blendshapes from the audio file.
+        :param timeout: Deadline of the whole export in seconds, None for no limit.
+        :param output_fps: Frame rate of the exported file, if different from the
+            inference fps. The export is resampled on the client (see Resample.py),
+            so the server keeps running at fps.
+        :param resample_mode: Resampling mode, "linear" or "cubic".
+        :return: JSON response of the export request.
+        """
 
         start_time = time.time()
-        # Set the audio file
-        self._set_audio(audio_name)
+        with self._locked_session(timeout):
+            plan = None
+            trimmed_path = None
+            if self.vad is not None:
+                # Infer on the audio without its silences
+                audio_name, plan = self._write_trimmed_audio(audio_name)
+                trimmed_path = os.path.join(self.audio_root_path, audio_name)
+
+            try:
+                # Set the audio file
+                self._set_audio(audio_name)
+
+                if self.use_global_emotion:
+                    # Set Global Emotion
+                    self.a2e.set_gloabl_emotion(**self.global_emotion)
 
-        if self.use_global_emotion:
-            # Set Global Emotion
-            self.a2e.set_gloabl_emotion(**self.global_emotion)
+                # Emotion Detection
+                if self.use_keyframes:
+                    self.a2e.detect_emotion_keys()
 
-        # Emotion Detection
-        if self.use_keyframes:
-            self.a2e.detect_emotion_keys()
+                # Blendshapes Export
+                res = self._export_blendshapes(
+                    output_dir=output_dir, output_name=output_name
+                )
+            finally:
+                # Also on errors and timeouts, not to leave it in the audio root
+                if trimmed_path is not None and os.path.exists(trimmed_path):
+                    os.remove(trimmed_path)
+
+            if plan is not None and res.get("status") == "OK":
+                self._restore_export(output_dir, output_name, plan)
 
-        # Blendshapes Export
-        self._export_blendshapes(output_dir=output_dir, output_name=output_name)
+            if output_fps is not None and output_fps != self.fps:
+                export_path = self.get_export_path(output_dir, output_name)
+                if res.get("status") == "OK" and export_path is not None:
+                    resample_export(export_path, output_fps, resample_mode)
         end_time = time.time()
         logging.info(
             f"Audio2FaceDirect: Inference completed in {end_time - start_time:.2f} seconds."
         )
+        return res
 
 
 class Audio2FaceStream(Audio2Face):
@@ -241,14 +569,40 @@ class Audio2FaceStream(Audio2Face):
         block_until_playback_is_finished,
         use_livelink,
         *args,
+        player_instance: str = DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE,
+        livelink_node: str = DEFAULT_STREAM_LIVELINK,
+        livelink_port: int = LIVELINK_LISTENING_PORT,
+        push_timeout: float = None,
+        receive_audio: bool = False,
+        audio_port: int = LIVELINK_AUDIO_PORT,
+        push_mode: str = PUSH_MODE_AUTO,
+        unary_max_seconds: float = UNARY_PUSH_MAX_SECONDS,
         **kwargs,
     ):
         super().__init__(*args, **kwargs)
+        if push_mode not in (PUSH_MODE_AUTO, PUSH_MODE_UNARY, PUSH_MODE_STREAM):
+            raise ValueError(f"Audio2FaceStream: Unknown push mode {push_mode}.")
+        if receive_audio and not use_livelink:
+            raise ValueError("Audio2FaceStream: receive_audio requires use_livelink.")
 
         # gRPC URL
         self.grpc_url = grpc_url
+        # Deadline of each PushAudio(Stream) call in seconds, None for no limit
+        self.push_timeout = push_timeout
+        # Unary PushAudio or PushAudioStream, see PUSH_MODE_*
+        self.push_mode = push_mode
+        self.unary_max_seconds = unary_max_seconds
 
-        # Audio Stream params
+        # Scene nodes used by this stream (a scene can hold several of them)
+        self.player_instance = player_instance
+        self.livelink_node = livelink_node
+        self.livelink_port = livelink_port
+
+        # Audio Stream params, chunk_size is a number of samples or an
+        # AdaptiveChunkSizer
+        self.chunk_sizer = None
+        if isinstance(chunk_size, AdaptiveChunkSizer):
+            self.chunk_sizer = chunk_size
         self.chunk_size = chunk_size
 
         # self.sleep_between_chunks = sleep_between_chunks
@@ -259,6 +613,20 @@ class Audio2FaceStream(Audio2Face):
         self.livelink_listener = None
         self.frames_buffer = None
 
+        # Receive the audio of the LiveLink node, aligned with the frames
+        self.receive_audio = receive_audio
+        self.audio_port = audio_port
+        self.audio_receiver = None
+        self.av_buffer = None
+
+        # Sinks writing the frames as they arrive, from a background thread
+        self.sink_writer = None
+        self.sinks = []
+        # Hubs republishing the frames to local subscribers
+        self.frame_hubs = []
+        # Records the received blocks and the pushed audio, if set
+        self.recorder = None
+
         # A2E
         self.a2e = Audio2EmotionStream(
             a2e_settings=self.a2e_settings,
@@ -266,75 +634,417 @@ class Audio2FaceStream(Audio2Face):
         )
 
     @override
-    def init_A2F(self):
-        super().init_A2F()
+    @traced()
+    def init_A2F(
+        self,
+        load_scene: bool = True,
+        wait_timeout: float = 0.0,
+        force_reload: bool = False,
+    ):
+        """
+        Initializes the A2F API and the streaming pipeline.
+        Steps that do not depend on each other run concurrently: the scene load,
+        the decoding of the ping audio and the start of the LiveLink listener.
+        The duration of each step is stored in startup_timings.
+        """
+        self.startup_timings = {}
+        start_time = time.perf_counter()
+        try:
+            self._init_stream(load_scene, wait_timeout, force_reload)
+        except Exception:
+            # Do not leave listener or writer threads behind a failed startup
+            if self.livelink_listener is not None:
+                self.livelink_listener.stop()
+                self.livelink_listener = None
+            if self.audio_receiver is not None:
+                self.audio_receiver.stop()
+                self.audio_receiver = None
+            # The sinks stay open for the next init_A2F()
+            self._stop_sink_writer(close_sinks=False)
+            raise
 
-        # Stream an init audio
-        data, samplerate = soundfile.read(PATH_PING_AUDIO, dtype="float32")
-        self._push_audio_stream(data, samplerate)
+        self.startup_timings["total"] = time.perf_counter() - start_time
+        logging.info(
+            "Audio2FaceStream: Startup completed in "
+            + ", ".join(f"{k}={v:.3f}s" for k, v in self.startup_timings.items())
+        )
 
-        # Starting Livelink Stream to receive frames
-        if self.use_livelink:
-            logging.info("Audio2FaceStream: Starting LiveLink Stream...")
-            # A buffer for frames
-            self.frames_buffer = Buffer()
-            # Creates a listener to receive the frames
-            self.livelink_listener = LiveLinkListener(
-                ip=LIVELINK_LISTENING_INTERFACE,
-                port=LIVELINK_LISTENING_PORT,
-                buffer=self.frames_buffer,
+    def _init_stream(self, load_scene: bool, wait_timeout: float, force_reload: bool):
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            init_future = executor.submit(
+                super().init_A2F, load_scene, wait_timeout, force_reload
+            )
+            ping_future = executor.submit(self._timed, "ping_decode", load_ping_audio)
+
+            # Starting Livelink Stream to receive frames
+            listener_future = None
+            if self.use_livelink:
+                logging.info("Audio2FaceStream: Starting LiveLink Stream...")
+                # A buffer for frames
+                self.frames_buffer = Buffer()
+                # Creates a listener to receive the frames
+                self.livelink_listener = LiveLinkListener(
+                    ip=LIVELINK_LISTENING_INTERFACE,
+                    port=self.livelink_port,
+                    buffer=self.frames_buffer,
+                )
+                self._start_sink_writer()
+                for hub in self.frame_hubs:
+                    hub.attach(self.livelink_listener)
+                self.livelink_listener.start()
+                listener_future = executor.submit(
+                    self._timed,
+                    "listener_ready",
+                    self.livelink_listener.wait_until_ready,
+                    LIVELINK_READY_TIMEOUT,
+                )
+            audio_future = None
+            if self.receive_audio:
+                self.av_buffer = AVSyncBuffer(fps=self.fps)
+                self.livelink_listener.add_consumer(self.av_buffer.add_frame)
+                self.audio_receiver = LiveLinkAudioReceiver(
+                    ip=LIVELINK_LISTENING_INTERFACE,
+                    port=self.audio_port,
+                    buffer=self.av_buffer,
+                )
+                self.audio_receiver.start()
+                audio_future = executor.submit(
+                    self._timed,
+                    "audio_receiver_ready",
+                    self.audio_receiver.wait_until_ready,
+                    LIVELINK_READY_TIMEOUT,
+                )
+
+            # The scene is needed by all the remaining steps
+            init_future.result()
+            emotion_future = None
+            if self.use_global_emotion:
+                # Set Global Emotion
+                emotion_future = executor.submit(
+                    self._timed,
+                    "global_emotion",
+                    self.a2e.set_gloabl_emotion,
+                    **self.global_emotion,
+                )
+
+            # Stream an init audio
+            data, samplerate = ping_future.result()
+            self._timed("ping_push", self._push_audio_stream, data, samplerate)
+
+            if listener_future is not None:
+                listener_future.result()
+                if audio_future is not None:
+                    audio_future.result()
+                # Enable livelink pluging on A2F
+                if self.livelink_port != LIVELINK_LISTENING_PORT or self.receive_audio:
+                    # Point the LiveLink node to this stream's ports
+                    self._timed("livelink_settings", self.set_livelink_settings)
+                self._timed("livelink_enable", self.enable_stream_livelink, True)
+
+            if emotion_future is not None:
+                emotion_future.result()
+
+    @override
+    def _expected_players(self) -> list:
+        return [self.player_instance]
+
+    @traced()
+    def add_sink(self, sink: FrameSink):
+        """
+        Write the received frames to a sink as they arrive (see Sinks.py).
+        Writes run on a background thread, so they never stall the receive loop.
+        """
+        if not self.use_livelink:
+            raise ValueError("Audio2FaceStream: Sinks require use_livelink=True.")
+        self.sinks.append(sink)
+        if self.sink_writer is not None:
+            self.sink_writer.sinks.append(sink)
+        elif self.livelink_listener is not None:
+            self._start_sink_writer()
+
+    def add_frame_hub(self, hub: FrameHub):
+        """
+        Republish the received frames to the subscribers of a hub (see FanOut.py).
+        The hub is not closed with the connection.
+        """
+        if not self.use_livelink:
+            raise ValueError("Audio2FaceStream: Frame hubs require use_livelink=True.")
+        self.frame_hubs.append(hub)
+        if self.livelink_listener is not None:
+            hub.attach(self.livelink_listener)
+
+    def start_recording(self, path: str):
+        """
+        Record the raw LiveLink blocks and the pushed audio of the next sessions
+        to a file, to replay them later without A2F (see Recording.py).
+        """
+        if not self.use_livelink or self.livelink_listener is None:
+            raise ValueError(
+                "Audio2FaceStream: Recording requires use_livelink=True and init_A2F()."
             )
-            self.livelink_listener.start()
-            # Enable livelink pluging on A2F
-            time.sleep(1)  # Wait for the livelink listener to start
-            self.enable_stream_livelink(True)
+        self.stop_recording()
+        self.recorder = SessionRecorder(path)
+        self.recorder.attach(self.livelink_listener)
+        logging.info(f"Audio2FaceStream: Recording to {path}")
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.stop()
+            self.recorder = None
+
+    def _start_sink_writer(self):
+        if not self.sinks or self.sink_writer is not None:
+            return
+        self.sink_writer = BackgroundSinkWriter(self.sinks)
+        self.sink_writer.start()
+        self.livelink_listener.add_consumer(self.sink_writer.put)
+
+    def _stop_sink_writer(self, close_sinks: bool):
+        """
+        Stop the sink writer once it wrote the queued frames.
+        :param close_sinks: Also close the sinks and remove them from this
+            stream, else they are kept open for the next init_A2F().
+        """
+        if self.sink_writer is not None:
+            self.sink_writer.stop()
+            self.sink_writer.join()
+            self.sink_writer = None
+        if close_sinks:
+            for sink in self.sinks:
+                try:
+                    sink.close()
+                except Exception as e:
+                    logging.error(f"Audio2FaceStream: Failed to close {sink}: {e}")
+            self.sinks = []
+
+    @traced()
+    def stream_audio(self, audio_data, sample_rate, timeout: float = None):
+        """
+        Stream audio to A2F and retrieve the generated frames.
+        :param timeout: Deadline of the push and of the frame collection, in
+            seconds. None for no limit.
+        :return: The received frames if LiveLink is used, None otherwise.
+        """
+        with self._locked_session(timeout):
+            plan = None
+            if self.vad is not None:
+                audio_data, plan = self.vad.trim(audio_data, sample_rate)
+            if self.use_livelink:
+                logging.info("Audio2FaceStream: Flushing frames buffer...")
+                self.frames_buffer.flush()
+                if self.av_buffer is not None:
+                    self.av_buffer.reset()
+            audio_length = len(audio_data) / sample_rate  # length in seconds
+            self._push_audio_stream(audio_data, sample_rate)
+            return self._restore_frames(self._collect_frames(audio_length), plan)
 
-        if self.use_global_emotion:
-            # Set Global Emotion
-            self.a2e.set_gloabl_emotion(**self.global_emotion)
+    @traced()
+    def stream_audio_file(self, file_path: str, timeout: float = None):
+        """
+        Stream an audio file to A2F without loading it into memory.
+        The file is read block by block (chunk_size samples at a time) straight
+        into the gRPC request generator.
+        :param file_path: Path to the audio file.
+        :param timeout: Deadline of the session in seconds, None for no limit.
+        :return: The received frames if LiveLink is used, None otherwise.
+        """
+        with self._locked_session(timeout):
+            return self._stream_audio_file(file_path)
 
-    def stream_audio(self, audio_data, sample_rate):
+    def _stream_audio_file(self, file_path: str):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(
+                f"Audio2FaceStream: Audio file {file_path} not found."
+            )
+        sample_rate, n_samples, _ = get_audio_file_info(file_path)
+        read_size = self.chunk_size
+        if self.chunk_sizer is not None:
+            read_size = self.chunk_sizer.min_chunk_samples(sample_rate)
+        plan = None
+        if self.vad is not None:
+            plan = self.vad.plan_file(file_path)
+            n_samples = plan.kept_samples
+            chunks = iter_trimmed_file_chunks(file_path, plan, read_size)
+        else:
+            chunks = iter_audio_file_chunks(file_path, read_size)
         if self.use_livelink:
             logging.info("Audio2FaceStream: Flushing frames buffer...")
             self.frames_buffer.flush()
-        audio_length = len(audio_data) / sample_rate  # length in seconds
-        self._push_audio_stream(audio_data, sample_rate)
-        # retrieve the frames from the buffer
+            if self.av_buffer is not None:
+                self.av_buffer.reset()
+        audio_length = n_samples / sample_rate  # length in seconds
+        if self._use_unary_push(n_samples, sample_rate):
+            # Short enough to be read at once
+            audio_data = np.concatenate(list(chunks) or [np.zeros(0, np.float32)])
+            self._push_audio_unary(audio_data, sample_rate)
+        else:
+            self._push_audio_chunks(chunks, sample_rate)
+        return self._restore_frames(self._collect_frames(audio_length), plan)
+
+    def _restore_frames(self, frames, plan):
+        """
+        Put the frames back on the timeline of the original audio, with neutral
+        frames on the silences removed by the VAD.
+        """
+        if frames is None or plan is None:
+            return frames
+        return plan.restore_frames(frames, self.fps)
+
+    def _collect_frames(self, audio_length: float):
+        """
+        Retrieve the frames generated for an audio of the given length.
+        :param audio_length: Length of the streamed audio in seconds.
+        """
         frames = None
         if self.use_livelink:
             # Sleep to wait until all the frames are received
-            time.sleep(audio_length + 1)
+            deadline = current_deadline()
+            if deadline is not None:
+                deadline.wait(audio_length + 1)
+            else:
+                time.sleep(audio_length + 1)
             frames = self.frames_buffer.flush()
         return frames
 
+    def _iter_audio_chunks(self, audio_data):
+        """
+        Split an in-memory audio signal into chunks of chunk_size samples.
+        """
+        if self.chunk_sizer is not None:
+            # Split by _push_audio_chunks
+            yield audio_data
+            return
+        for start in range(0, len(audio_data), self.chunk_size):
+            yield audio_data[start : start + self.chunk_size]
+
+    def _make_request_generator(self, chunks, sample_rate):
+        """
+        Build the PushAudioStreamRequest generator: a start marker followed by
+        one request per audio chunk.
+        """
+        start_marker = audio2face_pb2.PushAudioRequestStart(
+            samplerate=sample_rate,
+            instance_name=self.player_instance,
+            block_until_playback_is_finished=self.block_until_playback_is_finished,
+        )
+        yield audio2face_pb2.PushAudioStreamRequest(start_marker=start_marker)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_audio_start(sample_rate)
+        for chunk in chunks:
+            if recorder is not None:
+                recorder.record_audio(chunk)
+            with span("chunk", "grpc", samples=len(chunk)):
+                request = audio2face_pb2.PushAudioStreamRequest(
+                    audio_data=chunk.astype(np.float32, copy=False).tobytes()
+                )
+            yield request
+
+    def _use_unary_push(self, n_samples: int, sample_rate: int) -> bool:
+        """
+        Whether an audio of n_samples is pushed with the unary PushAudio call.
+        """
+        if self.push_mode == PUSH_MODE_STREAM:
+            return False
+        fits = n_samples * 4 <= UNARY_PUSH_MAX_BYTES
+        if self.push_mode == PUSH_MODE_UNARY:
+            if not fits:
+                raise ValueError(
+                    "Audio2FaceStream: Audio too long for a unary push, use the "
+                    "stream push mode."
+                )
+            return True
+        return fits and n_samples <= self.unary_max_seconds * sample_rate
+
     def _push_audio_stream(self, audio_data, sample_rate):
         """
-        This function pushes audio chunks sequentially via PushAudioStreamRequest()
+        This function pushes the audio to A2F, with PushAudio if it is short
+        (see push_mode), else chunk by chunk via PushAudioStreamRequest()
         See grpc folder for details about grpc
         """
+        if self._use_unary_push(len(audio_data), sample_rate):
+            self._push_audio_unary(audio_data, sample_rate)
+        else:
+            self._push_audio_chunks(self._iter_audio_chunks(audio_data), sample_rate)
+
+    def _first_frame_check(self):
+        """
+        Callable telling whether a frame has been received since now, None
+        without LiveLink.
+        """
+        if not self.use_livelink or self.livelink_listener is None:
+            return None
+        listener = self.livelink_listener
+        frames_before = listener.frames_received
+        return lambda: listener.frames_received > frames_before
+
+    @traced(category="grpc")
+    def _push_audio_chunks(self, chunks, sample_rate):
+        """
+        Push an iterable of audio chunks via PushAudioStreamRequest().
+        Chunks are consumed lazily, so they can be produced from a file.
+        """
+        if self.chunk_sizer is not None:
+            chunks = self.chunk_sizer.iter_chunks(
+                chunks, sample_rate, self._first_frame_check()
+            )
+        request_generator = self._make_request_generator(chunks, sample_rate)
+        logging.info("Audio2FaceStream: Streaming Audio Data to A2F Instance")
+        self._call_push("PushAudioStream", request_generator)
+
+    @traced(category="grpc")
+    def _push_audio_unary(self, audio_data, sample_rate):
+        """
+        Push a whole audio with a single PushAudio call, which saves the
+        stream setup of PushAudioStream on short audios.
+        """
+        audio_data = np.asarray(audio_data, dtype=np.float32)
+        recorder = self.recorder
+        if recorder is not None:
+            recorder.record_audio_start(sample_rate)
+            recorder.record_audio(audio_data)
+        request = audio2face_pb2.PushAudioRequest(
+            audio_data=audio_data.tobytes(),
+            samplerate=sample_rate,
+            instance_name=self.player_instance,
+            block_until_playback_is_finished=self.block_until_playback_is_finished,
+        )
+        logging.info("Audio2FaceStream: Pushing Audio Data to A2F Instance")
+        self._call_push("PushAudio", request)
+
+    def _call_push(self, method: str, request, use_push_timeout: bool = True):
+        """
+        Run a PushAudio or PushAudioStream call under the current deadline.
+        :param method: Name of the RPC.
+        :param request: Request, or request iterator of a streaming RPC.
+        :param use_push_timeout: Bound the call by push_timeout. Calls kept
+            open across several audios (see UtteranceQueue) do not.
+        """
+        deadline = current_deadline()
+        timeout = self.push_timeout if use_push_timeout else None
+        if deadline is not None:
+            deadline.check()
+            timeout = deadline.timeout(timeout)
+
         with grpc.insecure_channel(self.grpc_url) as channel:
             logging.debug("Audio2FaceStream: Created gRPC Channel")
             stub = audio2face_pb2_grpc.Audio2FaceStub(channel)
-
-            def make_generator():
-                start_marker = audio2face_pb2.PushAudioRequestStart(
-                    samplerate=sample_rate,
-                    instance_name=DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE,
-                    block_until_playback_is_finished=self.block_until_playback_is_finished,
-                )
-                yield audio2face_pb2.PushAudioStreamRequest(start_marker=start_marker)
-                for i in range(len(audio_data) // self.chunk_size + 1):
-                    # time.sleep(self.sleep_between_chunks)
-                    chunk = audio_data[
-                        i * self.chunk_size : i * self.chunk_size + self.chunk_size
-                    ]
-                    yield audio2face_pb2.PushAudioStreamRequest(
-                        audio_data=chunk.astype(np.float32).tobytes()
-                    )
-
-            request_generator = make_generator()
-            logging.info("Audio2FaceStream: Streaming Audio Data to A2F Instance")
-            response = stub.PushAudioStream(request_generator)
+            future = getattr(stub, method).future(request, timeout=timeout)
+            if deadline is not None:
+                deadline.add_cancel_callback(future.cancel)
+            try:
+                response = future.result()
+            except grpc.FutureCancelledError as e:
+                raise CancelledError("Audio2FaceStream: Audio push cancelled.") from e
+            except grpc.RpcError as e:
+                if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                    raise TimeoutError(
+                        "Audio2FaceStream: Audio push deadline exceeded."
+                    ) from e
+                raise
+            finally:
+                if deadline is not None:
+                    deadline.remove_cancel_callback(future.cancel)
 
             if response.success:
                 logging.info("Audio2FaceStream: Audio Streamed Successfully")
@@ -342,9 +1052,10 @@ class Audio2FaceStream(Audio2Face):
                 logging.error(f"Audio2FaceStream: ERROR: {response.message}")
         logging.debug("Audio2FaceStream: Closed gRPC Channel")
 
+    @traced()
     def enable_stream_livelink(self, enable: bool = True):
 
-        payload = {"node_path": DEFAULT_STREAM_LIVELINK, "value": enable}
+        payload = {"node_path": self.livelink_node, "value": enable}
         res = self.http_client.post(
             "A2F/Exporter/ActivateStreamLivelink", payload=payload
         )
@@ -355,10 +1066,16 @@ class Audio2FaceStream(Audio2Face):
             logging.error("Audio2FaceStream: Failed to activate Stream Livelink.")
         return res
 
-    def set_livelink_settings(
-        self, livelink_settings: dict = LIVELINK_DEFAULT_SETTINGS
-    ):
-        payload = {"node_path": DEFAULT_STREAM_LIVELINK, "values": livelink_settings}
+    @traced()
+    def set_livelink_settings(self, livelink_settings: dict = None):
+        if livelink_settings is None:
+            livelink_settings = dict(
+                LIVELINK_DEFAULT_SETTINGS,
+                livelink_port=self.livelink_port,
+                audio_port=self.audio_port,
+                enable_audio_stream=self.receive_audio,
+            )
+        payload = {"node_path": self.livelink_node, "values": livelink_settings}
         res = self.http_client.post(
             "/A2F/Exporter/SetStreamLivelinkSettings", payload=payload
         )
@@ -368,32 +1085,29 @@ class Audio2FaceStream(Audio2Face):
         else:
             logging.error("Audio2FaceStream: Failed to set Stream Livelink settings.")
 
+    @traced()
     def get_livelink_settings(self):
 
-        # Get the status of LiveLink
+        # Get the status of LiveLink and its settings, both requests are independent
         payload = {
-            "node_path": DEFAULT_STREAM_LIVELINK,
+            "node_path": self.livelink_node,
         }
-        res = self.http_client.post(
-            "/A2F/Exporter/IsStreamLivelinkConnected", payload=payload
+        res_state, res = self.http_client.post_many(
+            [
+                ("/A2F/Exporter/IsStreamLivelinkConnected", payload),
+                ("/A2F/Exporter/GetStreamLivelinkSettings", payload),
+            ]
         )
-        logging.debug(f"Audio2FaceStream: {res}")
-        if res.get("status") == "OK":
-            if res.get("result"):
+        logging.debug(f"Audio2FaceStream: {res_state}")
+        if res_state.get("status") == "OK":
+            if res_state.get("result"):
                 logging.info("Audio2FaceStream: Stream Livelink is connected.")
             else:
                 logging.warning("Audio2FaceStream: Stream Livelink is not connected.")
         else:
             logging.error("Audio2FaceStream: Failed to connect Stream Livelink.")
-        state = res.get("result")
+        state = res_state.get("result")
 
-        # Get Livelink settings
-        payload = {
-            "node_path": DEFAULT_STREAM_LIVELINK,
-        }
-        res = self.http_client.post(
-            "/A2F/Exporter/GetStreamLivelinkSettings", payload=payload
-        )
         logging.debug(f"Audio2FaceStream: {res}")
         if res.get("status") == "OK":
             logging.info("Audio2FaceStream: Stream Livelink settings retrieved.")
@@ -405,10 +1119,17 @@ class Audio2FaceStream(Audio2Face):
         settings["connected"] = state
         return settings
 
+    @traced()
     def end_a2f_connection(self):
         if self.use_livelink:
             self.enable_stream_livelink(False)  # To close the socket
+            self.stop_recording()
             self.livelink_listener.stop()
             self.livelink_listener.join()
             self.frames_buffer.flush()
+            if self.audio_receiver is not None:
+                self.audio_receiver.stop()
+                self.audio_receiver.join()
+                self.audio_receiver = None
+            self._stop_sink_writer(close_sinks=True)
             logging.info("Audio2FaceStream: Closed gRPC Channel and stopped listener.")
@@ -14,13 +14,37 @@ DEFAULT_SOLVER_INSTANCE = "/World/audio2face/BlendshapeSolve"
 # For
 DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE = "/World/audio2face/PlayerStreaming"
 DEFAULT_AUDIO_STREAM_GRPC_PORT = 50051
+# Audios up to this length are pushed with the unary PushAudio call in the
+# "auto" push mode, longer ones are streamed. The player only starts once the
+# unary request is fully received, so its time to first frame grows with the
+# clip size over the link: bench_push_mode.py measures unary as fast at every
+# length on loopback, up to ~2 s over 1 Gbit/s and ~0.5 s over 300 Mbit/s.
+UNARY_PUSH_MAX_SECONDS = 1.0
+# The unary request must fit in a gRPC message (4 MiB by default)
+UNARY_PUSH_MAX_BYTES = 4 * 1024 * 1024 - 4096
 PATH_PING_AUDIO = "./assets/ping.mp3"
 
+# Timeout of each HTTP request to the A2F server, in seconds
+DEFAULT_HTTP_TIMEOUT = 120.0
+# Timeout of the requests whose duration grows with the audio length (exports,
+# emotion key generation), None for no limit. A deadline still bounds them.
+LONG_HTTP_TIMEOUT = None
+
+# Readiness polling of a starting A2F server (exponential backoff, in seconds)
+API_READINESS_INITIAL_DELAY = 0.1
+API_READINESS_MAX_DELAY = 2.0
+
+# Period at which a session waiting for another one of the same object checks
+# its deadline and cancellation, in seconds
+SESSION_LOCK_POLL_INTERVAL = 0.05
+
 # For LiveLink Streaming
 DEFAULT_STREAM_LIVELINK = "/World/audio2face/StreamLivelink"
 LIVELINK_LISTENING_INTERFACE = "localhost"
 LIVELINK_LISTENING_PORT = 12030
 LIVELINK_AUDIO_PORT = 12031
+LIVELINK_READY_TIMEOUT = 5.0  # Max wait for the listener socket to be bound
+LIVELINK_ACCEPT_TIMEOUT = 1.0  # Period at which the listener checks for stop
 
 LIVELINK_DEFAULT_SETTINGS = {
     "audio_port": LIVELINK_AUDIO_PORT,
@@ -0,0 +1,51 @@
+import logging
+
+import numpy as np
+import soundfile
+
+
+def get_audio_file_info(file_path: str):
+    """
+    Read the header of an audio file without loading its samples.
+    :param file_path: Path to the audio file.
+    :return: Tuple (sample_rate, number of samples, number of channels).
+    """
+    info = soundfile.info(file_path)
+    return info.samplerate, info.frames, info.channels
+
+
+def iter_audio_file_chunks(file_path: str, chunk_size: int):
+    """
+    Read an audio file block by block, as mono float32 chunks.
+
+    Only one block of ``chunk_size`` samples is held in memory at any time, so
+    arbitrarily long recordings can be streamed. Multi-channel audio is averaged
+    to mono, as A2F only supports mono audio.
+
+    :param file_path: Path to the audio file (any format supported by soundfile).
+    :param chunk_size: Number of samples per chunk.
+    :return: Generator of 1-D float32 arrays of at most ``chunk_size`` samples.
+    """
+    if chunk_size <= 0:
+        raise ValueError("AudioFile: chunk_size must be a positive integer.")
+
+    with soundfile.SoundFile(file_path, mode="r") as audio_file:
+        logging.debug(
+            f"AudioFile: Reading {file_path} ({audio_file.frames} samples, "
+            f"{audio_file.channels} channels) in chunks of {chunk_size}"
+        )
+        # Reused read buffer, the yielded chunks are fresh mono arrays
+        block = np.empty((chunk_size, audio_file.channels), dtype=np.float32)
+        while True:
+            n_read = audio_file.read(
+                frames=chunk_size, dtype="float32", always_2d=True, out=block
+            )
+            n_read = len(n_read)
+            if n_read == 0:
+                break
+            if audio_file.channels == 1:
+                yield block[:n_read, 0].copy()
+            else:
+                yield block[:n_read].mean(axis=1, dtype=np.float32)
+            if n_read < chunk_size:
+                break
@@ -0,0 +1,334 @@
+"""
+Receives the audio that the LiveLink node streams on its audio port
+(enable_audio_stream / audio_port of the LiveLink settings), and pairs it with
+the received frames, so that a player gets audio and animation already in sync.
+
+The audio port uses the framing of the frame port: an 8-byte big-endian size,
+then the payload. A JSON object payload describes the format of the samples
+that follow (sample rate, channels, bits per sample), any other payload is
+interleaved PCM: 8-bit unsigned, 16-bit signed or 32-bit float.
+"""
+
+import json
+import logging
+import threading
+from collections import deque
+
+import numpy as np
+
+from audio2face_api.A2F_CONFIG import LIVELINK_ACCEPT_TIMEOUT, LIVELINK_AUDIO_PORT
+from audio2face_api.LiveLink import ACK_NONE, HEADER_SIZE, LiveLinkListener
+
+DEFAULT_AUDIO_SAMPLE_RATE = 16000
+
+# Keys of the format header, lower case
+_SAMPLE_RATE_KEYS = ("samplerate", "sample_rate", "samplespersecond")
+_CHANNELS_KEYS = ("channels", "numchannels", "num_channels")
+_BITS_KEYS = ("bitspersample", "bits_per_sample")
+_PCM_TYPES = {8: np.uint8, 16: np.int16, 32: np.float32}
+
+
+def _header_value(header: dict, keys: tuple, default):
+    for key, value in header.items():
+        if key.lower() in keys:
+            return int(value)
+    return default
+
+
+def pcm_to_float32(payload: bytes, bits_per_sample: int, channels: int) -> np.ndarray:
+    """
+    Convert interleaved PCM bytes to float32 samples in [-1, 1].
+    :return: (n_samples, channels) array.
+    """
+    if bits_per_sample not in _PCM_TYPES:
+        raise ValueError(f"AudioStream: Unsupported sample size {bits_per_sample}.")
+    dtype = _PCM_TYPES[bits_per_sample]
+    frame_bytes = channels * bits_per_sample // 8
+    payload = payload[: len(payload) - len(payload) % frame_bytes]
+    samples = np.frombuffer(payload, dtype=dtype).reshape(-1, channels)
+    if dtype == np.int16:
+        return samples.astype(np.float32) / 32768.0
+    if dtype == np.uint8:
+        return (samples.astype(np.float32) - 128.0) / 128.0
+    return samples.astype(np.float32)
+
+
+class AudioRingBuffer:
+    """
+    The last capacity_seconds of a stream of samples, addressed by their
+    position since the start of the stream.
+    """
+
+    def __init__(
+        self,
+        capacity_seconds: float = 10.0,
+        sample_rate: int = DEFAULT_AUDIO_SAMPLE_RATE,
+        channels: int = 1,
+    ):
+        self.capacity_seconds = capacity_seconds
+        self.lock = threading.Lock()
+        self.start_stream(sample_rate, channels)
+
+    def start_stream(self, sample_rate: int, channels: int):
+        """
+        Set the format of the samples, which clears the buffer if it changed.
+        """
+        with self.lock:
+            if (
+                getattr(self, "sample_rate", None) == sample_rate
+                and getattr(self, "channels", None) == channels
+            ):
+                return
+            self.sample_rate = sample_rate
+            self.channels = channels
+            self.capacity = max(1, int(self.capacity_seconds * sample_rate))
+            self.data = np.zeros((self.capacity, channels), dtype=np.float32)
+            self.samples_written = 0
+
+    def reset(self):
+        with self.lock:
+            self.samples_written = 0
+
+    def add(self, samples: np.ndarray):
+        """
+        Append (n, channels) samples, overwriting the oldest ones.
+        """
+        with self.lock:
+            end = self.samples_written + len(samples)
+            n = min(len(samples), self.capacity)
+            self.data[np.arange(end - n, end) % self.capacity] = samples[
+                len(samples) - n :
+            ]
+            self.samples_written = end
+
+    def read(self, start: int, end: int) -> np.ndarray:
+        """
+        Copy of the samples [start, end) of the stream. Samples that were
+        overwritten or not received yet are zeros.
+        :return: (end - start, channels) array.
+        """
+        out = np.zeros((max(0, end - start), self.channels), dtype=np.float32)
+        with self.lock:
+            first = max(start, self.samples_written - self.capacity, 0)
+            last = min(end, self.samples_written)
+            if last > first:
+                positions = np.arange(first, last)
+                out[first - start : last - start] = self.data[positions % self.capacity]
+        return out
+
+
+class AVChunk:
+    """Frames and the audio they animate."""
+
+    def __init__(
+        self,
+        frame_index: int,
+        frames: list,
+        audio: np.ndarray,
+        sample_rate: int,
+        fps: float,
+    ):
+        """
+        :param frame_index: Index of the first frame since the session start.
+        :param audio: (n_samples, channels) float32 samples.
+        """
+        self.frame_index = frame_index
+        self.frames = frames
+        self.audio = audio
+        self.sample_rate = sample_rate
+        self.fps = fps
+
+    @property
+    def start_time(self) -> float:
+        """Time of the first frame since the session start, in seconds."""
+        return self.frame_index / self.fps
+
+    @property
+    def duration(self) -> float:
+        return len(self.frames) / self.fps
+
+
+class AVSyncBuffer:
+    """
+    Keeps the audio received on the LiveLink audio port in a ring buffer next
+    to the received frames, and hands them out as A/V-aligned chunks.
+
+    Frame k of a session animates the audio from k / fps to (k + 1) / fps, so
+    a chunk is ready as soon as both its frames and its samples arrived, and
+    can be played at once. Call reset() at the start of each session.
+    """
+
+    def __init__(
+        self,
+        fps: float = 30,
+        capacity_seconds: float = 10.0,
+        sample_rate: int = DEFAULT_AUDIO_SAMPLE_RATE,
+        channels: int = 1,
+    ):
+        """
+        :param capacity_seconds: Audio and frames kept for the reader, older
+            ones are dropped (and counted in frames_dropped).
+        """
+        self.fps = fps
+        self.audio = AudioRingBuffer(capacity_seconds, sample_rate, channels)
+        self.max_frames = max(1, int(capacity_seconds * fps))
+        self.condition = threading.Condition()
+        self.frames = deque()
+        self.frames_dropped = 0
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new session: drop the frames and the audio received so far.
+        """
+        with self.condition:
+            self.frames.clear()
+            self._frames_received = 0
+            self._next_frame = 0
+            self.audio.reset()
+
+    def start_stream(self, sample_rate: int, channels: int):
+        with self.condition:
+            self.audio.start_stream(sample_rate, channels)
+
+    def add(self, samples: np.ndarray):
+        """
+        Append received audio samples (LiveLinkAudioReceiver buffer).
+        """
+        with self.condition:
+            self.audio.add(samples)
+            self.condition.notify_all()
+
+    def add_frame(self, frame):
+        """
+        Append a received frame (LiveLinkListener consumer).
+        """
+        with self.condition:
+            self.frames.append(frame)
+            self._frames_received += 1
+            if len(self.frames) > self.max_frames:
+                self.frames.popleft()
+                if self._next_frame < self._frames_received - self.max_frames:
+                    self._next_frame += 1
+                    self.frames_dropped += 1
+            self.condition.notify_all()
+
+    def _sample(self, frame_index: int) -> int:
+        return int(round(frame_index * self.audio.sample_rate / self.fps))
+
+    def _ready(self, n_frames: int) -> bool:
+        end = self._next_frame + n_frames
+        return (
+            self._frames_received >= end
+            and self.audio.samples_written >= self._sample(end)
+        )
+
+    def _take(self, n_frames: int) -> AVChunk:
+        start = self._next_frame
+        n_frames = min(n_frames, self._frames_received - start)
+        first = len(self.frames) - (self._frames_received - start)
+        frames = [self.frames[first + i] for i in range(n_frames)]
+        for _ in range(first + n_frames):
+            self.frames.popleft()
+        self._next_frame += n_frames
+        audio = self.audio.read(self._sample(start), self._sample(start + n_frames))
+        return AVChunk(start, frames, audio, self.audio.sample_rate, self.fps)
+
+    def get_chunk(self, n_frames: int = 1, timeout: float = None) -> AVChunk:
+        """
+        Wait for the next n_frames frames and their audio.
+        :param timeout: Max wait in seconds, None to wait forever.
+        :return: The chunk, None on timeout.
+        """
+        with self.condition:
+            if not self.condition.wait_for(lambda: self._ready(n_frames), timeout):
+                return None
+            return self._take(n_frames)
+
+    def drain(self) -> AVChunk:
+        """
+        The remaining frames, with the audio received for them (zeros where
+        it is missing), at the end of a session.
+        :return: The chunk, None if no frame is left.
+        """
+        with self.condition:
+            if self._next_frame >= self._frames_received:
+                return None
+            return self._take(self._frames_received - self._next_frame)
+
+    def iter_chunks(self, n_frames: int = 1, timeout: float = 1.0):
+        """
+        Yield the chunks as they become ready, until no chunk arrives for
+        timeout seconds. The remaining frames are yielded last.
+        """
+        while True:
+            chunk = self.get_chunk(n_frames, timeout)
+            if chunk is None:
+                break
+            yield chunk
+        chunk = self.drain()
+        if chunk is not None:
+            yield chunk
+
+
+class LiveLinkAudioReceiver(LiveLinkListener):
+    """
+    Receives the audio stream of the LiveLink node, into an AudioRingBuffer or
+    an AVSyncBuffer.
+    """
+
+    def __init__(
+        self,
+        ip: str = "localhost",
+        port: int = LIVELINK_AUDIO_PORT,
+        buffer=None,
+        ack_policy: str = ACK_NONE,
+        sample_rate: int = DEFAULT_AUDIO_SAMPLE_RATE,
+        channels: int = 1,
+        bits_per_sample: int = 16,
+        accept_timeout: float = LIVELINK_ACCEPT_TIMEOUT,
+    ):
+        """
+        :param buffer: AudioRingBuffer or AVSyncBuffer receiving the samples.
+        :param sample_rate: Format of the samples until a format header arrives.
+        """
+        super().__init__(
+            ip=ip,
+            port=port,
+            buffer=buffer if buffer is not None else AudioRingBuffer(),
+            ack_policy=ack_policy,
+            accept_timeout=accept_timeout,
+        )
+        self.sample_rate = sample_rate
+        self.channels = channels
+        self.bits_per_sample = bits_per_sample
+        self.samples_received = 0
+        self.buffer.start_stream(sample_rate, channels)
+
+    def _unpack_block(self, block: bytes) -> np.ndarray:
+        """
+        Convert a block into (n, channels) float32 samples. A format header
+        updates the format and gives no sample.
+        """
+        payload = block[HEADER_SIZE:]
+        if payload[:1] == b"{":
+            try:
+                header = json.loads(payload)
+            except ValueError:
+                header = None
+            if isinstance(header, dict):
+                self._set_format(header)
+                return np.zeros((0, self.channels), dtype=np.float32)
+        samples = pcm_to_float32(payload, self.bits_per_sample, self.channels)
+        self.samples_received += len(samples)
+        return samples
+
+    def _set_format(self, header: dict):
+        self.sample_rate = _header_value(header, _SAMPLE_RATE_KEYS, self.sample_rate)
+        self.channels = _header_value(header, _CHANNELS_KEYS, self.channels)
+        self.bits_per_sample = _header_value(header, _BITS_KEYS, self.bits_per_sample)
+        self.buffer.start_stream(self.sample_rate, self.channels)
+        logging.info(
+            f"LiveLinkAudioReceiver: Audio format {self.sample_rate} Hz, "
+            f"{self.channels} channel(s), {self.bits_per_sample} bits"
+        )
@@ -0,0 +1,420 @@
+"""
+Resumable batch export of blendshapes, spread over one or more A2F endpoints.
+
+    a2f-batch-export manifest.txt --scene ./assets/mark_solved.usd \
+        --output-dir ./output --endpoint http://host1:8011 --endpoint http://host2:8011
+
+The manifest lists the audio files, one path per line (.txt) or one JSON
+object per line (.jsonl: {"audio": path, "output_name": name}). Every finished
+file is appended to a checkpoint file, so a restarted job skips it.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from collections import deque
+
+from audio2face_api.A2F import Audio2FaceDirect
+from audio2face_api.VAD import SilenceTrimmer
+
+
+class ExportJob:
+    """One audio file to export."""
+
+    def __init__(self, audio_path: str, output_name: str = None):
+        self.audio_path = os.path.abspath(audio_path)
+        self.output_name = (
+            output_name or os.path.splitext(os.path.basename(audio_path))[0]
+        )
+        self.attempts = 0
+
+    @property
+    def key(self) -> str:
+        return f"{self.audio_path}|{self.output_name}"
+
+
+def read_manifest(path: str) -> list:
+    """
+    Read the jobs of a manifest: a directory (its .wav files), a .jsonl file
+    ({"audio": path, "output_name": name} per line) or a text file (one audio
+    path per line). Relative paths are relative to the manifest.
+    """
+    if os.path.isdir(path):
+        return [
+            ExportJob(os.path.join(path, name))
+            for name in sorted(os.listdir(path))
+            if name.endswith(".wav")
+        ]
+    base_dir = os.path.dirname(os.path.abspath(path))
+    jobs = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            if path.endswith(".jsonl"):
+                entry = json.loads(line)
+                audio, output_name = entry["audio"], entry.get("output_name")
+            else:
+                audio, output_name = line, None
+            jobs.append(ExportJob(os.path.join(base_dir, audio), output_name))
+    return jobs
+
+
+class Checkpoint:
+    """Append-only JSONL record of the finished jobs."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # Last line cut by a crash
+                        continue
+                    if entry.get("status") == "done":
+                        self.done.add(entry["key"])
+        parent = os.path.dirname(os.path.abspath(path))
+        if not os.path.exists(parent):
+            os.makedirs(parent)
+        self.file = open(path, "a", encoding="utf-8")
+        if self.file.tell() > 0:
+            # Do not append to a line cut by a crash
+            self.file.write("\n")
+        self.lock = threading.Lock()
+
+    def record(self, job: ExportJob, status: str, **info):
+        entry = {"key": job.key, "audio": job.audio_path, "status": status, **info}
+        with self.lock:
+            self.file.write(json.dumps(entry) + "\n")
+            self.file.flush()
+            if status == "done":
+                self.done.add(job.key)
+
+    def close(self):
+        self.file.close()
+
+
+class Progress:
+    """Counts finished jobs, and estimates the throughput and the time left."""
+
+    def __init__(self, total: int, window: int = 50):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.start_time = time.monotonic()
+        self._finish_times = deque(maxlen=window)
+        self.lock = threading.Lock()
+
+    def add(self, success: bool):
+        with self.lock:
+            if success:
+                self.done += 1
+                self._finish_times.append(time.monotonic())
+            else:
+                self.failed += 1
+
+    def rate(self) -> float:
+        """
+        Jobs per second, over the recent jobs.
+        """
+        with self.lock:
+            times = list(self._finish_times)
+        if len(times) >= 2:
+            return (len(times) - 1) / max(times[-1] - times[0], 1e-9)
+        elapsed = time.monotonic() - self.start_time
+        return len(times) / elapsed if elapsed > 0 else 0.0
+
+    def format(self) -> str:
+        rate = self.rate()
+        remaining = self.total - self.done - self.failed
+        eta_str = "--"
+        if rate > 0:
+            # Hours are not wrapped at 24, large batches can take days
+            minutes, seconds = divmod(round(remaining / rate), 60)
+            hours, minutes = divmod(minutes, 60)
+            eta_str = f"{hours}:{minutes:02d}:{seconds:02d}"
+        return (
+            f"{self.done}/{self.total} done, {self.failed} failed, "
+            f"{rate * 60:.1f} clips/min, ETA {eta_str}"
+        )
+
+
+class ExportWorker(threading.Thread):
+    """Exports the queued jobs on one endpoint."""
+
+    def __init__(self, api_url: str, jobs: queue.Queue, runner, a2f_kwargs: dict):
+        super().__init__(daemon=True, name=f"ExportWorker-{api_url}")
+        self.api_url = api_url
+        self.jobs = jobs
+        self.runner = runner
+        self.a2f = Audio2FaceDirect(api_url=api_url, **a2f_kwargs)
+        self.initialized = False
+        # After a failure the endpoint may have restarted with an empty stage,
+        # which the scene registry cannot know
+        self.needs_reload = False
+
+    def _init(self):
+        self.a2f.init_A2F(
+            wait_timeout=self.runner.wait_timeout, force_reload=self.needs_reload
+        )
+        self.a2f.a2e.set_auto_emotion_detect(auto_detect=False)
+        self.initialized = True
+        self.needs_reload = False
+        logging.info(f"ExportWorker: {self.api_url} ready")
+
+    def run(self):
+        failures = 0
+        while not self.runner.finished.is_set():
+            if not self.initialized:
+                try:
+                    self._init()
+                    failures = 0
+                except Exception as e:
+                    failures += 1
+                    logging.error(f"ExportWorker: {self.api_url} unavailable: {e}")
+                    if failures >= self.runner.max_init_failures:
+                        logging.error(f"ExportWorker: Giving up on {self.api_url}")
+                        break
+                    time.sleep(min(30.0, 2.0**failures))
+                    continue
+            try:
+                job = self.jobs.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            try:
+                self._export(job)
+            except FileNotFoundError as e:
+                self.runner.retry_or_fail(job, e, self.api_url, retry=False)
+            except Exception as e:
+                # The endpoint may have crashed, initialize it again
+                self.initialized = False
+                self.needs_reload = True
+                self.a2f.audio_root_path = None
+                self.runner.retry_or_fail(job, e, self.api_url)
+            finally:
+                self.jobs.task_done()
+        self.runner.worker_exited()
+
+    def _export(self, job: ExportJob):
+        job.attempts += 1
+        start_time = time.monotonic()
+        audio_dir = os.path.dirname(job.audio_path)
+        if self.a2f.audio_root_path != audio_dir:
+            self.a2f.set_audio_root_path(audio_dir)
+            if self.a2f.audio_root_path != audio_dir:
+                raise ConnectionError(
+                    f"ExportWorker: Failed to set the audio root path {audio_dir}."
+                )
+        res = self.a2f.export_blendshapes(
+            audio_name=os.path.basename(job.audio_path),
+            output_dir=self.runner.output_dir,
+            output_name=job.output_name,
+            timeout=self.runner.job_timeout,
+        )
+        if res.get("status") != "OK":
+            raise ValueError(f"ExportWorker: Export failed: {res.get('message')}")
+        self.runner.job_done(job, self.api_url, time.monotonic() - start_time)
+
+
+def _check_output_names(jobs: list):
+    """
+    Raise a ValueError if two audio files would be exported to the same output
+    name, which would overwrite each other in the output directory.
+    """
+    owners = {}
+    for job in jobs:
+        name = os.path.normcase(job.output_name)
+        owner = owners.setdefault(name, job.audio_path)
+        if owner != job.audio_path:
+            raise ValueError(
+                f"BatchExport: {owner} and {job.audio_path} have the same output "
+                f"name {job.output_name}, set output_name in a .jsonl manifest."
+            )
+
+
+class BatchExportRunner:
+    """Runs the jobs of a manifest on a set of endpoints."""
+
+    def __init__(
+        self,
+        jobs: list,
+        endpoints: list,
+        output_dir: str,
+        checkpoint_path: str,
+        a2f_kwargs: dict,
+        retries: int = 2,
+        wait_timeout: float = 60.0,
+        job_timeout: float = None,
+        max_init_failures: int = 10,
+    ):
+        _check_output_names(jobs)
+        self.output_dir = os.path.abspath(output_dir)
+        self.checkpoint = Checkpoint(checkpoint_path)
+        self.retries = retries
+        self.wait_timeout = wait_timeout
+        self.job_timeout = job_timeout
+        self.max_init_failures = max_init_failures
+        self.finished = threading.Event()
+
+        pending = [job for job in jobs if job.key not in self.checkpoint.done]
+        self.skipped = len(jobs) - len(pending)
+        self.progress = Progress(len(pending))
+        self.jobs = queue.Queue()
+        for job in pending:
+            self.jobs.put(job)
+        self._remaining = len(pending)
+        self._lock = threading.Lock()
+        self._live_workers = len(endpoints)
+        self.workers = [
+            ExportWorker(api_url, self.jobs, self, a2f_kwargs) for api_url in endpoints
+        ]
+
+    def _finish_job(self):
+        with self._lock:
+            self._remaining -= 1
+            if self._remaining == 0:
+                self.finished.set()
+
+    def job_done(self, job: ExportJob, api_url: str, seconds: float):
+        self.checkpoint.record(job, "done", endpoint=api_url, seconds=round(seconds, 3))
+        self.progress.add(True)
+        self._finish_job()
+
+    def retry_or_fail(
+        self, job: ExportJob, error: Exception, api_url: str, retry: bool = True
+    ):
+        logging.warning(
+            f"BatchExport: {job.audio_path} failed on {api_url} "
+            f"(attempt {job.attempts}): {error}"
+        )
+        if retry and job.attempts <= self.retries:
+            self.jobs.put(job)
+            return
+        # Not marked done, so the next run retries it
+        self.checkpoint.record(job, "failed", endpoint=api_url, error=str(error))
+        self.progress.add(False)
+        self._finish_job()
+
+    def worker_exited(self):
+        with self._lock:
+            self._live_workers -= 1
+            if self._live_workers == 0:
+                self.finished.set()
+
+    def run(self, report_interval: float = 2.0, stream=sys.stderr) -> bool:
+        """
+        Run the jobs, reporting the progress every report_interval seconds.
+        :return: True if every job is done.
+        """
+        logging.info(
+            f"BatchExport: {self.progress.total} clips to export, "
+            f"{self.skipped} already done, on {len(self.workers)} endpoint(s)"
+        )
+        if self.progress.total == 0:
+            self.checkpoint.close()
+            return True
+        for worker in self.workers:
+            worker.start()
+        interactive = stream.isatty()
+        while not self.finished.wait(report_interval):
+            if interactive:
+                stream.write(f"\r{self.progress.format()}   ")
+                stream.flush()
+            else:
+                logging.info(f"BatchExport: {self.progress.format()}")
+        if interactive:
+            stream.write("\n")
+        logging.info(f"BatchExport: {self.progress.format()}")
+        self.checkpoint.close()
+        return self.progress.done == self.progress.total
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        prog="a2f-batch-export",
+        description="Export the blendshapes of the audio files of a manifest, "
+        "resuming where a previous run stopped.",
+    )
+    parser.add_argument(
+        "manifest", help="Directory of .wav files, .txt or .jsonl manifest"
+    )
+    parser.add_argument("--scene", required=True, help="USD scene to load")
+    parser.add_argument("--output-dir", default="./output")
+    parser.add_argument(
+        "--endpoint",
+        action="append",
+        dest="endpoints",
+        help="A2F API URL, repeat for several endpoints (default http://localhost:8011)",
+    )
+    parser.add_argument(
+        "--checkpoint", help="Checkpoint file (default <output-dir>/checkpoint.jsonl)"
+    )
+    parser.add_argument("--fps", type=int, default=30)
+    parser.add_argument(
+        "--retries", type=int, default=2, help="Retries of a failed clip"
+    )
+    parser.add_argument(
+        "--wait-timeout",
+        type=float,
+        default=60.0,
+        help="Time to wait for a (re)starting endpoint, in seconds",
+    )
+    parser.add_argument(
+        "--job-timeout", type=float, default=None, help="Deadline of each clip"
+    )
+    parser.add_argument(
+        "--global-emotion",
+        type=json.loads,
+        default=None,
+        help="Global emotion as JSON, e.g. '{\"joy\": 0.9}'",
+    )
+    parser.add_argument(
+        "--use-keyframes", action="store_true", help="Detect emotion keyframes"
+    )
+    parser.add_argument(
+        "--trim-silence", action="store_true", help="Skip silences (see VAD.py)"
+    )
+    parser.add_argument("--log-level", default="INFO")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    logging.basicConfig(level=args.log_level.upper())
+    jobs = read_manifest(args.manifest)
+    a2f_kwargs = {
+        "scene_path": args.scene,
+        "fps": args.fps,
+        "use_keyframes": args.use_keyframes,
+        "use_global_emotion": args.global_emotion is not None,
+        "global_emotion": args.global_emotion,
+        "vad": SilenceTrimmer() if args.trim_silence else None,
+    }
+    try:
+        runner = BatchExportRunner(
+            jobs,
+            args.endpoints or ["http://localhost:8011"],
+            args.output_dir,
+            args.checkpoint or os.path.join(args.output_dir, "checkpoint.jsonl"),
+            a2f_kwargs,
+            retries=args.retries,
+            wait_timeout=args.wait_timeout,
+            job_timeout=args.job_timeout,
+        )
+    except ValueError as e:
+        logging.error(e)
+        return 1
+    return 0 if runner.run() else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
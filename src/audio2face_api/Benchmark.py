@@ -0,0 +1,224 @@
+import json
+import logging
+import multiprocessing
+import platform
+import threading
+import time
+import tracemalloc
+from collections import deque
+from importlib import metadata
+
+import numpy as np
+
+from audio2face_api.Buffer import Buffer
+from audio2face_api.Decoder import WeightsDecoder
+from audio2face_api.LiveLink import ACK_PER_FRAME, LiveLinkListener
+from audio2face_api.LiveLinkSender import SyntheticLiveLinkSender, make_synthetic_blocks
+
+# Decoders and buffers compared by default, by name
+DEFAULT_DECODERS = {
+    "json": lambda: None,
+    "weights": WeightsDecoder,
+}
+DEFAULT_BUFFERS = {
+    "Buffer": Buffer,
+}
+
+
+class _TimedListener(LiveLinkListener):
+    """LiveLinkListener recording the time at which each frame starts decoding."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.decode_times = deque()
+
+    def _unpack_block(self, block: bytes):
+        self.decode_times.append(time.perf_counter())
+        return super()._unpack_block(block)
+
+
+def _send(port: int, blocks: list, fps: float):
+    sender = SyntheticLiveLinkSender("localhost", port)
+    sender.connect()
+    sender.send_blocks(blocks, fps=fps)
+    sender.close()
+
+
+def measure_receive(
+    blocks: list,
+    fps: float = None,
+    decoder_factory=DEFAULT_DECODERS["json"],
+    buffer_factory=Buffer,
+    ack_policy: str = ACK_PER_FRAME,
+    timeout: float = 60.0,
+):
+    """
+    Send blocks from a synthetic LiveLink sender (in its own process) to a
+    LiveLinkListener over loopback, while a consumer thread drains the buffer.
+
+    :param fps: Pace of the sender, as fast as possible if None.
+    :return: Dict with the received frames/sec and the p50/p99/max latency (ms)
+        between the start of a frame decoding and its retrieval by the consumer.
+    """
+    buffer = buffer_factory()
+    listener = _TimedListener(
+        ip="localhost",
+        port=0,
+        buffer=buffer,
+        ack_policy=ack_policy,
+        decoder=decoder_factory(),
+    )
+    listener.daemon = True
+    listener.start()
+    listener.wait_until_ready(5.0)
+
+    latencies = []
+    done = threading.Event()
+
+    def consume():
+        while len(latencies) < len(blocks) and not done.is_set():
+            frame = buffer.remove()
+            if frame is None:
+                time.sleep(0.0001)
+                continue
+            latencies.append(time.perf_counter() - listener.decode_times.popleft())
+
+    consumer = threading.Thread(target=consume, daemon=True)
+    consumer.start()
+
+    start_time = time.perf_counter()
+    sender = multiprocessing.Process(target=_send, args=(listener.port, blocks, fps))
+    sender.start()
+    consumer.join(timeout)
+    elapsed = time.perf_counter() - start_time
+    done.set()
+    sender.join(timeout)
+    listener.stop()
+
+    if len(latencies) < len(blocks):
+        logging.warning(
+            f"Benchmark: Only {len(latencies)}/{len(blocks)} frames received."
+        )
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "frames_received": len(latencies),
+        "frames_per_sec": len(latencies) / elapsed,
+        "latency_p50_ms": float(np.percentile(latencies_ms, 50)) if latencies else None,
+        "latency_p99_ms": float(np.percentile(latencies_ms, 99)) if latencies else None,
+        "latency_max_ms": float(latencies_ms.max()) if latencies else None,
+    }
+
+
+def measure_memory_per_frame(blocks: list, decoder_factory, buffer_factory=Buffer):
+    """
+    Memory held per decoded frame once stored in the buffer, in bytes.
+    Allocations made in advance (e.g. the template frame of WeightsDecoder) are included.
+    """
+    listener = LiveLinkListener(decoder=decoder_factory())
+    buffer = buffer_factory()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for block in blocks:
+        buffer.add(listener._unpack_block(block))
+    used = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return used / len(blocks)
+
+
+def run_suite(
+    fps_list: list = (30, 60, 120, None),
+    blendshape_counts: list = (52, 200),
+    duration: float = 5.0,
+    max_speed_frames: int = 20000,
+    decoders: dict = None,
+    buffers: dict = None,
+):
+    """
+    Run the receive benchmark for every combination of decoder, buffer, sender
+    fps and blendshape count.
+
+    :param fps_list: Sender paces, None for as fast as possible.
+    :param duration: Length of the paced runs in seconds.
+    :param max_speed_frames: Number of frames of the unpaced runs.
+    :return: Dict of results, ready to be saved with save_results().
+    """
+    decoders = decoders or DEFAULT_DECODERS
+    buffers = buffers or DEFAULT_BUFFERS
+    results = []
+    for n_blendshapes in blendshape_counts:
+        for fps in fps_list:
+            n_frames = int(duration * fps) if fps else max_speed_frames
+            blocks = make_synthetic_blocks(n_frames, n_blendshapes)
+            for decoder_name, decoder_factory in decoders.items():
+                for buffer_name, buffer_factory in buffers.items():
+                    result = {
+                        "decoder": decoder_name,
+                        "buffer": buffer_name,
+                        "fps": fps,
+                        "n_blendshapes": n_blendshapes,
+                        "n_frames": n_frames,
+                        "bytes_per_block": len(blocks[0]),
+                    }
+                    result.update(
+                        measure_receive(blocks, fps, decoder_factory, buffer_factory)
+                    )
+                    result["memory_per_frame_bytes"] = measure_memory_per_frame(
+                        blocks[:2000], decoder_factory, buffer_factory
+                    )
+                    logging.info(f"Benchmark: {result}")
+                    results.append(result)
+
+    try:
+        version = metadata.version("audio2face_api")
+    except metadata.PackageNotFoundError:
+        version = "unknown"
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "results": results,
+    }
+
+
+def save_results(results: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=4)
+
+
+def _result_key(result: dict):
+    return (
+        result["decoder"],
+        result["buffer"],
+        result["fps"],
+        result["n_blendshapes"],
+    )
+
+
+def compare_results(baseline_path: str, current_path: str, tolerance: float = 0.1):
+    """
+    Compare two saved benchmark results.
+    :param tolerance: Relative change beyond which a metric counts as a regression.
+    :return: List of regressions, as (case, metric, baseline, current) tuples.
+    """
+    with open(baseline_path) as f:
+        baseline = {_result_key(r): r for r in json.load(f)["results"]}
+    with open(current_path) as f:
+        current = {_result_key(r): r for r in json.load(f)["results"]}
+
+    regressions = []
+    for key in baseline.keys() & current.keys():
+        old, new = baseline[key], current[key]
+        # Higher is better for throughput, lower for latency and memory
+        checks = [("frames_per_sec", -1)]
+        checks += [
+            (metric, 1)
+            for metric in ("latency_p50_ms", "latency_p99_ms", "memory_per_frame_bytes")
+        ]
+        for metric, direction in checks:
+            if old.get(metric) is None or new.get(metric) is None or not old[metric]:
+                continue
+            change = (new[metric] - old[metric]) / old[metric]
+            if change * direction > tolerance:
+                regressions.append((key, metric, old[metric], new[metric]))
+    return regressions
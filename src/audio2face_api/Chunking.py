@@ -0,0 +1,148 @@
+import logging
+import threading
+import time
+
+import numpy as np
+
+
+class AdaptiveChunkSizer:
+    """
+    Chooses the size of the audio chunks pushed to A2F, within bounds.
+
+    A session starts with small chunks, so A2F gets enough audio to produce
+    its first frame as soon as possible. Once the first frame is received
+    (or warmup_ms of audio has been sent, when frames are not observed), the
+    chunk size grows geometrically up to max_chunk_ms for throughput. The
+    chunks also grow as long as the measured push throughput is below
+    min_realtime_factor, i.e. while the per-message overhead dominates.
+    """
+
+    def __init__(
+        self,
+        min_chunk_ms: float = 20.0,
+        max_chunk_ms: float = 500.0,
+        first_chunk_ms: float = 40.0,
+        growth: float = 2.0,
+        warmup_ms: float = 250.0,
+        min_realtime_factor: float = 4.0,
+    ):
+        """
+        :param min_chunk_ms: Smallest chunk, in milliseconds of audio.
+        :param max_chunk_ms: Largest chunk, in milliseconds of audio.
+        :param first_chunk_ms: Size of the chunks sent until the first frame.
+        :param growth: Factor applied to the chunk size at each growth step.
+        :param warmup_ms: Audio sent before growing when the first frame is not
+            observed (e.g. without LiveLink).
+        :param min_realtime_factor: Audio seconds pushed per wall-clock second
+            under which the chunks grow, regardless of the first frame.
+        """
+        if not 0 < min_chunk_ms <= first_chunk_ms <= max_chunk_ms:
+            raise ValueError(
+                "AdaptiveChunkSizer: Expected 0 < min_chunk_ms <= first_chunk_ms <= max_chunk_ms."
+            )
+        if growth <= 1.0:
+            raise ValueError("AdaptiveChunkSizer: growth must be greater than 1.")
+        self.min_chunk_ms = min_chunk_ms
+        self.max_chunk_ms = max_chunk_ms
+        self.first_chunk_ms = first_chunk_ms
+        self.growth = growth
+        self.warmup_ms = warmup_ms
+        self.min_realtime_factor = min_realtime_factor
+
+        self._lock = threading.Lock()
+        self.sessions = 0
+        self.first_frame_times = []  # Time to first frame of each session, s
+        self.realtime_factors = []  # Push throughput of each session
+        self.chunks_sent = 0
+
+    def min_chunk_samples(self, sample_rate: int) -> int:
+        return max(1, int(sample_rate * self.min_chunk_ms / 1000))
+
+    def iter_chunks(self, source, sample_rate: int, first_frame_received=None):
+        """
+        Re-split a stream of audio blocks into chunks of adaptive size, and
+        measure the push of each chunk (the time until the next one is asked).
+
+        :param source: Iterable of 1-D float32 arrays (any sizes).
+        :param first_frame_received: Callable returning True once the first
+            frame of the session has been received, None if not observable.
+        :return: Generator of 1-D float32 arrays.
+        """
+        min_size = self.min_chunk_samples(sample_rate)
+        max_size = max(min_size, int(sample_rate * self.max_chunk_ms / 1000))
+        size = min(
+            max_size, max(min_size, int(sample_rate * self.first_chunk_ms / 1000))
+        )
+        warmup_samples = int(sample_rate * self.warmup_ms / 1000)
+
+        start_time = time.perf_counter()
+        first_frame_time = None
+        samples_sent = 0
+        push_time = 0.0
+        sizes = []
+
+        def chunks():
+            pending = None
+            for block in source:
+                pending = block if pending is None else np.concatenate((pending, block))
+                while len(pending) >= size:
+                    chunk, pending = pending[:size], pending[size:]
+                    yield chunk
+            if pending is not None and len(pending):
+                yield pending
+
+        try:
+            for chunk in chunks():
+                sent_at = time.perf_counter()
+                yield chunk
+                elapsed = time.perf_counter() - sent_at
+                push_time += elapsed
+                samples_sent += len(chunk)
+                sizes.append(len(chunk))
+
+                if first_frame_time is None and first_frame_received is not None:
+                    if first_frame_received():
+                        first_frame_time = time.perf_counter() - start_time
+                warmed_up = first_frame_time is not None or (
+                    first_frame_received is None and samples_sent >= warmup_samples
+                )
+                too_slow = (
+                    elapsed > 0
+                    and len(chunk) / sample_rate / elapsed < self.min_realtime_factor
+                )
+                if size < max_size and (warmed_up or too_slow):
+                    size = min(max_size, int(size * self.growth))
+        finally:
+            with self._lock:
+                self.sessions += 1
+                self.chunks_sent += len(sizes)
+                if first_frame_time is not None:
+                    self.first_frame_times.append(first_frame_time)
+                if push_time > 0:
+                    self.realtime_factors.append(samples_sent / sample_rate / push_time)
+            logging.debug(
+                f"AdaptiveChunkSizer: {len(sizes)} chunks "
+                f"({min(sizes, default=0)}-{max(sizes, default=0)} samples), "
+                f"first frame after {first_frame_time}s"
+            )
+
+    def get_stats(self) -> dict:
+        """
+        Time to first frame and push throughput over the past sessions.
+        """
+        with self._lock:
+            first_frame = np.array(self.first_frame_times)
+            realtime = np.array(self.realtime_factors)
+            return {
+                "sessions": self.sessions,
+                "chunks_sent": self.chunks_sent,
+                "first_frame_mean_s": (
+                    float(first_frame.mean()) if len(first_frame) else None
+                ),
+                "first_frame_max_s": (
+                    float(first_frame.max()) if len(first_frame) else None
+                ),
+                "realtime_factor_mean": (
+                    float(realtime.mean()) if len(realtime) else None
+                ),
+            }
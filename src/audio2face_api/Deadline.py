@@ -0,0 +1,117 @@
+import threading
+import time
+from concurrent.futures import CancelledError
+
+_local = threading.local()
+
+
+def current_deadline():
+    """
+    Get the innermost deadline entered in the current thread, None if there is none.
+    """
+    stack = getattr(_local, "stack", None)
+    return stack[-1] if stack else None
+
+
+class Deadline:
+    """
+    A time budget for a session, that can also be cancelled from another thread.
+
+    Entering a deadline (``with deadline:``) makes it the current deadline of
+    the thread: HTTP calls, gRPC pushes and frame waits made inside the block
+    are bounded by its remaining time, and stop promptly once it is cancelled.
+    """
+
+    def __init__(self, timeout: float = None):
+        """
+        :param timeout: Time budget in seconds, no time limit if None.
+        """
+        self.expires_at = None if timeout is None else time.monotonic() + timeout
+        self._cancel_event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        if not hasattr(_local, "stack"):
+            _local.stack = []
+        _local.stack.append(self)
+        return self
+
+    def __exit__(self, *exc):
+        _local.stack.pop()
+        return False
+
+    def remaining(self):
+        """
+        Remaining time in seconds (0 once expired), None if there is no time limit.
+        """
+        if self.expires_at is None:
+            return None
+        return max(0.0, self.expires_at - time.monotonic())
+
+    def timeout(self, default: float = None):
+        """
+        Timeout of a call made under this deadline.
+        :param default: Timeout of the call itself, None for no limit.
+        """
+        remaining = self.remaining()
+        if remaining is None:
+            return default
+        if default is None:
+            return remaining
+        return min(default, remaining)
+
+    @property
+    def expired(self) -> bool:
+        return self.expires_at is not None and time.monotonic() >= self.expires_at
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def cancel(self):
+        """
+        Cancel the deadline, and the operations registered with add_cancel_callback.
+        """
+        with self._lock:
+            self._cancel_event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback()
+
+    def add_cancel_callback(self, callback):
+        """
+        Call callback when the deadline is cancelled (right away if it already is).
+        """
+        with self._lock:
+            if not self._cancel_event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_cancel_callback(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def check(self):
+        """
+        Raise CancelledError if cancelled, TimeoutError if expired.
+        """
+        if self.cancelled:
+            raise CancelledError("Deadline: Session cancelled.")
+        if self.expired:
+            raise TimeoutError("Deadline: Session deadline exceeded.")
+
+    def wait(self, seconds: float):
+        """
+        Sleep for the given time, unless the deadline is cancelled or expires first.
+        Raise CancelledError or TimeoutError in that case.
+        """
+        remaining = self.remaining()
+        if remaining is not None and remaining < seconds:
+            self._cancel_event.wait(remaining)
+            self.check()
+            raise TimeoutError("Deadline: Session deadline exceeded.")
+        self._cancel_event.wait(seconds)
+        self.check()
@@ -0,0 +1,116 @@
+import copy
+import json
+import logging
+import struct
+
+import numpy as np
+
+_WEIGHTS_KEY = b'"Weights"'
+
+
+def _numeric_leaves(obj, path=()):
+    """
+    List the (path, value) of the numeric leaves of a parsed JSON object, in
+    document order.
+    """
+    if isinstance(obj, dict):
+        for key, value in obj.items():
+            yield from _numeric_leaves(value, path + (key,))
+    elif isinstance(obj, list):
+        for i, value in enumerate(obj):
+            yield from _numeric_leaves(value, path + (i,))
+    elif isinstance(obj, (int, float)) and not isinstance(obj, bool):
+        yield path, obj
+
+
+def flatten_frame(frame) -> np.ndarray:
+    """
+    Get the numeric values of a frame as a float32 array.
+    :param frame: A frame dict parsed from the LiveLink JSON, or a decoded row.
+    """
+    if isinstance(frame, np.ndarray):
+        return frame.astype(np.float32, copy=False)
+    return np.array([value for _, value in _numeric_leaves(frame)], dtype=np.float32)
+
+
+class WeightsDecoder:
+    """
+    Decodes the blendshape weights of LiveLink payloads into float32 rows.
+
+    Only the "Weights" array of each payload is parsed, by splitting its text.
+    The rest of the frame (names, timecode) is parsed as JSON from the first
+    frame only, and kept in template and names. A payload whose weights do not
+    split into the expected number of values is fully parsed as JSON.
+    """
+
+    def __init__(self):
+        self.template = None  # Parsed JSON of the last fully parsed frame
+        self.names = []  # Blendshape name of each column
+        self.n_values = 0
+
+        # Statistics
+        self.fast_decodes = 0
+        self.full_decodes = 0
+
+    def decode_block(self, block: bytes) -> np.ndarray:
+        """
+        Decode a block holding the 8-byte size header and the JSON payload.
+        """
+        if len(block) < 8:
+            raise ValueError("Data too short to contain header.")
+        size = struct.unpack_from("!Q", block)[0]
+        if len(block) - 8 < size:
+            raise ValueError(
+                f"Incomplete data block, expected a block of size {size} bytes, got {len(block) - 8} byte."
+            )
+        return self._decode(block, 8, 8 + size)
+
+    def decode(self, payload: bytes) -> np.ndarray:
+        """
+        Decode a JSON payload into a float32 row of its weights.
+        """
+        return self._decode(payload, 0, len(payload))
+
+    def _decode(self, data: bytes, pos: int, stop: int) -> np.ndarray:
+        """
+        Decode the payload data[pos:stop], parsing only its weights once the
+        first frame is learnt.
+        """
+        if self.template is not None:
+            start = data.find(_WEIGHTS_KEY, pos, stop)
+            start = data.find(b"[", start, stop) + 1 if start >= 0 else 0
+            end = data.find(b"]", start, stop) if start > 0 else -1
+            if end >= 0:
+                try:
+                    row = np.array(data[start:end].split(b","), dtype=np.float32)
+                except ValueError:
+                    row = None
+                if row is not None and len(row) == self.n_values:
+                    self.fast_decodes += 1
+                    return row
+        return self._decode_full(data[pos:stop])
+
+    def _decode_full(self, payload: bytes) -> np.ndarray:
+        frame = json.loads(payload)
+        try:
+            facial = frame["Audio2Face"]["Facial"]
+            weights = facial["Weights"]
+        except (KeyError, TypeError):
+            raise ValueError("WeightsDecoder: No Weights in the payload.")
+        names = facial.get("Names", [])
+        if self.template is not None and names != self.names:
+            logging.info("WeightsDecoder: Blendshape names changed.")
+        self.template = frame
+        self.names = names
+        self.n_values = len(weights)
+        self.full_decodes += 1
+        return np.array(weights, dtype=np.float32)
+
+    def to_dict(self, row: np.ndarray) -> dict:
+        """
+        Rebuild the frame dict of a row, with the names and timecode of the
+        last fully parsed frame.
+        """
+        frame = copy.deepcopy(self.template)
+        frame["Audio2Face"]["Facial"]["Weights"] = row.tolist()
+        return frame
@@ -0,0 +1,512 @@
+"""
+Republishes the received LiveLink frames to many local subscribers (renderers,
+recorders, analytics...) over WebSocket, TCP, Unix sockets or UDP.
+
+Each subscriber has its own bounded queue and sender thread, so a slow
+subscriber only drops its own frames and never stalls the receive loop or
+the other subscribers.
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import socket
+import struct
+import threading
+from collections import deque
+
+import numpy as np
+
+from audio2face_api.Decoder import flatten_frame
+from audio2face_api.LiveLink import HEADER_SIZE
+
+# What a subscriber does when its queue is full
+DROP_OLDEST = "oldest"  # Drop the oldest queued frame (keeps the latest state)
+DROP_NEWEST = "newest"  # Drop the incoming frame
+DISCONNECT = "disconnect"  # Close the subscriber
+
+# Message types of BinaryFrameEncoder
+_KEYFRAME = 0
+_DELTA = 1
+# type, flags, sequence number, number of values
+_BINARY_HEADER = struct.Struct("<BBIH")
+_QUANTIZED = 1
+
+
+class JsonFrameEncoder:
+    """Sends each frame as a JSON text message."""
+
+    binary = False
+
+    def encode(self, frame) -> bytes:
+        if isinstance(frame, np.ndarray):
+            frame = frame.tolist()
+        return json.dumps(frame).encode("utf-8")
+
+
+class BinaryFrameEncoder:
+    """
+    Sends the numeric values of each frame (see flatten_frame) as a compact
+    binary message, decoded with BinaryFrameDecoder.
+
+    With delta=True, only the values that changed by more than delta_threshold
+    since the last sent frame are sent (as index/value pairs), with a full
+    keyframe every keyframe_interval frames so a receiver that lost messages
+    resynchronizes. With quantize=True, values are sent as int16 with a step of
+    quantize_scale / 32767 instead of float32.
+    """
+
+    binary = True
+
+    def __init__(
+        self,
+        delta: bool = False,
+        quantize: bool = False,
+        keyframe_interval: int = 30,
+        delta_threshold: float = 1e-4,
+        quantize_scale: float = 1.0,
+    ):
+        self.delta = delta
+        self.quantize = quantize
+        self.keyframe_interval = keyframe_interval
+        self.delta_threshold = delta_threshold
+        self.quantize_scale = quantize_scale
+        self.sequence = 0
+        self._last_sent = None
+
+    def _pack_values(self, values: np.ndarray) -> bytes:
+        if self.quantize:
+            scaled = np.clip(values / self.quantize_scale, -1.0, 1.0) * 32767
+            return np.round(scaled).astype("<i2").tobytes()
+        return values.astype("<f4").tobytes()
+
+    def encode(self, frame) -> bytes:
+        values = flatten_frame(frame)
+        flags = _QUANTIZED if self.quantize else 0
+        keyframe = (
+            not self.delta
+            or self._last_sent is None
+            or len(values) != len(self._last_sent)
+            or self.sequence % self.keyframe_interval == 0
+        )
+        if keyframe:
+            header = _BINARY_HEADER.pack(_KEYFRAME, flags, self.sequence, len(values))
+            message = header + self._pack_values(values)
+            sent = values
+        else:
+            changed = np.flatnonzero(
+                np.abs(values - self._last_sent) > self.delta_threshold
+            )
+            header = _BINARY_HEADER.pack(_DELTA, flags, self.sequence, len(changed))
+            message = (
+                header
+                + changed.astype("<u2").tobytes()
+                + self._pack_values(values[changed])
+            )
+            # Values that did not change enough stay at their sent value
+            sent = self._last_sent.copy()
+            sent[changed] = values[changed]
+        self._last_sent = sent
+        self.sequence = (self.sequence + 1) & 0xFFFFFFFF
+        return message
+
+
+class BinaryFrameDecoder:
+    """Rebuilds the value rows of the messages of a BinaryFrameEncoder."""
+
+    def __init__(self, quantize_scale: float = 1.0):
+        self.quantize_scale = quantize_scale
+        self.values = None
+        self.expected_sequence = None
+
+    def _unpack_values(self, data: bytes, flags: int, count: int) -> np.ndarray:
+        if flags & _QUANTIZED:
+            values = np.frombuffer(data, dtype="<i2", count=count)
+            return values.astype(np.float32) / 32767 * self.quantize_scale
+        return np.frombuffer(data, dtype="<f4", count=count).astype(np.float32)
+
+    def decode(self, message: bytes):
+        """
+        :return: The float32 row of the frame, None if a delta arrives after a
+            lost message (until the next keyframe).
+        """
+        kind, flags, sequence, count = _BINARY_HEADER.unpack_from(message)
+        body = message[_BINARY_HEADER.size :]
+        in_sequence = sequence == self.expected_sequence
+        self.expected_sequence = (sequence + 1) & 0xFFFFFFFF
+        if kind == _KEYFRAME:
+            self.values = self._unpack_values(body, flags, count)
+            return self.values.copy()
+        if self.values is None or not in_sequence:
+            self.values = None
+            return None
+        indices = np.frombuffer(body, dtype="<u2", count=count)
+        self.values[indices] = self._unpack_values(body[2 * count :], flags, count)
+        return self.values.copy()
+
+
+class UdpTransport:
+    """Sends each message as one datagram."""
+
+    def __init__(self, host: str, port: int):
+        self.address = (host, port)
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    def send(self, message: bytes, binary: bool):
+        self.sock.sendto(message, self.address)
+
+    def close(self):
+        self.sock.close()
+
+
+class StreamTransport:
+    """
+    Sends each message over a connected TCP or Unix socket, prefixed with its
+    size as 8 bytes big-endian (the LiveLink framing).
+    """
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+
+    def send(self, message: bytes, binary: bool):
+        self.conn.sendall(len(message).to_bytes(HEADER_SIZE, "big") + message)
+
+    def close(self):
+        try:
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class WebSocketTransport:
+    """Sends each message as one unfragmented WebSocket frame (RFC 6455)."""
+
+    _GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+    def __init__(self, conn: socket.socket):
+        self.conn = conn
+
+    @classmethod
+    def accept(cls, conn: socket.socket, timeout: float = 5.0):
+        """
+        Run the opening handshake of a client connection.
+        """
+        conn.settimeout(timeout)
+        request = b""
+        while b"\r\n\r\n" not in request:
+            data = conn.recv(4096)
+            if not data or len(request) > 65536:
+                raise ConnectionError("WebSocketTransport: Invalid handshake.")
+            request += data
+        key = None
+        for line in request.split(b"\r\n")[1:]:
+            name, _, value = line.partition(b":")
+            if name.strip().lower() == b"sec-websocket-key":
+                key = value.strip()
+        if key is None:
+            conn.sendall(b"HTTP/1.1 400 Bad Request\r\n\r\n")
+            raise ConnectionError("WebSocketTransport: Missing Sec-WebSocket-Key.")
+        accept = base64.b64encode(hashlib.sha1(key + cls._GUID).digest())
+        conn.sendall(
+            b"HTTP/1.1 101 Switching Protocols\r\n"
+            b"Upgrade: websocket\r\n"
+            b"Connection: Upgrade\r\n"
+            b"Sec-WebSocket-Accept: " + accept + b"\r\n\r\n"
+        )
+        conn.settimeout(None)
+        return cls(conn)
+
+    def send(self, message: bytes, binary: bool):
+        opcode = 0x82 if binary else 0x81
+        length = len(message)
+        if length < 126:
+            header = struct.pack("!BB", opcode, length)
+        elif length < 1 << 16:
+            header = struct.pack("!BBH", opcode, 126, length)
+        else:
+            header = struct.pack("!BBQ", opcode, 127, length)
+        self.conn.sendall(header + message)
+
+    def close(self):
+        try:
+            self.conn.sendall(b"\x88\x00")  # Close frame
+            self.conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.conn.close()
+
+
+class Subscriber(threading.Thread):
+    """A downstream consumer of the hub, with its own queue and sender thread."""
+
+    def __init__(
+        self,
+        transport,
+        encoder=None,
+        queue_size: int = 256,
+        drop_policy: str = DROP_OLDEST,
+        name: str = None,
+    ):
+        super().__init__(daemon=True, name=name)
+        if drop_policy not in (DROP_OLDEST, DROP_NEWEST, DISCONNECT):
+            raise ValueError(f"Subscriber: Unknown drop policy {drop_policy}.")
+        self.transport = transport
+        self.encoder = encoder or JsonFrameEncoder()
+        self.queue_size = queue_size
+        self.drop_policy = drop_policy
+        self._queue = deque()
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.bytes_sent = 0
+        self.error = None
+
+    @property
+    def closed(self) -> bool:
+        return self._stop_event.is_set()
+
+    def put(self, frame):
+        """
+        Queue a frame, applying the drop policy if the queue is full. Never blocks.
+        """
+        with self._condition:
+            if len(self._queue) >= self.queue_size:
+                self.frames_dropped += 1
+                if self.drop_policy == DROP_NEWEST:
+                    return
+                if self.drop_policy == DISCONNECT:
+                    logging.warning(f"Subscriber: {self.name} too slow, disconnecting.")
+                    self._stop_event.set()
+                    self._condition.notify()
+                    return
+                self._queue.popleft()
+            self._queue.append(frame)
+            self._condition.notify()
+
+    def run(self):
+        try:
+            while True:
+                with self._condition:
+                    while not self._queue and not self._stop_event.is_set():
+                        self._condition.wait()
+                    if self._stop_event.is_set():
+                        break
+                    frame = self._queue.popleft()
+                message = self.encoder.encode(frame)
+                self.transport.send(message, self.encoder.binary)
+                self.frames_sent += 1
+                self.bytes_sent += len(message)
+        except OSError as e:
+            self.error = e
+            logging.info(f"Subscriber: {self.name} disconnected: {e}")
+        finally:
+            self._stop_event.set()
+            self.transport.close()
+
+    def stop(self):
+        with self._condition:
+            self._stop_event.set()
+            self._condition.notify()
+
+    def get_stats(self) -> dict:
+        return {
+            "name": self.name,
+            "frames_sent": self.frames_sent,
+            "frames_dropped": self.frames_dropped,
+            "bytes_sent": self.bytes_sent,
+            "queued": len(self._queue),
+            "closed": self.closed,
+        }
+
+
+class _SubscriptionServer(threading.Thread):
+    """Accepts connections and adds a subscriber for each of them."""
+
+    def __init__(
+        self, hub, sock, scheme, make_transport, encoder_factory, subscriber_kwargs
+    ):
+        super().__init__(daemon=True)
+        self.hub = hub
+        self.scheme = scheme
+        self.sock = sock
+        self.make_transport = make_transport
+        self.encoder_factory = encoder_factory
+        self.subscriber_kwargs = subscriber_kwargs
+        self._stop_event = threading.Event()
+
+    def run(self):
+        self.sock.settimeout(0.5)
+        while not self._stop_event.is_set():
+            try:
+                conn, address = self.sock.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                break
+            try:
+                transport = self.make_transport(conn)
+            except (OSError, ConnectionError) as e:
+                logging.warning(f"FrameHub: Rejected subscriber {address}: {e}")
+                conn.close()
+                continue
+            # Encoders keep per-stream state, each subscriber gets its own
+            encoder = self.encoder_factory() if self.encoder_factory else None
+            self.hub.add_subscriber(
+                transport,
+                encoder=encoder,
+                name=self._subscriber_name(address),
+                **self.subscriber_kwargs,
+            )
+        self.sock.close()
+
+    def _subscriber_name(self, address) -> str:
+        if isinstance(address, tuple):
+            return f"{self.scheme}://{address[0]}:{address[1]}"
+        return f"{self.scheme}://{self.sock.getsockname()}"
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class FrameHub:
+    """
+    Republishes frames to many subscribers. Attach it to a LiveLinkListener
+    (or Audio2FaceStream.add_frame_hub) so publish() gets every received frame.
+    """
+
+    def __init__(self):
+        self.subscribers = []
+        self.servers = []
+        self._lock = threading.Lock()
+
+    def attach(self, listener):
+        """
+        Publish the frames received by a LiveLinkListener.
+        """
+        listener.add_consumer(self.publish)
+
+    def publish(self, frame):
+        """
+        Queue a frame for every subscriber. Never blocks.
+        """
+        subscribers = self.subscribers
+        closed = False
+        for subscriber in subscribers:
+            if subscriber.closed:
+                closed = True
+            else:
+                subscriber.put(frame)
+        if closed:
+            with self._lock:
+                self.subscribers = [s for s in self.subscribers if not s.closed]
+
+    def add_subscriber(self, transport, **subscriber_kwargs) -> Subscriber:
+        """
+        Add a subscriber sending frames through a transport.
+        :param subscriber_kwargs: encoder, queue_size, drop_policy and name
+            (see Subscriber).
+        """
+        subscriber = Subscriber(transport, **subscriber_kwargs)
+        subscriber.start()
+        with self._lock:
+            # Copy on write, publish() iterates without the lock
+            self.subscribers = self.subscribers + [subscriber]
+        logging.info(f"FrameHub: Added subscriber {subscriber.name}")
+        return subscriber
+
+    def add_udp_subscriber(self, host: str, port: int, **subscriber_kwargs):
+        """
+        Send the frames as datagrams to host:port. Use a BinaryFrameEncoder
+        for large frames, a datagram is limited to 64 KB.
+        """
+        subscriber_kwargs.setdefault("name", f"udp://{host}:{port}")
+        return self.add_subscriber(UdpTransport(host, port), **subscriber_kwargs)
+
+    def _serve(self, sock, scheme, make_transport, encoder_factory, subscriber_kwargs):
+        if "encoder" in subscriber_kwargs:
+            raise ValueError(
+                "FrameHub: Servers take an encoder_factory, an encoder cannot be "
+                "shared by several subscribers."
+            )
+        sock.listen()
+        server = _SubscriptionServer(
+            self, sock, scheme, make_transport, encoder_factory, subscriber_kwargs
+        )
+        server.start()
+        self.servers.append(server)
+        return sock.getsockname()
+
+    def serve_websocket(
+        self,
+        host: str = "localhost",
+        port: int = 0,
+        encoder_factory=None,
+        **subscriber_kwargs,
+    ):
+        """
+        Accept WebSocket subscribers on host:port (port 0 binds a free port).
+        :param encoder_factory: Callable returning a new encoder for each
+            subscriber, e.g. lambda: BinaryFrameEncoder(delta=True). JSON if None.
+        :param subscriber_kwargs: queue_size and drop_policy (see Subscriber).
+        :return: The bound (host, port).
+        """
+        sock = socket.create_server((host, port))
+        return self._serve(
+            sock, "ws", WebSocketTransport.accept, encoder_factory, subscriber_kwargs
+        )
+
+    def serve_tcp(
+        self,
+        host: str = "localhost",
+        port: int = 0,
+        encoder_factory=None,
+        **subscriber_kwargs,
+    ):
+        """
+        Accept TCP subscribers, messages are framed like LiveLink (8 bytes
+        big-endian size, then the message).
+        :param encoder_factory: See serve_websocket.
+        :return: The bound (host, port).
+        """
+        sock = socket.create_server((host, port))
+        return self._serve(
+            sock, "tcp", StreamTransport, encoder_factory, subscriber_kwargs
+        )
+
+    def serve_unix(self, path: str, encoder_factory=None, **subscriber_kwargs):
+        """
+        Accept subscribers on a Unix socket, with the framing of serve_tcp.
+        """
+        if not hasattr(socket, "AF_UNIX"):
+            raise ValueError("FrameHub: Unix sockets are not supported here.")
+        if os.path.exists(path):
+            os.remove(path)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.bind(path)
+        return self._serve(
+            sock, "unix", StreamTransport, encoder_factory, subscriber_kwargs
+        )
+
+    def get_stats(self) -> list:
+        return [subscriber.get_stats() for subscriber in self.subscribers]
+
+    def close(self):
+        """
+        Stop accepting subscribers and close every subscriber.
+        """
+        for server in self.servers:
+            server.stop()
+        for server in self.servers:
+            server.join()
+        self.servers = []
+        with self._lock:
+            subscribers, self.subscribers = self.subscribers, []
+        for subscriber in subscribers:
+            subscriber.stop()
+        for subscriber in subscribers:
+            subscriber.join()
+        logging.info("FrameHub: Closed")
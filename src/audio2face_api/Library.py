@@ -0,0 +1,462 @@
+"""
+Index of exported blendshape clips, to find clips by their metadata (emotion,
+source audio, scene...) and frames by pose similarity.
+
+The index holds the metadata of each clip and one feature matrix with the
+weights of all the frames, in a fixed pose order. On disk (optional) it is a
+directory with an append-only clips.jsonl, the pose names and one float16
+feature file per clip, so adding a clip never rewrites the others.
+"""
+
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from audio2face_api.Sinks import _make_parent_dir
+
+_CLIPS_FILE = "clips.jsonl"
+_NAMES_FILE = "names.json"
+_FEATURES_DIR = "features"
+
+
+class Clip:
+    """An indexed clip: its metadata and its rows in the feature matrix."""
+
+    def __init__(
+        self,
+        clip_id: str,
+        index: int,
+        start_row: int,
+        n_frames: int,
+        fps: float,
+        metadata: dict,
+        source: str = None,
+        features_file: str = None,
+    ):
+        self.clip_id = clip_id
+        self.index = index
+        self.start_row = start_row
+        self.n_frames = n_frames
+        self.fps = fps
+        self.metadata = metadata
+        self.source = source
+        self.features_file = features_file  # Name in the features directory
+
+    @property
+    def duration(self) -> float:
+        return self.n_frames / self.fps
+
+    def to_dict(self) -> dict:
+        return {
+            "clip_id": self.clip_id,
+            "n_frames": self.n_frames,
+            "fps": self.fps,
+            "metadata": self.metadata,
+            "source": self.source,
+            "features": self.features_file,
+        }
+
+    def __repr__(self):
+        return f"Clip({self.clip_id}, {self.n_frames} frames, {self.metadata})"
+
+
+class PoseMatch:
+    """A frame returned by a pose query."""
+
+    def __init__(self, clip: Clip, frame: int, distance: float):
+        self.clip = clip
+        self.frame = frame
+        self.distance = distance
+
+    @property
+    def time(self) -> float:
+        """Time of the frame in its clip, in seconds."""
+        return self.frame / self.clip.fps
+
+    def __repr__(self):
+        return (
+            f"PoseMatch({self.clip.clip_id}, frame {self.frame}, "
+            f"distance {self.distance:.4f})"
+        )
+
+
+def _matches(value, expected) -> bool:
+    if callable(expected):
+        return bool(expected(value))
+    if isinstance(expected, (list, tuple, set, frozenset)):
+        return value in expected
+    return value == expected
+
+
+class AnimationIndex:
+    """
+    Metadata and pose index over exported clips.
+
+    Queries are vectorized over the feature matrix: a metadata filter selects
+    clips, whose frames are contiguous rows; a pose query is a matrix-vector
+    product over the rows of the selected clips.
+    """
+
+    def __init__(self, root: str = None, names: list = None):
+        """
+        :param root: Directory where the index is stored and loaded from, in
+            memory only if None.
+        :param names: Pose (blendshape) names, the order of the feature
+            columns. Taken from the first clip if None.
+        """
+        self.root = root
+        self.names = names
+        self.clips = {}  # clip_id -> Clip, in insertion order
+        self._clip_list = []
+        self._sources = set()
+        self._next_file = 0  # Number of the next feature file
+        self._lock = threading.Lock()
+        # Growable arrays, the first _n_rows rows are used
+        self._features = np.zeros((0, len(names) if names else 0), np.float32)
+        self._row_clip = np.zeros(0, np.int32)
+        self._row_norms = np.zeros(0, np.float32)
+        self._n_rows = 0
+        if root is not None:
+            self._load()
+
+    def __len__(self) -> int:
+        return len(self.clips)
+
+    @property
+    def n_frames(self) -> int:
+        return self._n_rows
+
+    # Storage
+
+    def _load(self):
+        names_path = os.path.join(self.root, _NAMES_FILE)
+        clips_path = os.path.join(self.root, _CLIPS_FILE)
+        if not os.path.exists(clips_path):
+            return
+        with open(names_path, encoding="utf-8") as f:
+            self._set_names(json.load(f))
+        with open(clips_path, "rb") as f:
+            lines = f.read().splitlines(keepends=True)
+        size = 0
+        for line in lines:
+            if not line.endswith(b"\n"):
+                # Last line cut by a crash, the next clip must not be appended to it
+                logging.warning(f"AnimationIndex: Dropped a cut line of {clips_path}")
+                with open(clips_path, "r+b") as f:
+                    f.truncate(size)
+                break
+            size += len(line)
+            try:
+                record = json.loads(line)
+                features_file = record["features"]
+            except (json.JSONDecodeError, KeyError, TypeError):
+                logging.warning(f"AnimationIndex: Skipped a bad line of {clips_path}")
+                continue
+            number = int(os.path.splitext(features_file)[0])
+            self._next_file = max(self._next_file, number + 1)
+            features_path = os.path.join(self.root, _FEATURES_DIR, features_file)
+            if record["clip_id"] in self.clips:
+                continue
+            if not os.path.exists(features_path):
+                logging.warning(
+                    f"AnimationIndex: Missing features of {record['clip_id']}"
+                )
+                continue
+            self._append(
+                record["clip_id"],
+                np.load(features_path),
+                record["fps"],
+                record["metadata"],
+                record.get("source"),
+                features_file,
+            )
+        logging.info(
+            f"AnimationIndex: Loaded {len(self)} clips ({self.n_frames} frames) "
+            f"from {self.root}"
+        )
+
+    def _save_clip(self, clip: Clip, features: np.ndarray):
+        names_path = os.path.join(self.root, _NAMES_FILE)
+        if not os.path.exists(names_path):
+            _make_parent_dir(names_path)
+            with open(names_path, "w", encoding="utf-8") as f:
+                json.dump(self.names, f)
+        clip.features_file = f"{self._next_file:08d}.npy"
+        self._next_file += 1
+        features_path = os.path.join(self.root, _FEATURES_DIR, clip.features_file)
+        _make_parent_dir(features_path)
+        np.save(features_path, features.astype(np.float16))
+        # The clip line, naming its feature file, is written last: a crash
+        # leaves at most a stray feature file or a cut line, dropped on load
+        with open(os.path.join(self.root, _CLIPS_FILE), "a", encoding="utf-8") as f:
+            f.write(json.dumps(clip.to_dict()) + "\n")
+
+    # Updates
+
+    def _set_names(self, names: list):
+        self.names = list(names)
+        self._features = np.zeros((0, len(self.names)), np.float32)
+
+    def _to_columns(self, weights: np.ndarray, names: list) -> np.ndarray:
+        """
+        Reorder the columns of a clip to the pose order of the index. Poses
+        the clip lacks are zeros, poses the index lacks are dropped.
+        """
+        if names is None or list(names) == self.names:
+            if weights.shape[1] != len(self.names):
+                raise ValueError(
+                    f"AnimationIndex: Expected {len(self.names)} poses, "
+                    f"got {weights.shape[1]}."
+                )
+            return weights
+        columns = {name: i for i, name in enumerate(names)}
+        out = np.zeros((len(weights), len(self.names)), np.float32)
+        for i, name in enumerate(self.names):
+            if name in columns:
+                out[:, i] = weights[:, columns[name]]
+        return out
+
+    def _reserve(self, n_rows: int):
+        capacity = len(self._row_clip)
+        if n_rows <= capacity:
+            return
+        capacity = max(n_rows, 2 * capacity, 1024)
+        features = np.zeros((capacity, len(self.names)), np.float32)
+        features[: self._n_rows] = self._features[: self._n_rows]
+        row_clip = np.zeros(capacity, np.int32)
+        row_clip[: self._n_rows] = self._row_clip[: self._n_rows]
+        row_norms = np.zeros(capacity, np.float32)
+        row_norms[: self._n_rows] = self._row_norms[: self._n_rows]
+        self._features, self._row_clip, self._row_norms = features, row_clip, row_norms
+
+    def _append(
+        self, clip_id, features, fps, metadata, source, features_file=None
+    ) -> Clip:
+        features = np.asarray(features, dtype=np.float32)
+        clip = Clip(
+            clip_id,
+            len(self._clip_list),
+            self._n_rows,
+            len(features),
+            fps,
+            metadata,
+            source,
+            features_file,
+        )
+        end = self._n_rows + len(features)
+        self._reserve(end)
+        self._features[self._n_rows : end] = features
+        self._row_clip[self._n_rows : end] = clip.index
+        self._row_norms[self._n_rows : end] = np.einsum("ij,ij->i", features, features)
+        self._n_rows = end
+        self.clips[clip_id] = clip
+        self._clip_list.append(clip)
+        if source is not None:
+            self._sources.add(source)
+        return clip
+
+    def add_clip(
+        self,
+        clip_id: str,
+        weights,
+        names: list = None,
+        fps: float = 30,
+        metadata: dict = None,
+        source: str = None,
+    ) -> Clip:
+        """
+        Index a clip.
+        :param weights: (n_frames, n_poses) blendshape weights.
+        :param names: Pose names of the weight columns, the index order if None.
+        :param metadata: JSON-serializable metadata, e.g. {"emotion": "joy",
+            "audio": "line_01.wav", "scene": "mark"}.
+        :param source: Path of the export the clip comes from.
+        """
+        weights = np.asarray(weights, dtype=np.float32)
+        if weights.ndim != 2:
+            raise ValueError("AnimationIndex: weights must be (n_frames, n_poses).")
+        with self._lock:
+            if clip_id in self.clips:
+                raise ValueError(f"AnimationIndex: Clip {clip_id} already indexed.")
+            if self.names is None:
+                if names is None:
+                    raise ValueError("AnimationIndex: The pose names are unknown.")
+                self._set_names(names)
+            features = self._to_columns(weights, names)
+            # Round-trip through float16, so that the index is the same once
+            # reloaded
+            features = features.astype(np.float16).astype(np.float32)
+            clip = self._append(clip_id, features, fps, metadata or {}, source)
+            if self.root is not None:
+                self._save_clip(clip, features)
+        logging.debug(f"AnimationIndex: Added {clip}")
+        return clip
+
+    def add_export(
+        self, export_path: str, clip_id: str = None, metadata: dict = None
+    ) -> Clip:
+        """
+        Index a blendshapes JSON export (weightMat, facsNames, exportFps).
+        :param clip_id: Id of the clip, the export file name if None.
+        """
+        with open(export_path) as f:
+            export = json.load(f)
+        if clip_id is None:
+            clip_id = os.path.splitext(os.path.basename(export_path))[0]
+            clip_id = clip_id.removesuffix("_bsweight")
+        return self.add_clip(
+            clip_id,
+            export["weightMat"],
+            export.get("facsNames"),
+            export.get("exportFps", 30),
+            metadata,
+            os.path.abspath(export_path),
+        )
+
+    def scan(self, directory: str, metadata_fn=None) -> list:
+        """
+        Index the exports of a directory that are not indexed yet, e.g. as a
+        batch export lands.
+        :param metadata_fn: Callable returning the metadata of an export path.
+        :return: The new clips.
+        """
+        new_clips = []
+        for name in sorted(os.listdir(directory)):
+            path = os.path.abspath(os.path.join(directory, name))
+            if not name.endswith(".json") or path in self._sources:
+                continue
+            try:
+                metadata = metadata_fn(path) if metadata_fn is not None else None
+                new_clips.append(self.add_export(path, metadata=metadata))
+            except (KeyError, ValueError) as e:
+                # Not an export, or a clip id already used
+                logging.debug(f"AnimationIndex: Skipped {path}: {e}")
+        if new_clips:
+            logging.info(f"AnimationIndex: Indexed {len(new_clips)} new clips")
+        return new_clips
+
+    # Queries, under the lock so that scan() can run while they are served
+
+    def find(self, **filters) -> list:
+        """
+        Clips whose metadata match all the filters. A filter value is the
+        expected value, a collection of accepted values or a predicate, e.g.
+        find(emotion=("joy", "amazement"), scene="mark").
+        """
+        with self._lock:
+            return self._find(filters)
+
+    def _find(self, filters: dict) -> list:
+        return [
+            clip
+            for clip in self._clip_list
+            if all(
+                key in clip.metadata and _matches(clip.metadata[key], expected)
+                for key, expected in filters.items()
+            )
+        ]
+
+    def frames(self, clip_id: str, start: float = None, end: float = None):
+        """
+        Weights of a clip between two times.
+        :param start: Start time in seconds, the clip start if None.
+        :param end: End time in seconds (excluded), the clip end if None.
+        :return: (n_frames, n_poses) float32 weights (a view of the index).
+        """
+        with self._lock:
+            clip = self.clips[clip_id]
+            features = self._features
+        first = 0 if start is None else max(0, int(np.ceil(start * clip.fps - 1e-9)))
+        last = (
+            clip.n_frames
+            if end is None
+            else min(clip.n_frames, int(np.ceil(end * clip.fps - 1e-9)))
+        )
+        last = max(first, last)
+        # Rows of indexed clips are never rewritten, the view stays valid
+        return features[clip.start_row + first : clip.start_row + last]
+
+    def _row_ranges(self, clips: list) -> list:
+        """
+        Row ranges of the clips, adjacent ones merged.
+        """
+        if clips is None:
+            return [(0, self._n_rows)]
+        ranges = []
+        for clip in sorted(clips, key=lambda clip: clip.start_row):
+            end = clip.start_row + clip.n_frames
+            if ranges and ranges[-1][1] == clip.start_row:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((clip.start_row, end))
+        return ranges
+
+    def _distances(self, start: int, end: int, target, columns) -> np.ndarray:
+        """
+        Squared distances of the rows [start, end) to the target.
+        """
+        features = self._features[start:end]
+        if columns is not None:
+            return np.square(features[:, columns] - target).sum(axis=1)
+        # |x - t|^2 = |x|^2 - 2 x.t + |t|^2, a single pass over the features
+        distances = self._row_norms[start:end] - 2 * (features @ target)
+        distances += target @ target
+        return distances
+
+    def _target_vector(self, target):
+        """
+        :return: (target values, pose columns or None for all the poses).
+        """
+        if isinstance(target, dict):
+            columns = [self.names.index(name) for name in target]
+            return np.array(list(target.values()), np.float32), columns
+        target = np.asarray(target, dtype=np.float32)
+        if len(target) != len(self.names):
+            raise ValueError(
+                f"AnimationIndex: Expected {len(self.names)} poses, got {len(target)}."
+            )
+        return target, None
+
+    def nearest(self, target, k: int = 10, clips: list = None, **filters) -> list:
+        """
+        The frames closest to a target pose (Euclidean distance).
+        :param target: Weight vector in the index pose order, or dict of
+            {pose name: weight} to compare only these poses.
+        :param clips: Clips to search, all the clips (or those matching the
+            filters, see find()) if None.
+        :return: Up to k PoseMatch, closest first.
+        """
+        with self._lock:
+            return self._nearest(target, k, clips, filters)
+
+    def _nearest(self, target, k: int, clips: list, filters: dict) -> list:
+        if clips is None and filters:
+            clips = self._find(filters)
+        if self._n_rows == 0 or (clips is not None and not clips):
+            return []
+        target, columns = self._target_vector(target)
+        ranges = self._row_ranges(clips)
+        # Only the selected rows are scanned
+        distances = np.concatenate(
+            [self._distances(start, end, target, columns) for start, end in ranges]
+        )
+        k = min(k, len(distances))
+        if k <= 0:
+            return []
+        best = np.argpartition(distances, k - 1)[:k]
+        best = best[np.argsort(distances[best])]
+        # Positions in the concatenated ranges to rows of the index
+        offsets = np.cumsum([0] + [end - start for start, end in ranges])
+        range_starts = np.array([start for start, _ in ranges])
+        range_of = np.searchsorted(offsets, best, side="right") - 1
+        rows = range_starts[range_of] + best - offsets[range_of]
+        distances = distances[best]
+        matches = []
+        for row, distance in zip(rows, distances):
+            clip = self._clip_list[self._row_clip[row]]
+            distance = float(np.sqrt(max(distance, 0.0)))
+            matches.append(PoseMatch(clip, int(row - clip.start_row), distance))
+        return matches
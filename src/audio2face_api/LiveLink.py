@@ -3,8 +3,20 @@ import threading
 import socket
 import struct
 import json
+import time
 
+from audio2face_api.A2F_CONFIG import LIVELINK_ACCEPT_TIMEOUT
 from audio2face_api.Buffer import Buffer
+from audio2face_api.Decoder import WeightsDecoder
+from audio2face_api.Tracing import span
+
+# Acknowledgement policies of the listener
+ACK_PER_FRAME = "frame"  # One ack per received frame
+ACK_BATCH = "batch"  # One ack every ack_every frames or ack_interval_ms
+ACK_NONE = "none"  # Never ack
+
+ACK_MESSAGE = b'{"success": true}'
+HEADER_SIZE = 8  # Size of the big-endian length prefix of each block
 
 
 class LiveLinkListener(threading.Thread):
@@ -15,20 +27,60 @@ class LiveLinkListener(threading.Thread):
         ip: str = "localhost",
         port: int = 12030,
         buffer: Buffer = None,
+        ack_policy: str = ACK_PER_FRAME,
+        ack_every: int = 10,
+        ack_interval_ms: float = 50.0,
+        decoder: WeightsDecoder = None,
+        accept_timeout: float = LIVELINK_ACCEPT_TIMEOUT,
     ):
+        """
+        :param ack_policy: When to answer the sender with an OK status: ACK_PER_FRAME,
+            ACK_BATCH (every ack_every frames or ack_interval_ms, whichever comes
+            first) or ACK_NONE.
+        :param ack_every: Number of frames per ack in ACK_BATCH mode.
+        :param ack_interval_ms: Max delay of a pending ack in ACK_BATCH mode. A
+            pending ack is also sent when no frame arrives for that long, so a
+            sender that waits for acks is never stalled.
+        :param decoder: If given, frames are decoded into float32 rows of their
+            blendshape weights instead of dicts (see WeightsDecoder).
+        :param accept_timeout: Period in seconds at which the blocking socket
+            calls return to check for stop(), i.e. the max time stop() takes.
+        """
         super().__init__()
+        if ack_policy not in (ACK_PER_FRAME, ACK_BATCH, ACK_NONE):
+            raise ValueError(f"LiveLinkListener: Unknown ack policy {ack_policy}.")
         self.ip = ip
         self.port = port
         self.buffer = buffer
+        self.ack_policy = ack_policy
+        self.ack_every = max(1, ack_every)
+        self.ack_interval = ack_interval_ms / 1000
+        self.decoder = decoder
+        self.accept_timeout = accept_timeout
+        self.consumers = []  # Callables receiving each frame after the buffer
+        self.raw_consumers = []  # Callables receiving each raw block
+        self.frames_received = 0
+        self.acks_sent = 0
         self._stop_event = threading.Event()  # Event to handle Thread Stopping
+        self._ready_event = threading.Event()  # Set once the socket is listening
+        self.error = None
         self.sock = None
         self.connected = False
 
     def run(self):
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)  # UDP for example
-        self.sock.bind((self.ip, self.port))
-        self.sock.listen()
-        self.sock.settimeout(10.0)  # Listening timeout for non-blocking thread
+        try:
+            self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.sock.bind((self.ip, self.port))
+            self.port = self.sock.getsockname()[1]  # Actual port if 0 was given
+            self.sock.listen()
+            # Listening timeout for non-blocking thread
+            self.sock.settimeout(self.accept_timeout)
+        except OSError as e:
+            logging.error(f"LiveLinkListener: Failed to listen on {self.port}: {e}")
+            self.error = e
+            self._ready_event.set()
+            return
+        self._ready_event.set()
         logging.info(f"LiveLinkListener: Listening on {self.ip}:{self.port}")
         while not self._stop_event.is_set():  # Keep listening while not interrupted
             try:
@@ -42,22 +94,79 @@ class LiveLinkListener(threading.Thread):
                     logging.debug("LiveLinkListener: Waiting for connection...")
                 continue
             except socket.error as e:
-                logging.error(f"Socket error: {e}")
+                if not self._stop_event.is_set():
+                    logging.error(f"Socket error: {e}")
                 break
+        self.sock.close()
         logging.debug("LiveLinkListener: End of Job")
 
     def _handle_client(self, conn: socket, addr):
         with conn:
+            if self.ack_policy == ACK_BATCH:
+                # Wake up to flush a pending ack when the sender goes quiet
+                conn.settimeout(min(self.ack_interval, self.accept_timeout))
+            else:
+                # Wake up to check for stop()
+                conn.settimeout(self.accept_timeout)
+            pending_acks = 0
+            last_ack_time = time.monotonic()
+            data = bytearray()
             try:
                 while not self._stop_event.is_set():
-                    block = conn.recv(4096)  # Large Enough to receive one frame
-                    if not block:
+                    try:
+                        received = conn.recv(65536)
+                    except socket.timeout:
+                        if pending_acks:
+                            conn.sendall(ACK_MESSAGE)
+                            self.acks_sent += 1
+                            pending_acks = 0
+                            last_ack_time = time.monotonic()
+                        continue
+                    if not received:
                         logging.info(f"LiveLinkListener: Client {addr} disconnected.")
                         break
                     logging.debug(f"LiveLinkListener: Received data from {addr}")
-                    frame = self._unpack_block(block)
-                    self.buffer.add(frame)
-                    conn.sendall(b'{"success": true}')  # Answer with an OK  status
+                    data += received
+
+                    # A read can hold several frames, or only a part of one
+                    n_frames = 0
+                    offset = 0
+                    while len(data) - offset >= HEADER_SIZE:
+                        size = struct.unpack_from("!Q", data, offset)[0]
+                        end = offset + HEADER_SIZE + size
+                        if len(data) < end:
+                            break
+                        block = bytes(data[offset:end])
+                        for raw_consumer in self.raw_consumers:
+                            raw_consumer(block)
+                        with span("decode", "livelink"):
+                            frame = self._unpack_block(block)
+                        with span("buffer", "livelink"):
+                            self.buffer.add(frame)
+                            for consumer in self.consumers:
+                                consumer(frame)
+                        n_frames += 1
+                        offset = end
+                    if offset:
+                        del data[:offset]
+                    self.frames_received += n_frames
+
+                    # Answer with an OK status
+                    if self.ack_policy == ACK_PER_FRAME:
+                        if n_frames:
+                            conn.sendall(ACK_MESSAGE * n_frames)
+                            self.acks_sent += n_frames
+                    elif self.ack_policy == ACK_BATCH:
+                        pending_acks += n_frames
+                        now = time.monotonic()
+                        if pending_acks and (
+                            pending_acks >= self.ack_every
+                            or now - last_ack_time >= self.ack_interval
+                        ):
+                            conn.sendall(ACK_MESSAGE)
+                            self.acks_sent += 1
+                            pending_acks = 0
+                            last_ack_time = now
             except (ConnectionResetError, ConnectionAbortedError) as conn_err:
                 logging.info(
                     f"LiveLinkListener: Client {addr} forcibly closed the connection: {conn_err}"
@@ -75,8 +184,11 @@ class LiveLinkListener(threading.Thread):
             block: Bytes stream containing the 8-byte header + JSON ASCII data.
 
         Returns:
-            A dict parsed from the JSON payload.
+            A dict parsed from the JSON payload, or a float32 row if the listener
+            has a decoder.
         """
+        if self.decoder is not None:
+            return self.decoder.decode_block(block)
 
         if len(block) < 8:
             raise ValueError("Data too short to contain header.")
@@ -91,9 +203,46 @@ class LiveLinkListener(threading.Thread):
         json_str = json_bytes.decode("ascii")
         return json.loads(json_str)
 
+    def add_consumer(self, consumer):
+        """
+        Register a callable called with each received frame. It runs on the
+        receive loop, so it must return quickly.
+        """
+        self.consumers.append(consumer)
+
+    def remove_consumer(self, consumer):
+        if consumer in self.consumers:
+            self.consumers.remove(consumer)
+
+    def add_raw_consumer(self, consumer):
+        """
+        Register a callable called with each received block (8-byte header
+        included), before it is decoded. It runs on the receive loop, so it must
+        return quickly.
+        """
+        self.raw_consumers.append(consumer)
+
+    def remove_raw_consumer(self, consumer):
+        if consumer in self.raw_consumers:
+            self.raw_consumers.remove(consumer)
+
+    def wait_until_ready(self, timeout: float = None):
+        """
+        Block until the listener socket accepts connections.
+        :param timeout: Max time to wait in seconds.
+        """
+        if not self._ready_event.wait(timeout):
+            raise TimeoutError(
+                f"LiveLinkListener: Not listening on {self.port} after {timeout} s."
+            )
+        if self.error is not None:
+            raise ConnectionError(
+                f"LiveLinkListener: Failed to listen on {self.port}: {self.error}"
+            )
+
     def stop(self):
-        """Stop the listener thread and close the socket."""
+        """
+        Stop the listener thread, which closes the socket within accept_timeout.
+        """
         self._stop_event.set()
-        if self.sock:
-            self.sock.close()
         logging.info("LiveLinkListener: Stopping listener")
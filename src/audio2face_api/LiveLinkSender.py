@@ -0,0 +1,205 @@
+import json
+import logging
+import math
+import socket
+import struct
+import threading
+import time
+
+ARKIT_BLENDSHAPE_NAMES = [
+    "eyeBlinkLeft",
+    "eyeLookDownLeft",
+    "eyeLookInLeft",
+    "eyeLookOutLeft",
+    "eyeLookUpLeft",
+    "eyeSquintLeft",
+    "eyeWideLeft",
+    "eyeBlinkRight",
+    "eyeLookDownRight",
+    "eyeLookInRight",
+    "eyeLookOutRight",
+    "eyeLookUpRight",
+    "eyeSquintRight",
+    "eyeWideRight",
+    "jawForward",
+    "jawLeft",
+    "jawRight",
+    "jawOpen",
+    "mouthClose",
+    "mouthFunnel",
+    "mouthPucker",
+    "mouthLeft",
+    "mouthRight",
+    "mouthSmileLeft",
+    "mouthSmileRight",
+    "mouthFrownLeft",
+    "mouthFrownRight",
+    "mouthDimpleLeft",
+    "mouthDimpleRight",
+    "mouthStretchLeft",
+    "mouthStretchRight",
+    "mouthRollLower",
+    "mouthRollUpper",
+    "mouthShrugLower",
+    "mouthShrugUpper",
+    "mouthPressLeft",
+    "mouthPressRight",
+    "mouthLowerDownLeft",
+    "mouthLowerDownRight",
+    "mouthUpperUpLeft",
+    "mouthUpperUpRight",
+    "browDownLeft",
+    "browDownRight",
+    "browInnerUp",
+    "browOuterUpLeft",
+    "browOuterUpRight",
+    "cheekPuff",
+    "cheekSquintLeft",
+    "cheekSquintRight",
+    "noseSneerLeft",
+    "noseSneerRight",
+    "tongueOut",
+]
+
+
+def get_blendshape_names(n_blendshapes: int = 52):
+    """
+    Get n blendshape names, the ARKit names first.
+    """
+    names = ARKIT_BLENDSHAPE_NAMES[:n_blendshapes]
+    names += [f"blendShape{i}" for i in range(len(names), n_blendshapes)]
+    return names
+
+
+def make_livelink_payload(
+    names: list, weights: list, frame_index: int = 0, fps: int = 30
+):
+    """
+    Build a JSON payload shaped like the ones sent by the StreamLivelink node.
+    """
+    seconds, frame = divmod(frame_index, fps)
+    return {
+        "Audio2Face": {
+            "Body": {},
+            "Facial": {
+                "Timecode": [0, 0, seconds, frame, 0.0, fps],
+                "Names": names,
+                "Weights": weights,
+            },
+        }
+    }
+
+
+def pack_block(payload: dict) -> bytes:
+    """
+    Pack a payload the way the StreamLivelink node does: an 8-byte big-endian
+    size header followed by the ASCII JSON data.
+    """
+    data = json.dumps(payload).encode("ascii")
+    return struct.pack("!Q", len(data)) + data
+
+
+def make_synthetic_blocks(n_frames: int, n_blendshapes: int = 52, fps: int = 30):
+    """
+    Generate packed LiveLink blocks with smoothly varying weights.
+    """
+    names = get_blendshape_names(n_blendshapes)
+    blocks = []
+    for i in range(n_frames):
+        weights = [
+            round(0.5 + 0.5 * math.sin(0.1 * i + 0.3 * j), 6)
+            for j in range(n_blendshapes)
+        ]
+        blocks.append(pack_block(make_livelink_payload(names, weights, i, fps)))
+    return blocks
+
+
+class SyntheticLiveLinkSender:
+    """
+    Plays the role of the StreamLivelink node: connects to a LiveLinkListener
+    and sends it packed frames over TCP.
+    """
+
+    def __init__(self, host: str = "localhost", port: int = 12030):
+        self.host = host
+        self.port = port
+        self.sock = None
+        self.acks_received = 0
+        self._ack_reader = None
+
+    def connect(self, wait_for_ack: bool = False, timeout: float = 5.0):
+        """
+        Connect to the listener.
+        :param wait_for_ack: If False, acks are drained by a background thread so
+            the sender never waits on them.
+        """
+        self.sock = socket.create_connection((self.host, self.port), timeout=timeout)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.sock.settimeout(None)
+        if not wait_for_ack:
+            self._ack_reader = threading.Thread(target=self._drain_acks, daemon=True)
+            self._ack_reader.start()
+
+    def _drain_acks(self):
+        try:
+            while True:
+                data = self.sock.recv(65536)
+                if not data:
+                    break
+                self.acks_received += data.count(b"}")
+        except OSError:
+            pass
+
+    def send_blocks(
+        self,
+        blocks: list,
+        fps: float = None,
+        wait_for_ack: bool = False,
+        timestamps: list = None,
+    ):
+        """
+        Send packed blocks to the listener.
+        :param fps: Pace of the frames, as fast as possible if None.
+        :param wait_for_ack: Wait for one ack after each frame (stop-and-wait).
+        :param timestamps: Send time of each block in seconds, relative to the
+            start. Overrides fps.
+        :return: Send duration in seconds.
+        """
+        start_time = time.perf_counter()
+        for i, block in enumerate(blocks):
+            send_at = None
+            if timestamps is not None:
+                send_at = timestamps[i]
+            elif fps:
+                send_at = i / fps
+            if send_at is not None:
+                delay = start_time + send_at - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+            self.sock.sendall(block)
+            if wait_for_ack:
+                self.sock.recv(64)
+                self.acks_received += 1
+        return time.perf_counter() - start_time
+
+    def close(self, timeout: float = 5.0):
+        """
+        Close the connection once the listener has read every frame: the write
+        side is shut down first, then the remaining acks are drained until the
+        listener closes its side (closing with unread acks would reset it).
+        """
+        if self.sock is None:
+            return
+        try:
+            self.sock.shutdown(socket.SHUT_WR)
+            if self._ack_reader is not None:
+                self._ack_reader.join(timeout=timeout)
+            else:
+                self.sock.settimeout(timeout)
+                self._drain_acks()
+        except OSError:
+            pass
+        self._ack_reader = None
+        self.sock.close()
+        self.sock = None
+        logging.debug("SyntheticLiveLinkSender: Closed connection")
@@ -0,0 +1,207 @@
+"""
+Records the raw LiveLink blocks of a session, with their receive time and the
+audio pushed to A2F, and replays them to a listener without a running A2F.
+
+A recording is a single file: a magic line, then records made of a header
+(kind, timestamp in seconds since the start of the recording, payload size)
+followed by the payload.
+"""
+
+import json
+import logging
+import struct
+import time
+
+import numpy as np
+import soundfile
+
+from audio2face_api.LiveLinkSender import SyntheticLiveLinkSender
+from audio2face_api.Sinks import BackgroundSinkWriter, FrameSink, _make_parent_dir
+
+RECORDING_MAGIC = b"A2FREC1\n"
+_RECORD_HEADER = struct.Struct("<cdI")
+
+# Record kinds
+_BLOCK = b"B"  # A raw LiveLink block, 8-byte header included
+_AUDIO_START = b"S"  # Start of a pushed audio, JSON {"sample_rate": ...}
+_AUDIO = b"A"  # Pushed audio samples, float32
+
+
+class _RecordingFileSink(FrameSink):
+    """Appends (kind, timestamp, payload) records to a recording file."""
+
+    def __init__(self, path: str):
+        _make_parent_dir(path)
+        self.file = open(path, "wb")
+        self.file.write(RECORDING_MAGIC)
+
+    def write_batch(self, records: list):
+        self.file.write(
+            b"".join(
+                _RECORD_HEADER.pack(kind, timestamp, len(payload)) + payload
+                for kind, timestamp, payload in records
+            )
+        )
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class SessionRecorder:
+    """
+    Records the blocks received by a LiveLinkListener and the pushed audio.
+
+    The records are written by a BackgroundSinkWriter, so recording never
+    stalls the receive loop. Use Audio2FaceStream.start_recording() to record
+    a stream session, or attach() to record a listener directly.
+    """
+
+    def __init__(self, path: str, queue_size: int = 100000):
+        """
+        :param path: Path of the recording file (overwritten).
+        :param queue_size: Max number of records waiting to be written, further
+            records are dropped and counted in records_dropped.
+        """
+        self.path = path
+        self.start_time = time.perf_counter()
+        self._sink = _RecordingFileSink(path)
+        self.writer = BackgroundSinkWriter([self._sink], queue_size=queue_size)
+        self.writer.start()
+        self._listeners = []
+
+    def _put(self, kind: bytes, payload: bytes):
+        self.writer.put((kind, time.perf_counter() - self.start_time, payload))
+
+    def record_block(self, block: bytes):
+        self._put(_BLOCK, block)
+
+    def record_audio_start(self, sample_rate: int):
+        self._put(_AUDIO_START, json.dumps({"sample_rate": sample_rate}).encode())
+
+    def record_audio(self, chunk: np.ndarray):
+        self._put(_AUDIO, chunk.astype(np.float32, copy=False).tobytes())
+
+    def attach(self, listener):
+        """
+        Record the raw blocks received by a LiveLinkListener.
+        """
+        listener.add_raw_consumer(self.record_block)
+        self._listeners.append(listener)
+
+    @property
+    def records_dropped(self) -> int:
+        return self.writer.frames_dropped
+
+    def stop(self):
+        """
+        Detach from the listeners, write the queued records and close the file.
+        """
+        for listener in self._listeners:
+            listener.remove_raw_consumer(self.record_block)
+        self._listeners = []
+        self.writer.stop()
+        self.writer.join()
+        self._sink.close()
+        if self.records_dropped:
+            logging.warning(
+                f"SessionRecorder: {self.records_dropped} records dropped from {self.path}"
+            )
+        logging.info(f"SessionRecorder: Recording saved to {self.path}")
+
+
+class SessionRecording:
+    """The content of a recording file."""
+
+    def __init__(self, blocks: list, block_times: list, audio_segments: list):
+        """
+        :param blocks: Raw LiveLink blocks, in receive order.
+        :param block_times: Receive time of each block, in seconds.
+        :param audio_segments: Pushed audios, as (start time, sample rate,
+            float32 samples) tuples.
+        """
+        self.blocks = blocks
+        self.block_times = np.array(block_times, dtype=np.float64)
+        self.audio_segments = audio_segments
+
+    @classmethod
+    def load(cls, path: str):
+        with open(path, "rb") as f:
+            data = f.read()
+        if not data.startswith(RECORDING_MAGIC):
+            raise ValueError(f"SessionRecording: {path} is not a recording file.")
+        blocks, block_times, audio_segments = [], [], []
+        audio_chunks = None
+        offset = len(RECORDING_MAGIC)
+        while offset + _RECORD_HEADER.size <= len(data):
+            kind, timestamp, size = _RECORD_HEADER.unpack_from(data, offset)
+            offset += _RECORD_HEADER.size
+            payload = data[offset : offset + size]
+            offset += size
+            if len(payload) < size:
+                logging.warning(f"SessionRecording: Truncated record in {path}")
+                break
+            if kind == _BLOCK:
+                blocks.append(payload)
+                block_times.append(timestamp)
+            elif kind == _AUDIO_START:
+                audio_chunks = []
+                sample_rate = json.loads(payload)["sample_rate"]
+                audio_segments.append((timestamp, sample_rate, audio_chunks))
+            elif kind == _AUDIO and audio_chunks is not None:
+                audio_chunks.append(np.frombuffer(payload, dtype=np.float32))
+        audio_segments = [
+            (start, sample_rate, np.concatenate(chunks) if chunks else np.zeros(0))
+            for start, sample_rate, chunks in audio_segments
+        ]
+        return cls(blocks, block_times, audio_segments)
+
+    @property
+    def duration(self) -> float:
+        """
+        Time between the first and the last received block, in seconds.
+        """
+        if len(self.block_times) == 0:
+            return 0.0
+        return float(self.block_times[-1] - self.block_times[0])
+
+    def save_audio(self, path: str, index: int = 0):
+        """
+        Write one of the pushed audios to an audio file.
+        """
+        _, sample_rate, samples = self.audio_segments[index]
+        soundfile.write(path, samples, sample_rate)
+
+
+def replay_recording(
+    recording: SessionRecording,
+    host: str = "localhost",
+    port: int = 12030,
+    speed: float = 1.0,
+    wait_for_ack: bool = False,
+):
+    """
+    Send the recorded blocks to a LiveLinkListener, like A2F did.
+    :param speed: Replay speed relative to the original timing (2.0 is twice
+        as fast), as fast as possible if None.
+    :return: Replay duration in seconds.
+    """
+    timestamps = None
+    if speed is not None and len(recording.blocks):
+        if speed <= 0:
+            raise ValueError("replay_recording: speed must be positive.")
+        timestamps = (recording.block_times - recording.block_times[0]) / speed
+    sender = SyntheticLiveLinkSender(host, port)
+    sender.connect(wait_for_ack=wait_for_ack)
+    try:
+        duration = sender.send_blocks(
+            recording.blocks, wait_for_ack=wait_for_ack, timestamps=timestamps
+        )
+    finally:
+        sender.close()
+    logging.info(
+        f"Recording: Replayed {len(recording.blocks)} blocks in {duration:.2f}s"
+    )
+    return duration
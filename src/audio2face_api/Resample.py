@@ -0,0 +1,252 @@
+"""
+Client-side temporal resampling of blendshape weights, so that A2F can run at
+30 fps while the renderer gets 60 or 120 fps.
+
+Two modes: "linear", and "cubic" (Catmull-Rom spline, which passes through
+the source frames and keeps the curves smooth, but may slightly overshoot;
+use clip=(0.0, 1.0) to keep the weights in range).
+"""
+
+import json
+import logging
+
+import numpy as np
+
+LINEAR = "linear"
+CUBIC = "cubic"
+
+
+def _interpolate(p0, p1, p2, p3, u, mode: str):
+    """
+    Interpolate between p1 and p2 at the fractions u (column vector).
+    """
+    if mode == LINEAR:
+        return p1 + (p2 - p1) * u
+    u2 = u * u
+    return 0.5 * (
+        2 * p1
+        + (p2 - p0) * u
+        + (2 * p0 - 5 * p1 + 4 * p2 - p3) * u2
+        + (3 * (p1 - p2) + p3 - p0) * u2 * u
+    )
+
+
+def _check_mode(mode: str):
+    if mode not in (LINEAR, CUBIC):
+        raise ValueError(f"Resample: Unknown mode {mode}, expected linear or cubic.")
+
+
+def resample_weights(
+    weights,
+    src_fps: float,
+    dst_fps: float,
+    mode: str = LINEAR,
+    clip: tuple = None,
+) -> np.ndarray:
+    """
+    Resample a whole clip of blendshape weights.
+    :param weights: (n_frames, n_poses) weights at src_fps.
+    :param clip: (min, max) range of the output weights, not clipped if None.
+    :return: (n_out, n_poses) float32 weights at dst_fps, spanning the same
+        time as the input (from the first to the last source frame).
+    """
+    _check_mode(mode)
+    weights = np.asarray(weights, dtype=np.float32)
+    n = len(weights)
+    if n < 2 or src_fps == dst_fps:
+        return weights.copy()
+    n_out = int(np.floor((n - 1) * dst_fps / src_fps + 1e-9)) + 1
+    # Output positions, in source frames
+    x = np.arange(n_out) * (src_fps / dst_fps)
+    i = np.minimum(x.astype(np.int64), n - 2)
+    u = (x - i)[:, None].astype(np.float32)
+    out = _interpolate(
+        weights[np.maximum(i - 1, 0)],
+        weights[i],
+        weights[i + 1],
+        weights[np.minimum(i + 2, n - 1)],
+        u,
+        mode,
+    )
+    if clip is not None:
+        np.clip(out, clip[0], clip[1], out=out)
+    return out.astype(np.float32, copy=False)
+
+
+def resample_export(
+    export_path: str,
+    dst_fps: float,
+    mode: str = LINEAR,
+    output_path: str = None,
+    clip: tuple = None,
+):
+    """
+    Resample the weights of a blendshapes JSON export (weightMat at exportFps).
+    :param output_path: Where to write the result, overwrites the export if None.
+    """
+    with open(export_path) as f:
+        export = json.load(f)
+    src_fps = export["exportFps"]
+    weights = resample_weights(export["weightMat"], src_fps, dst_fps, mode, clip)
+    export["weightMat"] = weights.tolist()
+    export["numFrames"] = len(weights)
+    export["exportFps"] = dst_fps
+    with open(output_path or export_path, "w") as f:
+        json.dump(export, f)
+    logging.info(
+        f"Resample: {export_path} resampled from {src_fps} to {dst_fps} fps ({mode})"
+    )
+
+
+def _find_weights_path(frame: dict):
+    """
+    Keys leading to the "Weights" list of a LiveLink frame dict.
+    """
+    stack = [(frame, ())]
+    while stack:
+        node, path = stack.pop()
+        if isinstance(node, dict):
+            if "Weights" in node:
+                return path + ("Weights",)
+            stack.extend((value, path + (key,)) for key, value in node.items())
+    raise ValueError("StreamResampler: No Weights in the frame.")
+
+
+def _replace_weights(frame: dict, path: tuple, weights: list) -> dict:
+    """
+    Copy of a frame with other weights, only the dicts along path are copied.
+    """
+    root = dict(frame)
+    node = root
+    for key in path[:-1]:
+        node[key] = dict(node[key])
+        node = node[key]
+    node[path[-1]] = weights
+    return root
+
+
+class StreamResampler:
+    """
+    Resamples live frames, as they arrive.
+
+    Linear mode outputs the frames between two source frames as soon as the
+    second one arrives. Cubic mode needs one more source frame of lookahead,
+    so its output lags one source frame behind (33 ms at 30 fps).
+
+    Frames can be weight vectors (decoded rows) or LiveLink frame dicts, whose
+    "Weights" list is resampled (the other fields are those of the previous
+    source frame). Attach it to a listener with
+    listener.add_consumer(resampler.push).
+    """
+
+    def __init__(
+        self,
+        src_fps: float = 30,
+        dst_fps: float = 60,
+        mode: str = LINEAR,
+        on_frame=None,
+        clip: tuple = None,
+    ):
+        """
+        :param on_frame: Callable receiving each output frame, if given.
+        :param clip: (min, max) range of the output weights.
+        """
+        _check_mode(mode)
+        self.src_fps = src_fps
+        self.dst_fps = dst_fps
+        self.mode = mode
+        self.on_frame = on_frame
+        self.clip = clip
+        self.lookahead = 1 if mode == CUBIC else 0
+        self.reset()
+
+    def reset(self):
+        """
+        Start a new stream.
+        """
+        self._frames = []  # Last source frames, up to 4
+        self._weights = []
+        self._weights_path = None
+        self._count = 0  # Number of source frames pushed
+        self._next_x = 0.0  # Position of the next output, in source frames
+
+    def _weights_of(self, frame) -> np.ndarray:
+        if isinstance(frame, np.ndarray):
+            return frame.astype(np.float32, copy=False)
+        if self._weights_path is None:
+            self._weights_path = _find_weights_path(frame)
+        node = frame
+        for key in self._weights_path:
+            node = node[key]
+        return np.asarray(node, dtype=np.float32)
+
+    def _emit(self, end: int, include_end: bool = False) -> list:
+        """
+        Output the positions before source frame `end` (and at it if
+        include_end), interpolated between end - 1 and end.
+        """
+        step = self.src_fps / self.dst_fps
+        positions = []
+        while self._next_x < end or (include_end and self._next_x <= end + 1e-9):
+            positions.append(self._next_x)
+            self._next_x += step
+        if not positions:
+            return []
+
+        # Source frames end - 2 .. end + 1, clamped to the pushed frames
+        def get(index):
+            first = self._count - len(self._weights)
+            index = min(max(index, 0), self._count - 1)
+            return self._weights[index - first]
+
+        u = (np.array(positions) - (end - 1))[:, None].astype(np.float32)
+        if end == 0:
+            out = np.repeat(get(0)[None], len(positions), axis=0)
+        else:
+            out = _interpolate(
+                get(end - 2), get(end - 1), get(end), get(end + 1), u, self.mode
+            )
+        if self.clip is not None:
+            np.clip(out, self.clip[0], self.clip[1], out=out)
+
+        template = self._frames[min(max(end - 1, 0), self._count - 1) - self._count]
+        if isinstance(template, np.ndarray):
+            frames = list(out.astype(np.float32, copy=False))
+        else:
+            frames = [
+                _replace_weights(template, self._weights_path, row.tolist())
+                for row in out
+            ]
+        if self.on_frame is not None:
+            for frame in frames:
+                self.on_frame(frame)
+        return frames
+
+    def push(self, frame) -> list:
+        """
+        Add a source frame.
+        :return: The output frames it completes.
+        """
+        self._weights.append(self._weights_of(frame))
+        self._frames.append(frame)
+        if len(self._weights) > 4:
+            del self._weights[0]
+            del self._frames[0]
+        self._count += 1
+        end = self._count - 1 - self.lookahead
+        if end < 1:
+            return []
+        return self._emit(end)
+
+    def flush(self) -> list:
+        """
+        Output the remaining frames, up to the last source frame.
+        """
+        if self._count == 0:
+            return []
+        frames = []
+        last = self._count - 1
+        for end in range(max(1, last - self.lookahead + 1), last + 1):
+            frames += self._emit(end)
+        frames += self._emit(max(last, 0), include_end=True)
+        return frames
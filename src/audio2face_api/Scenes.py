@@ -0,0 +1,75 @@
+import threading
+
+
+class SceneRegistry:
+    """
+    Tracks which USD scene each Audio2Face endpoint has loaded, and how long the
+    scene loads took, so that reloads of the resident scene can be skipped.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._resident = {}  # api_url -> scene path
+        self._loads = {}  # api_url -> list of (scene path, duration in seconds)
+        self._skipped = {}  # api_url -> number of skipped loads
+
+    def get_scene(self, api_url: str):
+        """
+        Get the scene currently loaded on the endpoint, None if unknown.
+        """
+        with self.lock:
+            return self._resident.get(api_url)
+
+    def is_loaded(self, api_url: str, scene_path: str) -> bool:
+        with self.lock:
+            return self._resident.get(api_url) == scene_path
+
+    def record_load(self, api_url: str, scene_path: str, duration: float):
+        """
+        Record a successful scene load on the endpoint.
+        :param duration: Time taken by the load request, in seconds.
+        """
+        with self.lock:
+            self._resident[api_url] = scene_path
+            self._loads.setdefault(api_url, []).append((scene_path, duration))
+
+    def record_skip(self, api_url: str):
+        with self.lock:
+            self._skipped[api_url] = self._skipped.get(api_url, 0) + 1
+
+    def forget(self, api_url: str):
+        """
+        Forget the resident scene of an endpoint (e.g. after a server restart).
+        """
+        with self.lock:
+            self._resident.pop(api_url, None)
+
+    def get_stats(self):
+        """
+        Get the scene load statistics per endpoint.
+        :return: Dict api_url -> loads, switches (loads of a scene different from
+            the previous one), skipped loads and load times in seconds.
+        """
+        with self.lock:
+            stats = {}
+            for api_url in set(self._loads) | set(self._skipped):
+                loads = self._loads.get(api_url, [])
+                durations = [duration for _, duration in loads]
+                switches = sum(
+                    1 for prev, cur in zip(loads, loads[1:]) if prev[0] != cur[0]
+                )
+                stats[api_url] = {
+                    "resident_scene": self._resident.get(api_url),
+                    "loads": len(loads),
+                    "switches": switches,
+                    "skipped_loads": self._skipped.get(api_url, 0),
+                    "total_load_time": sum(durations),
+                    "mean_load_time": (
+                        sum(durations) / len(durations) if durations else 0.0
+                    ),
+                }
+            return stats
+
+
+# Process-level registry shared by every Audio2Face object
+SCENE_REGISTRY = SceneRegistry()
@@ -0,0 +1,295 @@
+import heapq
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import CancelledError, Future, ThreadPoolExecutor
+from contextlib import contextmanager
+
+import numpy as np
+
+from audio2face_api.Scenes import SCENE_REGISTRY
+
+# Priorities of SessionScheduler, lower runs first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 10
+
+
+class EndpointScheduler:
+    """
+    Assigns jobs to Audio2Face endpoints.
+
+    Jobs go to the least loaded endpoint. With scene affinity, an endpoint that
+    already holds the scene a job needs is preferred, so that jobs needing the
+    same scene go to the same endpoint instead of making the endpoints switch
+    scenes back and forth.
+    """
+
+    def __init__(
+        self,
+        endpoints: list,
+        scene_affinity: bool = True,
+        affinity_weight: float = 1.0,
+    ):
+        """
+        :param endpoints: List of endpoints (API URLs, or any hashable object
+            whose api_url attribute or value is known by the scene registry).
+        :param scene_affinity: Prefer endpoints where the job's scene is resident.
+        :param affinity_weight: Number of in-flight jobs an endpoint holding the
+            scene may have above the least loaded one and still be preferred.
+        """
+        if not endpoints:
+            raise ValueError("EndpointScheduler: At least one endpoint is required.")
+        self.endpoints = list(endpoints)
+        self.scene_affinity = scene_affinity
+        self.affinity_weight = affinity_weight
+        self.lock = threading.Lock()
+        self._in_flight = {endpoint: 0 for endpoint in self.endpoints}
+        # Scene of the last job assigned to each endpoint, it becomes resident
+        # as soon as that job loads it
+        self._assigned_scene = {}
+        self.affinity_hits = 0
+        self.affinity_misses = 0
+
+    def _get_scene(self, endpoint):
+        api_url = getattr(endpoint, "api_url", endpoint)
+        return self._assigned_scene.get(endpoint) or SCENE_REGISTRY.get_scene(api_url)
+
+    def acquire(self, scene_path: str = None):
+        """
+        Pick an endpoint for a job and count it as in flight.
+        :param scene_path: Scene needed by the job, if any.
+        :return: The chosen endpoint, to be given back with release().
+        """
+        if scene_path is not None and not os.path.isabs(scene_path):
+            scene_path = os.path.abspath(scene_path)
+        with self.lock:
+
+            def cost(index):
+                endpoint = self.endpoints[index]
+                load = self._in_flight[endpoint]
+                if (
+                    self.scene_affinity
+                    and scene_path is not None
+                    and self._get_scene(endpoint) == scene_path
+                ):
+                    load -= self.affinity_weight
+                return (load, index)
+
+            endpoint = self.endpoints[min(range(len(self.endpoints)), key=cost)]
+            if scene_path is not None:
+                if self._get_scene(endpoint) == scene_path:
+                    self.affinity_hits += 1
+                else:
+                    self.affinity_misses += 1
+                self._assigned_scene[endpoint] = scene_path
+            self._in_flight[endpoint] += 1
+            logging.debug(f"EndpointScheduler: Job for {scene_path} on {endpoint}")
+            return endpoint
+
+    def release(self, endpoint):
+        with self.lock:
+            self._in_flight[endpoint] -= 1
+
+    @contextmanager
+    def endpoint(self, scene_path: str = None):
+        """
+        Context manager version of acquire() / release().
+        """
+        endpoint = self.acquire(scene_path)
+        try:
+            yield endpoint
+        finally:
+            self.release(endpoint)
+
+    def get_stats(self):
+        """
+        Get the number of in-flight jobs per endpoint and the scene affinity
+        hits (job sent where its scene was resident) and misses.
+        """
+        with self.lock:
+            return {
+                "in_flight": {str(k): v for k, v in self._in_flight.items()},
+                "affinity_hits": self.affinity_hits,
+                "affinity_misses": self.affinity_misses,
+            }
+
+
+class _Ticket:
+    def __init__(self, priority: int, sequence: int, job=None):
+        self.priority = priority
+        self.sequence = sequence
+        self.enqueued_at = time.monotonic()
+        self.granted = threading.Event()
+        self.job = job  # (future, func, args, kwargs) for submitted jobs
+        self.cancelled = False
+
+    def __lt__(self, other):
+        return (self.priority, self.sequence) < (other.priority, other.sequence)
+
+
+class SessionScheduler:
+    """
+    Queues the sessions of an endpoint by priority.
+
+    At most max_concurrent sessions run at a time (1 for an endpoint holding a
+    single player, as its track and frame buffer are shared). Waiting sessions
+    start in priority order, then in arrival order, so interactive streams go
+    ahead of batch exports. Sessions run either in the caller's thread with
+    slot(), or on the scheduler's threads with submit().
+    """
+
+    def __init__(self, max_concurrent: int = 1, metrics_window: int = 1000):
+        """
+        :param max_concurrent: Max number of sessions running at a time.
+        :param metrics_window: Number of recent sessions the wait-time metrics
+            are computed on.
+        """
+        if max_concurrent < 1:
+            raise ValueError("SessionScheduler: max_concurrent must be at least 1.")
+        self.max_concurrent = max_concurrent
+        self._queue = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent, thread_name_prefix="SessionScheduler"
+        )
+        self.running = 0
+        self.completed = 0
+        self.closed = False
+        self._wait_times = deque(maxlen=metrics_window)  # (priority, seconds)
+
+    def _enqueue(self, ticket: _Ticket):
+        with self._condition:
+            if self.closed:
+                raise RuntimeError("SessionScheduler: The scheduler is closed.")
+            heapq.heappush(self._queue, ticket)
+            self._dispatch()
+
+    def _dispatch(self):
+        # Called with the condition held
+        while self.running < self.max_concurrent and self._queue:
+            ticket = heapq.heappop(self._queue)
+            self.running += 1
+            self._wait_times.append(
+                (ticket.priority, time.monotonic() - ticket.enqueued_at)
+            )
+            if ticket.job is not None:
+                self._executor.submit(self._run_job, ticket)
+            ticket.granted.set()
+
+    def _release(self):
+        with self._condition:
+            self.running -= 1
+            self.completed += 1
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_BATCH, timeout: float = None):
+        """
+        Wait for the turn of a session and run it in the calling thread.
+        :param priority: Lower runs first, see PRIORITY_INTERACTIVE and
+            PRIORITY_BATCH.
+        :param timeout: Max time to wait for the turn, in seconds.
+        """
+        ticket = _Ticket(priority, next(self._sequence))
+        self._enqueue(ticket)
+        if not ticket.granted.wait(timeout):
+            with self._condition:
+                if not ticket.granted.is_set():
+                    self._queue.remove(ticket)
+                    heapq.heapify(self._queue)
+                    raise TimeoutError(
+                        f"SessionScheduler: No slot available after {timeout} s."
+                    )
+        if ticket.cancelled:
+            raise CancelledError("SessionScheduler: Scheduler closed.")
+        try:
+            yield
+        finally:
+            self._release()
+
+    def submit(self, func, *args, priority: int = PRIORITY_BATCH, **kwargs) -> Future:
+        """
+        Queue a session, run on the scheduler's threads when its turn comes.
+        :return: A Future of the result of func(*args, **kwargs).
+        """
+        future = Future()
+        self._enqueue(
+            _Ticket(priority, next(self._sequence), (future, func, args, kwargs))
+        )
+        return future
+
+    def _run_job(self, ticket: _Ticket):
+        future, func, args, kwargs = ticket.job
+        try:
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(func(*args, **kwargs))
+                except BaseException as e:
+                    future.set_exception(e)
+        finally:
+            self._release()
+
+    def get_stats(self) -> dict:
+        """
+        Queue depth and wait times, e.g. for autoscaling decisions.
+        :return: Dict with the number of running and queued sessions (in total
+            and per priority), the age of the oldest queued session, and the
+            p50/p95/max wait of the recent sessions (in total and per priority).
+        """
+        with self._condition:
+            now = time.monotonic()
+            queued_by_priority = {}
+            for ticket in self._queue:
+                queued_by_priority[ticket.priority] = (
+                    queued_by_priority.get(ticket.priority, 0) + 1
+                )
+            oldest = max((now - t.enqueued_at for t in self._queue), default=0.0)
+            wait_times = list(self._wait_times)
+            running, completed = self.running, self.completed
+
+        def summary(waits):
+            if not waits:
+                return {"wait_p50_s": None, "wait_p95_s": None, "wait_max_s": None}
+            waits = np.array(waits)
+            return {
+                "wait_p50_s": float(np.percentile(waits, 50)),
+                "wait_p95_s": float(np.percentile(waits, 95)),
+                "wait_max_s": float(waits.max()),
+            }
+
+        by_priority = {}
+        for priority, wait in wait_times:
+            by_priority.setdefault(priority, []).append(wait)
+        return {
+            "running": running,
+            "completed": completed,
+            "queue_depth": sum(queued_by_priority.values()),
+            "queue_depth_by_priority": queued_by_priority,
+            "oldest_wait_s": oldest,
+            **summary([wait for _, wait in wait_times]),
+            "waits_by_priority": {p: summary(w) for p, w in by_priority.items()},
+        }
+
+    def close(self, wait: bool = True):
+        """
+        Stop the scheduler threads once the running jobs are done. Queued
+        sessions that have not started are cancelled (slot() raises
+        CancelledError), new ones are refused with RuntimeError.
+        """
+        with self._condition:
+            self.closed = True
+            queued, self._queue = self._queue, []
+        for ticket in queued:
+            if ticket.job is not None:
+                ticket.job[0].cancel()
+            else:
+                ticket.cancelled = True
+                ticket.granted.set()
+        self._executor.shutdown(wait=wait)
+        logging.info(
+            f"SessionScheduler: Closed, {len(queued)} queued sessions dropped."
+        )
@@ -0,0 +1,312 @@
+import json
+import logging
+import os
+import queue
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import soundfile
+
+from audio2face_api.A2F import Audio2FaceDirect, Audio2FaceStream
+
+
+def plan_segments(
+    n_samples: int,
+    sample_rate: int,
+    segment_seconds: float,
+    overlap_seconds: float,
+) -> list:
+    """
+    Split a signal into overlapping segments.
+    :return: List of (start, end) sample ranges, consecutive segments share
+        overlap_seconds of audio.
+    """
+    segment = int(segment_seconds * sample_rate)
+    overlap = int(overlap_seconds * sample_rate)
+    if overlap >= segment:
+        raise ValueError("plan_segments: overlap must be shorter than the segments.")
+    if n_samples <= segment:
+        return [(0, n_samples)]
+    step = segment - overlap
+    n_segments = int(np.ceil((n_samples - overlap) / step))
+    starts = np.arange(n_segments) * step
+    return [(int(start), int(min(start + segment, n_samples))) for start in starts]
+
+
+def _frame_weights(frame) -> list:
+    """
+    Get the "Weights" list of a LiveLink frame dict.
+    """
+    stack = [frame]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "Weights" in node:
+                return node["Weights"]
+            stack.extend(node.values())
+    raise ValueError("Segments: No Weights in the received frame.")
+
+
+def _frame_names(frame) -> list:
+    stack = [frame]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if "Names" in node:
+                return node["Names"]
+            stack.extend(node.values())
+    return None
+
+
+def stitch_segments(
+    results: list,
+    segments: list,
+    sample_rate: int,
+    fps: float,
+    n_samples: int,
+) -> np.ndarray:
+    """
+    Stitch the weights of overlapping segments with linear crossfades over
+    the overlaps.
+    :param results: (n_frames, n_poses) weights of each segment.
+    :param segments: (start, end) sample range of each segment.
+    :return: (n_frames, n_poses) weights of the whole signal.
+    """
+    n_frames = int(round(n_samples / sample_rate * fps))
+    n_poses = results[0].shape[1]
+    total = np.zeros((n_frames, n_poses), dtype=np.float64)
+    norm = np.zeros(n_frames, dtype=np.float64)
+    for i, (weights, (start, end)) in enumerate(zip(results, segments)):
+        first = int(round(start / sample_rate * fps))
+        length = min(len(weights), n_frames - first)
+        if length <= 0:
+            continue
+        window = np.ones(length)
+        if i > 0:
+            # Fade in over the overlap with the previous segment
+            fade = int(round((segments[i - 1][1] - start) / sample_rate * fps))
+            fade = min(fade, length)
+            window[:fade] = (np.arange(fade) + 1) / (fade + 1)
+        if i < len(segments) - 1:
+            fade = int(round((end - segments[i + 1][0]) / sample_rate * fps))
+            fade = min(fade, length)
+            if fade:
+                window[length - fade :] = np.minimum(
+                    window[length - fade :], (fade - np.arange(fade)) / (fade + 1)
+                )
+        total[first : first + length] += window[:, None] * weights[:length]
+        norm[first : first + length] += window
+    covered = norm > 0
+    total[covered] /= norm[covered, None]
+    # Frames past the end of a short segment result keep the last value
+    if not covered.all() and covered.any():
+        last = np.maximum.accumulate(np.where(covered, np.arange(n_frames), 0))
+        total = total[last]
+    return total.astype(np.float32)
+
+
+def compare_weights(result: np.ndarray, reference: np.ndarray, seams: list = None):
+    """
+    Compare stitched weights with the single-pass weights.
+    :param seams: Frame ranges of the overlaps, reported separately.
+    :return: Dict of error metrics.
+    """
+    n = min(len(result), len(reference))
+    error = np.abs(result[:n] - reference[:n])
+    metrics = {
+        "frames": n,
+        "frame_count_diff": len(result) - len(reference),
+        "mae": float(error.mean()) if n else None,
+        "rmse": float(np.sqrt((error**2).mean())) if n else None,
+        "max_error": float(error.max()) if n else None,
+    }
+    if seams:
+        seam_errors = [
+            float(error[start:end].max()) for start, end in seams if end > start
+        ]
+        metrics["seam_max_error"] = max(seam_errors, default=None)
+    return metrics
+
+
+class SegmentedInference:
+    """
+    Runs the inference of a long audio as overlapping segments on several
+    workers at once, then stitches the blendshape weights back together.
+
+    Workers are Audio2FaceDirect objects (one per endpoint, with their scene
+    loaded) or Audio2FaceStream objects with LiveLink (one per streaming
+    player). Each segment carries overlap_seconds of the previous one, so the
+    seams are crossfaded over audio that both segments saw.
+    """
+
+    def __init__(
+        self,
+        workers: list,
+        segment_seconds: float = 30.0,
+        overlap_seconds: float = 1.0,
+        fps: int = 30,
+        work_dir: str = None,
+    ):
+        """
+        :param workers: Audio2FaceDirect or Audio2FaceStream objects.
+        :param work_dir: Directory of the segment audio and export files of
+            Direct workers, a temporary directory if None. It must be readable
+            by the A2F servers.
+        """
+        if not workers:
+            raise ValueError("SegmentedInference: At least one worker is required.")
+        for worker in workers:
+            if isinstance(worker, Audio2FaceStream) and not worker.use_livelink:
+                raise ValueError(
+                    "SegmentedInference: Stream workers need use_livelink=True."
+                )
+        self.workers = workers
+        self.segment_seconds = segment_seconds
+        self.overlap_seconds = overlap_seconds
+        self.fps = fps
+        self.work_dir = work_dir
+        self.names = None
+
+    def _run_direct(self, worker, audio_data, sample_rate, name, work_dir):
+        audio_name = f"{name}.wav"
+        soundfile.write(os.path.join(work_dir, audio_name), audio_data, sample_rate)
+        if worker.audio_root_path != work_dir:
+            worker.set_audio_root_path(work_dir)
+        res = worker.export_blendshapes(
+            audio_name=audio_name, output_dir=work_dir, output_name=name
+        )
+        export_path = Audio2FaceDirect.get_export_path(work_dir, name)
+        if res.get("status") != "OK" or export_path is None:
+            raise ValueError(f"SegmentedInference: Export of {name} failed.")
+        with open(export_path) as f:
+            export = json.load(f)
+        self.names = export.get("facsNames", self.names)
+        return np.array(export["weightMat"], dtype=np.float32)
+
+    def _run_stream(self, worker, audio_data, sample_rate):
+        frames = worker.stream_audio(audio_data, sample_rate)
+        if not frames:
+            raise ValueError("SegmentedInference: No frame received.")
+        if isinstance(frames[0], np.ndarray):
+            # Rows of a WeightsDecoder, its names are the ones of the columns
+            self.names = worker.livelink_listener.decoder.names or self.names
+            return np.stack(frames).astype(np.float32)
+        self.names = _frame_names(frames[0]) or self.names
+        return np.array([_frame_weights(frame) for frame in frames], dtype=np.float32)
+
+    def _run_one(self, worker, audio_data, sample_rate, name, work_dir):
+        start_time = time.perf_counter()
+        if isinstance(worker, Audio2FaceDirect):
+            weights = self._run_direct(worker, audio_data, sample_rate, name, work_dir)
+        else:
+            weights = self._run_stream(worker, audio_data, sample_rate)
+        logging.info(
+            f"SegmentedInference: {name} ({len(audio_data) / sample_rate:.1f}s) "
+            f"done in {time.perf_counter() - start_time:.2f}s"
+        )
+        return weights
+
+    def _with_work_dir(self, func):
+        work_dir = self.work_dir or tempfile.mkdtemp(prefix="a2f_segments_")
+        work_dir = os.path.abspath(work_dir)
+        if not os.path.exists(work_dir):
+            os.makedirs(work_dir)
+        try:
+            return func(work_dir)
+        finally:
+            if self.work_dir is None:
+                shutil.rmtree(work_dir, ignore_errors=True)
+
+    def run(self, audio_data: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Run the segments concurrently (one per free worker) and stitch them.
+        :return: (n_frames, n_poses) weights of the whole audio, the pose names
+            are in self.names once known.
+        """
+        segments = plan_segments(
+            len(audio_data), sample_rate, self.segment_seconds, self.overlap_seconds
+        )
+        free_workers = queue.Queue()
+        for worker in self.workers:
+            free_workers.put(worker)
+
+        def run_segment(index, work_dir):
+            start, end = segments[index]
+            worker = free_workers.get()
+            try:
+                return self._run_one(
+                    worker,
+                    audio_data[start:end],
+                    sample_rate,
+                    f"segment_{index:04d}",
+                    work_dir,
+                )
+            finally:
+                free_workers.put(worker)
+
+        def run_all(work_dir):
+            with ThreadPoolExecutor(max_workers=len(self.workers)) as executor:
+                futures = [
+                    executor.submit(run_segment, i, work_dir)
+                    for i in range(len(segments))
+                ]
+                return [future.result() for future in futures]
+
+        start_time = time.perf_counter()
+        results = self._with_work_dir(run_all)
+        weights = stitch_segments(
+            results, segments, sample_rate, self.fps, len(audio_data)
+        )
+        logging.info(
+            f"SegmentedInference: {len(segments)} segments on {len(self.workers)} "
+            f"workers in {time.perf_counter() - start_time:.2f}s"
+        )
+        return weights
+
+    def run_single(self, audio_data: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        Run the whole audio in one pass on the first worker.
+        """
+        return self._with_work_dir(
+            lambda work_dir: self._run_one(
+                self.workers[0], audio_data, sample_rate, "single_pass", work_dir
+            )
+        )
+
+    def seams(self, n_samples: int, sample_rate: int) -> list:
+        """
+        Frame ranges of the overlaps between segments.
+        """
+        segments = plan_segments(
+            n_samples, sample_rate, self.segment_seconds, self.overlap_seconds
+        )
+        return [
+            (
+                int(round(segments[i + 1][0] / sample_rate * self.fps)),
+                int(round(segments[i][1] / sample_rate * self.fps)),
+            )
+            for i in range(len(segments) - 1)
+        ]
+
+    def quality_check(self, audio_data: np.ndarray, sample_rate: int) -> dict:
+        """
+        Compare the segmented result with the single-pass result of the same
+        audio, and their wall-clock times.
+        :return: Dict of error metrics (see compare_weights) and timings.
+        """
+        start_time = time.perf_counter()
+        reference = self.run_single(audio_data, sample_rate)
+        single_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        stitched = self.run(audio_data, sample_rate)
+        segmented_time = time.perf_counter() - start_time
+        metrics = compare_weights(
+            stitched, reference, self.seams(len(audio_data), sample_rate)
+        )
+        metrics["single_pass_s"] = single_time
+        metrics["segmented_s"] = segmented_time
+        logging.info(f"SegmentedInference: Quality check {metrics}")
+        return metrics
@@ -0,0 +1,256 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from audio2face_api.A2E_CONFIG import A2E_DEFAULT_SETTINGS
+from audio2face_api.A2F import Audio2Face, Audio2FaceStream
+
+
+class StreamSlot:
+    """A set of scene resources that can serve one streaming session at a time."""
+
+    def __init__(
+        self,
+        player_instance: str,
+        livelink_node: str,
+        livelink_port: int,
+        a2e_instance: str = None,
+        audio_port: int = None,
+    ):
+        """
+        :param a2e_instance: A2E instance driven by the player, None for the one
+            of the a2e_settings.
+        :param audio_port: Port receiving the LiveLink audio, None for the
+            default one.
+        """
+        self.player_instance = player_instance
+        self.livelink_node = livelink_node
+        self.livelink_port = livelink_port
+        self.a2e_instance = a2e_instance
+        self.audio_port = audio_port
+
+    def __repr__(self):
+        return (
+            f"StreamSlot({self.player_instance}, {self.livelink_node}, "
+            f"{self.livelink_port}, {self.a2e_instance}, {self.audio_port})"
+        )
+
+
+class StreamSessionManager:
+    """
+    Runs several streaming sessions concurrently on one Audio2Face server.
+
+    The scene must contain one PlayerStreaming and one StreamLivelink node per
+    slot. Each session leases a free slot (player, LiveLink node, listening
+    port, and the A2E instance and audio port if given), and gives it back at
+    session end.
+    """
+
+    def __init__(
+        self,
+        grpc_url: str,
+        api_url: str,
+        scene_path: str,
+        players: list[str],
+        livelink_nodes: list[str],
+        livelink_ports: list[int],
+        a2e_instances: list[str] = None,
+        audio_ports: list[int] = None,
+        chunk_size: int = 4000,
+        fps: int = 30,
+        **stream_kwargs,
+    ):
+        """
+        :param players, livelink_nodes, livelink_ports: Stream slots of the scene.
+        :param a2e_instances: A2E instance of each slot, needed when several
+            slots use emotions (global emotion or keyframes).
+        :param audio_ports: LiveLink audio port of each slot, needed when
+            several slots use receive_audio.
+        :param stream_kwargs: Other arguments of the Audio2FaceStream sessions.
+        """
+        capacity = len(players)
+        if not (len(livelink_nodes) == len(livelink_ports) == capacity):
+            raise ValueError(
+                "StreamSessionManager: players, livelink_nodes and livelink_ports "
+                "must have the same length."
+            )
+        for name, values in (
+            ("a2e_instances", a2e_instances),
+            ("audio_ports", audio_ports),
+        ):
+            if values is not None and len(values) != capacity:
+                raise ValueError(
+                    f"StreamSessionManager: {name} must have one value per player."
+                )
+        ports = list(livelink_ports) + list(audio_ports or [])
+        if len(set(ports)) != len(ports):
+            raise ValueError(
+                "StreamSessionManager: livelink_ports and audio_ports must be unique."
+            )
+        if a2e_instances is not None and len(set(a2e_instances)) != capacity:
+            raise ValueError("StreamSessionManager: a2e_instances must be unique.")
+        if capacity > 1:
+            # Sessions sharing these would overwrite each other's state
+            uses_emotion = stream_kwargs.get("use_global_emotion") or stream_kwargs.get(
+                "use_keyframes"
+            )
+            if uses_emotion and a2e_instances is None:
+                raise ValueError(
+                    "StreamSessionManager: a2e_instances are required for "
+                    "concurrent sessions with emotions."
+                )
+            if stream_kwargs.get("receive_audio") and audio_ports is None:
+                raise ValueError(
+                    "StreamSessionManager: audio_ports are required for "
+                    "concurrent sessions with receive_audio."
+                )
+
+        self.grpc_url = grpc_url
+        self.api_url = api_url
+        self.scene_path = scene_path
+        self.chunk_size = chunk_size
+        self.fps = fps
+        self.stream_kwargs = stream_kwargs
+
+        self._free_slots = [
+            StreamSlot(player, node, port, a2e_instance, audio_port)
+            for player, node, port, a2e_instance, audio_port in zip(
+                players,
+                livelink_nodes,
+                livelink_ports,
+                a2e_instances or [None] * capacity,
+                audio_ports or [None] * capacity,
+            )
+        ]
+        self.capacity = len(self._free_slots)
+        self._slots_available = threading.Condition()
+
+        # Statistics
+        self.active_sessions = 0
+        self.peak_concurrent_sessions = 0
+        self.completed_sessions = 0
+        self._completeness_by_concurrency = {}
+
+    def init_A2F(self):
+        """
+        Load the scene once for every session of the server.
+        """
+        Audio2Face(api_url=self.api_url, scene_path=self.scene_path).init_A2F()
+
+    def _lease(self, timeout: float = None) -> StreamSlot:
+        with self._slots_available:
+            if not self._slots_available.wait_for(
+                lambda: len(self._free_slots) > 0, timeout=timeout
+            ):
+                raise TimeoutError("StreamSessionManager: No free stream slot.")
+            slot = self._free_slots.pop(0)
+            self.active_sessions += 1
+            self.peak_concurrent_sessions = max(
+                self.peak_concurrent_sessions, self.active_sessions
+            )
+            logging.info(f"StreamSessionManager: Leased {slot}")
+            return slot
+
+    def _release(self, slot: StreamSlot):
+        with self._slots_available:
+            self._free_slots.append(slot)
+            self.active_sessions -= 1
+            self._slots_available.notify()
+            logging.info(f"StreamSessionManager: Released {slot}")
+
+    @contextmanager
+    def session(self, timeout: float = None):
+        """
+        Lease a slot and yield an initialized Audio2FaceStream bound to it.
+        The LiveLink connection is closed and the slot released on exit.
+        :param timeout: Max time in seconds to wait for a free slot.
+        """
+        slot = self._lease(timeout=timeout)
+        kwargs = dict(self.stream_kwargs)
+        if slot.a2e_instance is not None:
+            kwargs["a2e_settings"] = {
+                **kwargs.get("a2e_settings", A2E_DEFAULT_SETTINGS),
+                "a2f_instance": slot.a2e_instance,
+            }
+        if slot.audio_port is not None:
+            kwargs["audio_port"] = slot.audio_port
+        a2f = None
+        try:
+            a2f = Audio2FaceStream(
+                self.grpc_url,
+                self.chunk_size,
+                False,
+                True,
+                api_url=self.api_url,
+                scene_path=self.scene_path,
+                fps=self.fps,
+                player_instance=slot.player_instance,
+                livelink_node=slot.livelink_node,
+                livelink_port=slot.livelink_port,
+                **kwargs,
+            )
+            a2f.init_A2F(load_scene=False)
+            yield a2f
+        finally:
+            if a2f is not None and a2f.livelink_listener is not None:
+                a2f.end_a2f_connection()
+            self._release(slot)
+
+    def _run_session(self, audio_data, sample_rate):
+        with self.session() as a2f:
+            with self._slots_available:
+                concurrency = self.active_sessions
+            start_time = time.time()
+            frames = a2f.stream_audio(audio_data, sample_rate)
+            expected = len(audio_data) / sample_rate * self.fps
+            completeness = min(len(frames) / expected, 1.0) if expected else 1.0
+            with self._slots_available:
+                self.completed_sessions += 1
+                self._completeness_by_concurrency.setdefault(concurrency, []).append(
+                    completeness
+                )
+            logging.info(
+                f"StreamSessionManager: Session on {a2f.player_instance} received "
+                f"{len(frames)}/{expected:.0f} frames in "
+                f"{time.time() - start_time:.2f} seconds."
+            )
+            return frames
+
+    def run_sessions(self, audios: list):
+        """
+        Stream several audios concurrently, one session per audio.
+        :param audios: List of (audio_data, sample_rate) tuples.
+        :return: List of the received frames, in the order of the audios.
+        """
+        with ThreadPoolExecutor(max_workers=self.capacity) as executor:
+            futures = [
+                executor.submit(self._run_session, audio_data, sample_rate)
+                for audio_data, sample_rate in audios
+            ]
+            return [future.result() for future in futures]
+
+    def get_stats(self, min_completeness: float = 0.95):
+        """
+        Report the session statistics of the server.
+        :param min_completeness: Min ratio of received/expected frames for a
+            session to be considered sustained.
+        :return: Dict with the capacity, the peak concurrency and the highest
+            concurrency at which every session received its frames.
+        """
+        with self._slots_available:
+            sustained = 0
+            for concurrency, values in sorted(
+                self._completeness_by_concurrency.items()
+            ):
+                if min(values) < min_completeness:
+                    break
+                sustained = concurrency
+            return {
+                "capacity": self.capacity,
+                "active_sessions": self.active_sessions,
+                "peak_concurrent_sessions": self.peak_concurrent_sessions,
+                "completed_sessions": self.completed_sessions,
+                "sustained_concurrent_sessions": sustained,
+            }
@@ -0,0 +1,305 @@
+"""
+Delivers frames to other processes of the same machine through a ring of
+slots in shared memory, without serialization.
+
+Layout of the shared memory block:
+    header    magic, slot count, values per frame, metadata size, frames written
+    metadata  JSON (e.g. the blendshape names), METADATA_SIZE bytes
+    sequences one uint64 per slot
+    data      float32 [slots, n_values]
+
+Each slot is guarded by its sequence number (a seqlock): the writer makes it
+odd while writing frame i, and sets it to 2 * i + 2 once done. A reader reads
+the sequence, then the values, then the sequence again, and retries if it
+changed or was odd. There is a single writer, and readers never block it.
+The scheme has no memory barrier and relies on the ordering of the stores of
+x86: publishers and readers refuse to run on other architectures.
+"""
+
+import json
+import logging
+import platform
+import struct
+import time
+import uuid
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+RING_MAGIC = 0xA2F0F00D
+_HEADER = struct.Struct("<IIIIQ")
+HEADER_SIZE = 64
+METADATA_SIZE = 4096
+
+# Rings created by this process, already tracked by its resource tracker
+_created_rings = set()
+
+# Architectures whose store ordering makes the seqlock correct without barriers
+SUPPORTED_MACHINES = ("x86_64", "amd64", "i386", "i686", "x86")
+# Max time a reader waits for a slot being written, a writer that died
+# mid-write leaves it so forever
+READ_SPIN_TIMEOUT = 0.1
+
+
+def _check_machine():
+    machine = platform.machine()
+    if machine.lower() not in SUPPORTED_MACHINES:
+        raise RuntimeError(
+            f"SharedRing: Shared-memory rings need x86 store ordering, "
+            f"{machine} is not supported."
+        )
+
+
+def _find_key(frame: dict, key: str):
+    stack = [frame]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            if key in node:
+                return node[key]
+            stack.extend(node.values())
+    return None
+
+
+def _attach(name: str):
+    """
+    Open an existing ring, without making this process remove it at exit.
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 always tracks the block, stop tracking it unless this
+        # process created it
+        shm = shared_memory.SharedMemory(name=name)
+        if shm._name not in _created_rings:
+            resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+def _layout(buf, slots: int, n_values: int):
+    """
+    Numpy views of the header counter, sequences and data of a ring.
+    """
+    offset = HEADER_SIZE + METADATA_SIZE
+    write_count = np.ndarray((1,), dtype=np.uint64, buffer=buf, offset=16)
+    sequences = np.ndarray((slots,), dtype=np.uint64, buffer=buf, offset=offset)
+    offset += 8 * slots
+    data = np.ndarray((slots, n_values), dtype=np.float32, buffer=buf, offset=offset)
+    return write_count, sequences, data
+
+
+class SharedFramePublisher:
+    """
+    Writes frames into a shared memory ring. Attach it to a listener with
+    a2f.livelink_listener.add_consumer(publisher.publish).
+
+    Dict frames are reduced to their "Weights" list (and the "Names" list is
+    published in the metadata), decoded rows are written as they are.
+    """
+
+    def __init__(
+        self,
+        name: str = None,
+        slots: int = 256,
+        n_values: int = None,
+        names: list = None,
+    ):
+        """
+        :param name: Name of the shared memory block, generated if None.
+        :param slots: Number of frames kept in the ring.
+        :param n_values: Number of values per frame. If None, the ring is created
+            when the first frame is published.
+        :param names: Names of the values (blendshapes), published in the
+            metadata. Taken from the first frame dict if None.
+        """
+        _check_machine()
+        self.name = name or f"a2f_ring_{uuid.uuid4().hex[:12]}"
+        self.slots = slots
+        self.n_values = None
+        self.names = names
+        self.shm = None
+        self.frames_written = 0
+        if n_values is not None:
+            self._create(n_values, {"names": names})
+
+    def _create(self, n_values: int, metadata: dict):
+        meta = json.dumps(metadata).encode("utf-8")
+        if len(meta) > METADATA_SIZE:
+            logging.warning("SharedFramePublisher: Metadata too large, not published.")
+            meta = b"{}"
+        size = HEADER_SIZE + METADATA_SIZE + self.slots * (8 + 4 * n_values)
+        self.shm = shared_memory.SharedMemory(name=self.name, create=True, size=size)
+        _created_rings.add(self.shm._name)
+        self.n_values = n_values
+        buf = self.shm.buf
+        buf[HEADER_SIZE : HEADER_SIZE + len(meta)] = meta
+        self._write_count, self._sequences, self._data = _layout(
+            buf, self.slots, n_values
+        )
+        self._sequences[:] = 0
+        self._write_count[0] = 0
+        # The magic is written last, readers wait for it
+        _HEADER.pack_into(buf, 0, RING_MAGIC, self.slots, n_values, len(meta), 0)
+        logging.info(
+            f"SharedFramePublisher: Ring {self.name} created "
+            f"({self.slots} slots of {n_values} values)"
+        )
+
+    def publish(self, frame):
+        """
+        Write a frame into the next slot.
+        """
+        if isinstance(frame, np.ndarray):
+            values = frame
+        else:
+            values = _find_key(frame, "Weights")
+            if values is None:
+                raise ValueError("SharedFramePublisher: No Weights in the frame.")
+        if self.shm is None:
+            if self.names is None and not isinstance(frame, np.ndarray):
+                self.names = _find_key(frame, "Names")
+            self._create(len(values), {"names": self.names})
+        index = self.frames_written
+        slot = index % self.slots
+        self._sequences[slot] = 2 * index + 1
+        self._data[slot] = values
+        self._sequences[slot] = 2 * index + 2
+        self.frames_written = index + 1
+        self._write_count[0] = self.frames_written
+
+    def close(self):
+        """
+        Release and remove the ring.
+        """
+        if self.shm is None:
+            return
+        self._write_count = self._sequences = self._data = None
+        self.shm.close()
+        self.shm.unlink()
+        _created_rings.discard(self.shm._name)
+        self.shm = None
+
+
+class SharedFrameReader:
+    """Reads the frames of a SharedFramePublisher, from any local process."""
+
+    def __init__(self, name: str, timeout: float = 5.0):
+        """
+        :param name: Name of the ring (SharedFramePublisher.name).
+        :param timeout: Max time to wait for the ring to be created, in seconds.
+        """
+        _check_machine()
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                self.shm = _attach(name)
+                magic, slots, n_values, meta_len, _ = _HEADER.unpack_from(
+                    self.shm.buf, 0
+                )
+                if magic == RING_MAGIC:
+                    break
+                self.shm.close()
+            except FileNotFoundError:
+                pass
+            if time.monotonic() > deadline:
+                raise TimeoutError(f"SharedFrameReader: Ring {name} not found.")
+            time.sleep(0.01)
+        self.name = name
+        self.slots = slots
+        self.n_values = n_values
+        self.metadata = json.loads(
+            bytes(self.shm.buf[HEADER_SIZE : HEADER_SIZE + meta_len]) or b"{}"
+        )
+        self._write_count, self._sequences, self._data = _layout(
+            self.shm.buf, slots, n_values
+        )
+        self.last_index = -1  # Index of the last frame returned by read_new()
+        self.frames_missed = 0
+
+    @property
+    def frames_written(self) -> int:
+        return int(self._write_count[0])
+
+    def latest_view(self):
+        """
+        The latest frame, without any copy. The view is overwritten once the
+        writer wraps around the ring, check it with is_valid() after use.
+        :return: Tuple (frame index, float32 view), (-1, None) if empty.
+        """
+        index = self.frames_written - 1
+        if index < 0:
+            return -1, None
+        return index, self._data[index % self.slots]
+
+    def is_valid(self, index: int) -> bool:
+        """
+        True if the slot of a frame still holds it, entirely written.
+        """
+        return int(self._sequences[index % self.slots]) == 2 * index + 2
+
+    def read(self, index: int, out: np.ndarray = None):
+        """
+        Consistent copy of a frame into out (allocated if None).
+        Raise TimeoutError if the frame stays half-written for READ_SPIN_TIMEOUT,
+        i.e. the writer died while writing it.
+        :return: The frame values, None if it was overwritten or not written yet.
+        """
+        slot = index % self.slots
+        if out is None:
+            out = np.empty(self.n_values, dtype=np.float32)
+        spin_deadline = None
+        while True:
+            sequence = int(self._sequences[slot])
+            if sequence != 2 * index + 2:
+                if sequence != 2 * index + 1:
+                    return None
+                # Being written
+                if spin_deadline is None:
+                    spin_deadline = time.monotonic() + READ_SPIN_TIMEOUT
+                elif time.monotonic() > spin_deadline:
+                    raise TimeoutError(
+                        f"SharedFrameReader: Frame {index} of {self.name} is still "
+                        "being written, the writer may have died."
+                    )
+                continue
+            out[:] = self._data[slot]
+            if int(self._sequences[slot]) == sequence:
+                return out
+
+    def read_latest(self, out: np.ndarray = None):
+        """
+        Consistent copy of the latest frame.
+        :return: Tuple (frame index, values), (-1, None) if empty.
+        """
+        while True:
+            index = self.frames_written - 1
+            if index < 0:
+                return -1, None
+            values = self.read(index, out)
+            if values is not None:
+                return index, values
+
+    def read_new(self, max_frames: int = None) -> np.ndarray:
+        """
+        Frames written since the previous call, oldest first. Frames overwritten
+        before being read are skipped and counted in frames_missed.
+        :return: (n, n_values) float32 array.
+        """
+        end = self.frames_written
+        start = max(self.last_index + 1, end - self.slots + 1)
+        if max_frames is not None:
+            start = max(start, end - max_frames)
+        self.frames_missed += start - (self.last_index + 1)
+        rows = np.empty((max(0, end - start), self.n_values), dtype=np.float32)
+        n = 0
+        for index in range(start, end):
+            if self.read(index, rows[n]) is not None:
+                n += 1
+            else:
+                self.frames_missed += 1
+        self.last_index = max(self.last_index, end - 1)
+        return rows[:n]
+
+    def close(self):
+        self._write_count = self._sequences = self._data = None
+        self.shm.close()
@@ -0,0 +1,207 @@
+import json
+import logging
+import os
+import threading
+import time
+from abc import ABC, abstractmethod
+from queue import Empty, Full, Queue
+
+import numpy as np
+
+from audio2face_api.Decoder import flatten_frame
+
+
+class FrameSink(ABC):
+    """A destination of the received frames, written by a BackgroundSinkWriter."""
+
+    @abstractmethod
+    def write_batch(self, frames: list):
+        """
+        Write a batch of frames (dicts or decoded float32 rows).
+        """
+        pass
+
+    def flush(self):
+        """
+        Flush the written frames to disk.
+        """
+        pass
+
+    def close(self):
+        """
+        Flush and close the sink.
+        """
+        self.flush()
+
+
+def _make_parent_dir(path: str):
+    parent = os.path.dirname(os.path.abspath(path))
+    if not os.path.exists(parent):
+        os.makedirs(parent)
+
+
+class JsonlSink(FrameSink):
+    """Appends one JSON line per frame."""
+
+    def __init__(self, path: str):
+        _make_parent_dir(path)
+        self.path = path
+        self.file = open(path, "a", encoding="utf-8")
+
+    def write_batch(self, frames: list):
+        lines = [
+            json.dumps(frame.tolist() if isinstance(frame, np.ndarray) else frame)
+            for frame in frames
+        ]
+        self.file.write("\n".join(lines) + "\n")
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class NpzSink(FrameSink):
+    """
+    Writes the numeric values of the frames as a (n_frames, n_values) float32
+    matrix, in chunk files named <path_prefix>_<index>.npz.
+    """
+
+    def __init__(self, path_prefix: str, chunk_frames: int = 1000):
+        _make_parent_dir(path_prefix)
+        self.path_prefix = path_prefix
+        self.chunk_frames = chunk_frames
+        self.chunk_index = 0
+        # Append to the chunks of a previous session
+        while os.path.exists(self._chunk_path(self.chunk_index)):
+            self.chunk_index += 1
+        self._rows = []
+
+    def _chunk_path(self, index: int) -> str:
+        return f"{self.path_prefix}_{index:05d}.npz"
+
+    def write_batch(self, frames: list):
+        self._rows.extend(flatten_frame(frame) for frame in frames)
+        while len(self._rows) >= self.chunk_frames:
+            self._write_chunk(self._rows[: self.chunk_frames])
+            self._rows = self._rows[self.chunk_frames :]
+
+    def _write_chunk(self, rows: list):
+        path = self._chunk_path(self.chunk_index)
+        np.savez(path, frames=np.stack(rows))
+        self.chunk_index += 1
+        logging.debug(f"NpzSink: Wrote {len(rows)} frames to {path}")
+
+    def close(self):
+        if self._rows:
+            self._write_chunk(self._rows)
+            self._rows = []
+
+
+class RawFloat32Sink(FrameSink):
+    """
+    Appends the numeric values of the frames as raw float32 data. The number of
+    values per frame is written to <path>.json, the data can be read back with
+    np.fromfile(path, dtype=np.float32).reshape(-1, n_values).
+    """
+
+    def __init__(self, path: str):
+        _make_parent_dir(path)
+        self.path = path
+        self.n_values = None
+        self.file = open(path, "ab")
+
+    def write_batch(self, frames: list):
+        rows = np.stack([flatten_frame(frame) for frame in frames])
+        if self.n_values is None:
+            self.n_values = rows.shape[1]
+            with open(f"{self.path}.json", "w") as header:
+                json.dump({"dtype": "float32", "n_values": self.n_values}, header)
+        elif rows.shape[1] != self.n_values:
+            raise ValueError(
+                f"RawFloat32Sink: Expected {self.n_values} values per frame, got {rows.shape[1]}."
+            )
+        rows.tofile(self.file)
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+class BackgroundSinkWriter(threading.Thread):
+    """
+    Writes frames to sinks from a background thread.
+
+    put() never blocks: frames go to a bounded queue, and are dropped (and
+    counted) if the queue is full, so disk I/O never stalls the receive loop.
+    Frames are written in batches, and the sinks flushed every flush_interval.
+    The sinks belong to the caller, who closes them once the writer is stopped.
+    """
+
+    def __init__(
+        self,
+        sinks: list = None,
+        queue_size: int = 10000,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+    ):
+        super().__init__(daemon=True)
+        self.sinks = list(sinks) if sinks else []
+        self.queue = Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._stop_event = threading.Event()
+        self.frames_written = 0
+        self.frames_dropped = 0
+
+    def put(self, frame):
+        try:
+            self.queue.put_nowait(frame)
+        except Full:
+            self.frames_dropped += 1
+
+    def run(self):
+        last_flush = time.monotonic()
+        while not (self._stop_event.is_set() and self.queue.empty()):
+            batch = []
+            try:
+                batch.append(self.queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    batch.append(self.queue.get_nowait())
+            except Empty:
+                pass
+            if batch:
+                self._write(batch)
+            if time.monotonic() - last_flush >= self.flush_interval:
+                self._flush()
+                last_flush = time.monotonic()
+        self._flush()
+        logging.info(
+            f"BackgroundSinkWriter: {self.frames_written} frames written, "
+            f"{self.frames_dropped} dropped"
+        )
+
+    def _write(self, batch: list):
+        for sink in self.sinks:
+            try:
+                sink.write_batch(batch)
+            except Exception as e:
+                logging.error(f"BackgroundSinkWriter: Failed to write to {sink}: {e}")
+        self.frames_written += len(batch)
+
+    def _flush(self):
+        for sink in self.sinks:
+            try:
+                sink.flush()
+            except Exception as e:
+                logging.error(f"BackgroundSinkWriter: Failed to flush {sink}: {e}")
+
+    def stop(self):
+        """
+        Write and flush the queued frames, and stop the thread.
+        """
+        self._stop_event.set()
+        logging.info("BackgroundSinkWriter: Stopping writer")
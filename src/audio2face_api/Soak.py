@@ -0,0 +1,393 @@
+"""
+Soak test of the client: ramps up concurrent streaming sessions (and optional
+direct exports) against an A2F server, typically a StandInA2F, runs them for a
+while and tracks the throughput, the latencies and the resources of this
+process, to find where the client breaks down.
+
+The test fails on thread or socket leaks (counts above the baseline once every
+session is closed), on memory growth during the hold phase, on failed or
+incomplete sessions and on a collapse of the per-session throughput.
+"""
+
+import gc
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+
+import numpy as np
+import psutil
+import soundfile
+
+from audio2face_api.A2F import Audio2FaceDirect
+from audio2face_api.Sessions import StreamSessionManager
+
+
+def _percentiles(values: list) -> dict:
+    if not values:
+        return {"count": 0}
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        "count": len(values),
+        "p50": float(p50),
+        "p95": float(p95),
+        "p99": float(p99),
+        "max": float(max(values)),
+    }
+
+
+def _open_sockets(process: psutil.Process) -> int:
+    if hasattr(process, "net_connections"):
+        return len(process.net_connections(kind="inet"))
+    return len(process.connections(kind="inet"))
+
+
+def _open_files(process: psutil.Process) -> int:
+    if hasattr(process, "num_fds"):
+        return process.num_fds()
+    return process.num_handles()
+
+
+class ResourceSampler(threading.Thread):
+    """Samples the resources of this process and the session counters."""
+
+    def __init__(self, soak, interval: float = 1.0):
+        super().__init__(daemon=True, name="ResourceSampler")
+        self.soak = soak
+        self.interval = interval
+        self.process = psutil.Process()
+        self.samples = []
+        self._stop_event = threading.Event()
+
+    def sample(self) -> dict:
+        return {
+            "time": time.monotonic() - self.soak.start_time,
+            "threads": threading.active_count(),
+            "os_threads": self.process.num_threads(),
+            "rss_mb": self.process.memory_info().rss / 2**20,
+            "sockets": _open_sockets(self.process),
+            "files": _open_files(self.process),
+            "active_sessions": self.soak.manager.active_sessions,
+            "target_sessions": self.soak.target_sessions,
+            "frames": self.soak.frames_received,
+        }
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            self.samples.append(self.sample())
+
+    def stop(self):
+        self._stop_event.set()
+
+
+class SoakTest:
+    """
+    Ramps streaming sessions up to max_sessions (ramp_step more every
+    ramp_interval seconds), holds them until duration, then checks the
+    resources once every session is closed.
+
+    Each streaming worker runs sessions back to back, one utterance per
+    session, so listeners and sockets are created and released all along.
+    """
+
+    def __init__(
+        self,
+        api_url: str,
+        grpc_url: str,
+        players: list,
+        livelink_nodes: list,
+        livelink_ports: list,
+        max_sessions: int = None,
+        ramp_step: int = 1,
+        ramp_interval: float = 30.0,
+        duration: float = 300.0,
+        clip_seconds: float = 2.0,
+        direct_workers: int = 0,
+        fps: int = 30,
+        sample_interval: float = 1.0,
+        scene_path: str = "./assets/mark_solved_streaming.usd",
+        thread_leak_tolerance: int = 2,
+        socket_leak_tolerance: int = 2,
+        max_rss_growth_mb: float = 50.0,
+        collapse_ratio: float = 0.5,
+        min_completeness: float = 0.9,
+        max_incomplete_ratio: float = 0.05,
+        settle_time: float = 10.0,
+    ):
+        """
+        :param players, livelink_nodes, livelink_ports: Stream slots of the
+            scene (see StreamSessionManager).
+        :param max_sessions: Max concurrent streaming sessions, one per slot
+            if None.
+        :param direct_workers: Number of threads running direct exports.
+        :param max_rss_growth_mb: Max RSS growth during the hold phase.
+        :param collapse_ratio: Fail if the frames/sec of the sessions of the
+            last quarter of the run falls below this ratio of the sessions of
+            the first ramp step (median, setup and teardown included).
+        :param min_completeness: Min ratio of received/expected frames of a
+            session, at most max_incomplete_ratio of the sessions may be below.
+        :param settle_time: Max wait for the threads and sockets to be
+            released at the end.
+        """
+        self.manager = StreamSessionManager(
+            grpc_url,
+            api_url,
+            scene_path,
+            players,
+            livelink_nodes,
+            livelink_ports,
+            fps=fps,
+        )
+        self.api_url = api_url
+        self.max_sessions = min(max_sessions or len(players), len(players))
+        self.ramp_step = ramp_step
+        self.ramp_interval = ramp_interval
+        self.duration = duration
+        self.clip_seconds = clip_seconds
+        self.direct_workers = direct_workers
+        self.fps = fps
+        self.scene_path = scene_path
+        self.sample_interval = sample_interval
+        self.thread_leak_tolerance = thread_leak_tolerance
+        self.socket_leak_tolerance = socket_leak_tolerance
+        self.max_rss_growth_mb = max_rss_growth_mb
+        self.collapse_ratio = collapse_ratio
+        self.min_completeness = min_completeness
+        self.max_incomplete_ratio = max_incomplete_ratio
+        self.settle_time = settle_time
+
+        self.start_time = time.monotonic()
+        self.target_sessions = 0
+        self.frames_received = 0
+        self.first_frame_ms = []
+        self.session_s = []
+        self.session_rates = []  # (end time, frames/sec) of each session
+        self.export_s = []
+        self.completeness = []
+        self.errors = []
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+
+    def _count_frame(self, frame):
+        with self._lock:
+            self.frames_received += 1
+
+    def _record_error(self, worker: str, error: Exception):
+        logging.error(f"SoakTest: {worker} failed: {error}")
+        with self._lock:
+            self.errors.append(f"{worker}: {type(error).__name__}: {error}")
+
+    def _stream_worker(self, index: int, audio_data, sample_rate: int):
+        expected = len(audio_data) / sample_rate * self.fps
+        while not self._stop_event.is_set():
+            if index >= self.target_sessions:
+                self._stop_event.wait(0.1)
+                continue
+            try:
+                start_time = time.perf_counter()
+                with self.manager.session(timeout=30.0) as a2f:
+                    first_frame = []
+
+                    def on_frame(frame):
+                        if not first_frame:
+                            first_frame.append(time.perf_counter())
+
+                    a2f.livelink_listener.add_consumer(self._count_frame)
+                    a2f.livelink_listener.add_consumer(on_frame)
+                    push_time = time.perf_counter()
+                    frames = a2f.stream_audio(audio_data, sample_rate)
+                session_s = time.perf_counter() - start_time
+                with self._lock:
+                    self.session_s.append(session_s)
+                    self.session_rates.append(
+                        (time.monotonic() - self.start_time, len(frames) / session_s)
+                    )
+                    self.completeness.append(min(len(frames) / expected, 1.0))
+                    if first_frame:
+                        self.first_frame_ms.append((first_frame[0] - push_time) * 1000)
+            except Exception as e:
+                self._record_error(f"stream worker {index}", e)
+                self._stop_event.wait(1.0)
+
+    def _direct_worker(self, index: int, work_dir: str, audio_name: str):
+        a2f = Audio2FaceDirect(api_url=self.api_url, scene_path=self.scene_path)
+        a2f.set_audio_root_path(work_dir)
+        while not self._stop_event.is_set():
+            try:
+                start_time = time.perf_counter()
+                res = a2f.export_blendshapes(
+                    audio_name=audio_name,
+                    output_dir=os.path.join(work_dir, "exports"),
+                    output_name=f"direct_{index}",
+                )
+                if res.get("status") != "OK":
+                    raise ValueError(f"Export failed: {res.get('message')}")
+                with self._lock:
+                    self.export_s.append(time.perf_counter() - start_time)
+            except Exception as e:
+                self._record_error(f"direct worker {index}", e)
+                self._stop_event.wait(1.0)
+        a2f.http_client.close()
+
+    def _settle(self, sampler: ResourceSampler, baseline: dict) -> dict:
+        """
+        Wait for the threads and sockets to go back to the baseline.
+        """
+        deadline = time.monotonic() + self.settle_time
+        while True:
+            gc.collect()
+            sample = sampler.sample()
+            if (
+                sample["threads"] <= baseline["threads"]
+                and sample["sockets"] <= baseline["sockets"]
+            ) or time.monotonic() > deadline:
+                return sample
+            time.sleep(0.5)
+
+    def run(self) -> dict:
+        """
+        Run the soak test.
+        :return: The report, see check().
+        """
+        self.manager.init_A2F()
+        sample_rate = 16000
+        t = np.arange(int(self.clip_seconds * sample_rate)) / sample_rate
+        audio_data = (0.1 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+
+        work_dir = tempfile.mkdtemp(prefix="a2f_soak_")
+        soundfile.write(os.path.join(work_dir, "soak.wav"), audio_data, sample_rate)
+
+        sampler = ResourceSampler(self, self.sample_interval)
+        gc.collect()
+        self.start_time = time.monotonic()
+        baseline = sampler.sample()
+        sampler.start()
+
+        workers = [
+            threading.Thread(
+                target=self._stream_worker,
+                args=(i, audio_data, sample_rate),
+                name=f"SoakStream-{i}",
+            )
+            for i in range(self.max_sessions)
+        ] + [
+            threading.Thread(
+                target=self._direct_worker,
+                args=(i, work_dir, "soak.wav"),
+                name=f"SoakDirect-{i}",
+            )
+            for i in range(self.direct_workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        ramp_end = None
+        while True:
+            elapsed = time.monotonic() - self.start_time
+            if elapsed >= self.duration:
+                break
+            step = 1 + int(elapsed // self.ramp_interval)
+            target = min(self.max_sessions, step * self.ramp_step)
+            if target != self.target_sessions:
+                logging.info(f"SoakTest: {target} concurrent sessions")
+                self.target_sessions = target
+            if ramp_end is None and target == self.max_sessions:
+                ramp_end = elapsed
+            time.sleep(min(0.5, self.duration - elapsed))
+
+        self._stop_event.set()
+        for worker in workers:
+            worker.join()
+        sampler.stop()
+        sampler.join()
+        end = self._settle(sampler, baseline)
+        report = self.check(baseline, end, sampler.samples, ramp_end)
+        report["work_dir"] = work_dir
+        return report
+
+    def check(self, baseline: dict, end: dict, samples: list, ramp_end) -> dict:
+        """
+        Build the report and check the failure criteria.
+        :return: Dict with "passed", the "failures" and the metrics.
+        """
+        failures = []
+        thread_leak = end["threads"] - baseline["threads"]
+        if thread_leak > self.thread_leak_tolerance:
+            failures.append(f"{thread_leak} threads leaked")
+        socket_leak = end["sockets"] - baseline["sockets"]
+        if socket_leak > self.socket_leak_tolerance:
+            failures.append(f"{socket_leak} sockets leaked")
+
+        # Memory of the hold phase, once every session ran at least once
+        rss_growth = None
+        hold = [s for s in samples if ramp_end is not None and s["time"] >= ramp_end]
+        if len(hold) >= 2:
+            warm = hold[: max(1, len(hold) // 4)]
+            rss_growth = hold[-1]["rss_mb"] - min(s["rss_mb"] for s in warm)
+            if rss_growth > self.max_rss_growth_mb:
+                failures.append(f"RSS grew by {rss_growth:.1f} MB while holding")
+
+        # Frames/sec of the sessions, setup and teardown included
+        first_step = [r for t, r in self.session_rates if t < self.ramp_interval]
+        last_quarter = [r for t, r in self.session_rates if t >= 0.75 * self.duration]
+        baseline_rate = float(np.median(first_step)) if first_step else None
+        final_rate = float(np.median(last_quarter)) if last_quarter else None
+        if baseline_rate and final_rate is not None:
+            if final_rate < self.collapse_ratio * baseline_rate:
+                failures.append(
+                    f"Throughput collapsed: {final_rate:.1f} frames/s per session, "
+                    f"{baseline_rate:.1f} at the start"
+                )
+
+        incomplete = sum(c < self.min_completeness for c in self.completeness)
+        if self.completeness and (
+            incomplete / len(self.completeness) > self.max_incomplete_ratio
+        ):
+            failures.append(
+                f"{incomplete}/{len(self.completeness)} sessions missed frames"
+            )
+        if self.errors:
+            failures.append(f"{len(self.errors)} sessions or exports failed")
+        if not self.completeness and self.max_sessions:
+            failures.append("No streaming session completed")
+
+        elapsed = samples[-1]["time"] if samples else self.duration
+        return {
+            "passed": not failures,
+            "failures": failures,
+            "duration_s": elapsed,
+            "max_sessions": self.max_sessions,
+            "direct_workers": self.direct_workers,
+            "sessions_completed": len(self.completeness),
+            "exports_completed": len(self.export_s),
+            "errors": len(self.errors),
+            "first_errors": self.errors[:10],
+            "frames_received": self.frames_received,
+            "frames_per_sec": self.frames_received / elapsed if elapsed else None,
+            "session_frames_per_sec_start": baseline_rate,
+            "session_frames_per_sec_end": final_rate,
+            "first_frame_ms": _percentiles(self.first_frame_ms),
+            "session_s": _percentiles(self.session_s),
+            "export_s": _percentiles(self.export_s),
+            "min_completeness": min(self.completeness, default=None),
+            "incomplete_sessions": incomplete,
+            "threads": {"baseline": baseline["threads"], "end": end["threads"]},
+            "sockets": {"baseline": baseline["sockets"], "end": end["sockets"]},
+            "files": {"baseline": baseline["files"], "end": end["files"]},
+            "rss_mb": {
+                "baseline": baseline["rss_mb"],
+                "peak": max((s["rss_mb"] for s in samples), default=None),
+                "end": end["rss_mb"],
+                "hold_growth": rss_growth,
+            },
+            "peak_threads": max((s["threads"] for s in samples), default=None),
+            "peak_sockets": max((s["sockets"] for s in samples), default=None),
+            "samples": samples,
+        }
+
+
+def save_report(report: dict, path: str):
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
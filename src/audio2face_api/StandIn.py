@@ -0,0 +1,396 @@
+"""
+A stand-in for an Audio2Face headless server: the REST routes used by the
+client, the gRPC PushAudio(Stream) service of the streaming players, and the
+LiveLink output of the StreamLivelink nodes.
+
+It runs no inference: exports hold synthetic weights, and each pushed audio is
+answered with one synthetic LiveLink frame per 1 / fps of audio, paced like a
+playing player. It is meant for client-side tests (see Soak.py), best run in
+its own process (start_stand_in_process) so that it does not share the
+threads, sockets and memory of the client under test.
+"""
+
+import json
+import logging
+import math
+import multiprocessing
+import os
+import socket
+import threading
+import time
+from concurrent import futures
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import grpc
+import soundfile
+
+import audio2face_api.grpc.audio2face_pb2 as audio2face_pb2
+import audio2face_api.grpc.audio2face_pb2_grpc as audio2face_pb2_grpc
+from audio2face_api.A2E_CONFIG import DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE
+from audio2face_api.A2F_CONFIG import (
+    DEFAULT_PLAYER_INSTANCE,
+    DEFAULT_STREAM_LIVELINK,
+    LIVELINK_LISTENING_PORT,
+)
+from audio2face_api.LiveLinkSender import (
+    get_blendshape_names,
+    make_livelink_payload,
+    pack_block,
+)
+
+
+def _synthetic_weights(frame_index: int, n_blendshapes: int) -> list:
+    return [
+        round(0.5 + 0.5 * math.sin(0.1 * frame_index + 0.3 * j), 6)
+        for j in range(n_blendshapes)
+    ]
+
+
+class _LiveLinkOutput:
+    """The LiveLink connection of a StreamLivelink node."""
+
+    def __init__(self, port: int):
+        self.port = port
+        self.sock = None
+        self.closed = False  # A closed output does not reconnect
+        self.lock = threading.Lock()
+
+    def send(self, block: bytes) -> bool:
+        with self.lock:
+            if self.closed:
+                return False
+            try:
+                if self.sock is None:
+                    self.sock = socket.create_connection(("localhost", self.port), 1.0)
+                    self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                    threading.Thread(
+                        target=self._drain_acks, args=(self.sock,), daemon=True
+                    ).start()
+                self.sock.sendall(block)
+                return True
+            except OSError:
+                self._close()
+                return False
+
+    @staticmethod
+    def _drain_acks(sock):
+        try:
+            while sock.recv(65536):
+                pass
+        except OSError:
+            pass
+
+    def _close(self):
+        if self.sock is not None:
+            try:
+                # Unblocks the ack drain thread, so the FIN goes out right away
+                self.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+    def close(self):
+        with self.lock:
+            self.closed = True
+            self._close()
+
+
+class StandInA2F:
+    """REST, gRPC and LiveLink sides of a stand-in A2F server."""
+
+    def __init__(
+        self,
+        http_port: int = 0,
+        grpc_port: int = 0,
+        players: dict = None,
+        fps: int = 30,
+        speed: float = 1.0,
+        n_blendshapes: int = 52,
+        http_latency: float = 0.0,
+        link_mbps: float = None,
+    ):
+        """
+        :param players: {player instance: StreamLivelink node} of the scene, the
+            default player and node if None.
+        :param speed: Pace of the LiveLink frames relative to real time.
+        :param http_latency: Delay added to each REST request, in seconds.
+        :param link_mbps: Bandwidth of a modeled network link to the client, in
+            Mbit/s: the pushed audio is available to the player only after its
+            transfer time. Loopback speed if None.
+        """
+        self.players = players or {
+            DEFAULT_AUDIO_STREAM_PLAYER_INSTANCE: DEFAULT_STREAM_LIVELINK
+        }
+        self.fps = fps
+        self.speed = speed
+        self.names = get_blendshape_names(n_blendshapes)
+        self.http_latency = http_latency
+        self.link_mbps = link_mbps
+        self.node_ports = {
+            node: LIVELINK_LISTENING_PORT for node in self.players.values()
+        }
+        self.outputs = {}  # node -> _LiveLinkOutput
+        self.audio_root_path = None
+        self.track = None
+        self.scene = None
+        self.lock = threading.Lock()
+        self.requests_served = 0
+        self.frames_sent = 0
+
+        self.http_server = ThreadingHTTPServer(
+            ("localhost", http_port), self._make_handler()
+        )
+        self.http_server.daemon_threads = True
+        self.grpc_server = grpc.server(futures.ThreadPoolExecutor(max_workers=32))
+        audio2face_pb2_grpc.add_Audio2FaceServicer_to_server(
+            _StandInServicer(self), self.grpc_server
+        )
+        self.grpc_port = self.grpc_server.add_insecure_port(f"localhost:{grpc_port}")
+
+    @property
+    def api_url(self) -> str:
+        return f"http://localhost:{self.http_server.server_address[1]}"
+
+    @property
+    def grpc_url(self) -> str:
+        return f"localhost:{self.grpc_port}"
+
+    def start(self):
+        threading.Thread(target=self.http_server.serve_forever, daemon=True).start()
+        self.grpc_server.start()
+        logging.info(f"StandInA2F: Serving {self.api_url} and {self.grpc_url}")
+
+    def stop(self):
+        self.http_server.shutdown()
+        self.grpc_server.stop(None)
+        with self.lock:
+            for output in self.outputs.values():
+                output.close()
+
+    # REST
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _answer(self, body):
+                data = json.dumps(body).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                server._delay()
+                self._answer("OK" if self.path.strip("/") == "status" else {})
+
+            def do_POST(self):
+                server._delay()
+                size = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(size) or b"{}")
+                self._answer(server.handle_post(self.path.strip("/"), payload))
+
+        return Handler
+
+    def _delay(self):
+        with self.lock:
+            self.requests_served += 1
+        if self.http_latency:
+            time.sleep(self.http_latency)
+
+    def handle_post(self, route: str, payload: dict) -> dict:
+        if route == "A2F/Exporter/SetStreamLivelinkSettings":
+            port = payload["values"].get("livelink_port", LIVELINK_LISTENING_PORT)
+            with self.lock:
+                self.node_ports[payload["node_path"]] = port
+                self._close_output(payload["node_path"])
+        elif route == "A2F/Exporter/ActivateStreamLivelink":
+            if not payload["value"]:
+                # Disabling the node closes its socket
+                with self.lock:
+                    self._close_output(payload["node_path"])
+        elif route == "A2F/Exporter/IsStreamLivelinkConnected":
+            return {"status": "OK", "result": True}
+        elif route == "A2F/Exporter/GetStreamLivelinkSettings":
+            with self.lock:
+                port = self.node_ports.get(payload["node_path"])
+            return {"status": "OK", "result": {"livelink_port": port}}
+        elif route == "A2F/USD/Load":
+            self.scene = payload["file_name"]
+        elif route == "A2F/Player/GetInstances":
+            # The players exist once a scene is loaded
+            if self.scene is None:
+                return {"status": "OK", "result": {"regular": [], "streaming": []}}
+            return {
+                "status": "OK",
+                "result": {
+                    "regular": [DEFAULT_PLAYER_INSTANCE],
+                    "streaming": list(self.players),
+                },
+            }
+        elif route == "A2F/Player/SetRootPath":
+            self.audio_root_path = payload["dir_path"]
+        elif route == "A2F/Player/SetTrack":
+            self.track = payload["file_name"]
+        elif route == "A2F/Exporter/ExportBlendshapes":
+            return self._export(payload)
+        return {"status": "OK", "result": None}
+
+    def _export(self, payload: dict) -> dict:
+        audio_path = os.path.join(self.audio_root_path or "", self.track or "")
+        if not os.path.exists(audio_path):
+            return {"status": "Error", "message": f"No track {audio_path}"}
+        fps = payload.get("fps", self.fps)
+        info = soundfile.info(audio_path)
+        n_frames = int(round(info.frames / info.samplerate * fps))
+        export = {
+            "exportFps": fps,
+            "numFrames": n_frames,
+            "numPoses": len(self.names),
+            "facsNames": self.names,
+            "weightMat": [
+                _synthetic_weights(i, len(self.names)) for i in range(n_frames)
+            ],
+        }
+        path = os.path.join(
+            payload["export_directory"], f"{payload['file_name']}_bsweight.json"
+        )
+        with open(path, "w") as f:
+            json.dump(export, f)
+        return {"status": "OK", "result": [path]}
+
+    def transfer(self, n_bytes: int):
+        """
+        Wait for the transfer time of n_bytes over the modeled link.
+        """
+        if self.link_mbps:
+            time.sleep(n_bytes * 8 / (self.link_mbps * 1e6))
+
+    # LiveLink
+
+    def _close_output(self, node: str):
+        output = self.outputs.pop(node, None)
+        if output is not None:
+            output.close()
+
+    def _output(self, player: str) -> _LiveLinkOutput:
+        node = self.players.get(player)
+        with self.lock:
+            if node not in self.node_ports:
+                return None
+            if node not in self.outputs:
+                self.outputs[node] = _LiveLinkOutput(self.node_ports[node])
+            return self.outputs[node]
+
+    def play(self, player: str, samples_received):
+        """
+        Send the frames of a pushed audio, paced like a playing player.
+        :param samples_received: Callable returning (samples received so far,
+            sample rate, True once the whole audio is received).
+        """
+        output = self._output(player)
+        if output is None:
+            return
+        start_time = None
+        frame = 0
+        while True:
+            n_samples, sample_rate, complete = samples_received()
+            if n_samples and start_time is None:
+                start_time = time.perf_counter()
+            available = int(n_samples * self.fps / sample_rate) if sample_rate else 0
+            if complete:
+                available = int(round(n_samples * self.fps / sample_rate))
+            if frame >= available:
+                if complete:
+                    return
+                time.sleep(0.002)
+                continue
+            delay = start_time + frame / (self.fps * self.speed) - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            payload = make_livelink_payload(
+                self.names,
+                _synthetic_weights(frame, len(self.names)),
+                frame,
+                self.fps,
+            )
+            if not output.send(pack_block(payload)):
+                return
+            with self.lock:
+                self.frames_sent += 1
+            frame += 1
+
+
+class _StandInServicer(audio2face_pb2_grpc.Audio2FaceServicer):
+    def __init__(self, server: StandInA2F):
+        self.server = server
+
+    def _play_async(self, player: str, samples_received):
+        threading.Thread(
+            target=self.server.play, args=(player, samples_received), daemon=True
+        ).start()
+
+    def PushAudio(self, request, context):
+        # The whole message is received before the player starts
+        self.server.transfer(len(request.audio_data))
+        n_samples = len(request.audio_data) // 4
+        state = (n_samples, request.samplerate, True)
+        self._play_async(request.instance_name, lambda: state)
+        if request.block_until_playback_is_finished:
+            time.sleep(n_samples / request.samplerate / self.server.speed)
+        return audio2face_pb2.PushAudioResponse(success=True, message="")
+
+    def PushAudioStream(self, request_iterator, context):
+        start = next(request_iterator).start_marker
+        state = {"samples": 0, "complete": False}
+        self._play_async(
+            start.instance_name,
+            lambda: (state["samples"], start.samplerate, state["complete"]),
+        )
+        for request in request_iterator:
+            self.server.transfer(len(request.audio_data))
+            state["samples"] += len(request.audio_data) // 4
+        state["complete"] = True
+        if start.block_until_playback_is_finished:
+            time.sleep(state["samples"] / start.samplerate / self.server.speed)
+        return audio2face_pb2.PushAudioStreamResponse(success=True, message="")
+
+
+def _serve(config: dict, urls, stop_event):
+    stand_in = StandInA2F(**config)
+    stand_in.start()
+    urls.put((stand_in.api_url, stand_in.grpc_url))
+    stop_event.wait()
+    stand_in.stop()
+
+
+def start_stand_in_process(**config):
+    """
+    Run a StandInA2F in a child process.
+    :param config: Arguments of StandInA2F.
+    :return: Tuple (api_url, grpc_url, stop callable).
+    """
+    context = multiprocessing.get_context("spawn")
+    urls = context.Queue()
+    stop_event = context.Event()
+    process = context.Process(
+        target=_serve, args=(config, urls, stop_event), daemon=True
+    )
+    process.start()
+    api_url, grpc_url = urls.get(timeout=30)
+
+    def stop():
+        stop_event.set()
+        process.join(timeout=10)
+        if process.is_alive():
+            process.kill()
+
+    return api_url, grpc_url, stop
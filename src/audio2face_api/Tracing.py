@@ -0,0 +1,180 @@
+"""
+Opt-in tracing of a session, exported in the Chrome trace-event format
+(open the file in chrome://tracing or https://ui.perfetto.dev).
+
+Tracing is disabled by default: span() then returns a shared no-op context
+manager and traced functions call straight through, so the instrumentation
+costs a flag check. Once enabled, the latest max_events events are kept, so
+tracing left on during long streams does not grow without bound.
+"""
+
+import functools
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+# Events kept by default, about 360 bytes each
+DEFAULT_MAX_EVENTS = 1_000_000
+
+_enabled = False
+_lock = threading.Lock()
+_events = deque(maxlen=DEFAULT_MAX_EVENTS)
+_dropped_events = 0
+_thread_names = {}
+_start_ns = time.perf_counter_ns()
+
+
+def enable_tracing(clear: bool = True, max_events: int = DEFAULT_MAX_EVENTS):
+    """
+    Start recording spans.
+    :param clear: Drop the events recorded before.
+    :param max_events: Number of events kept, the oldest ones are dropped.
+    """
+    global _enabled, _events
+    with _lock:
+        if max_events != _events.maxlen:
+            _events = deque(_events, maxlen=max_events)
+    if clear:
+        clear_trace()
+    _enabled = True
+
+
+def disable_tracing():
+    global _enabled
+    _enabled = False
+
+
+def is_tracing_enabled() -> bool:
+    return _enabled
+
+
+def clear_trace():
+    global _start_ns, _dropped_events
+    with _lock:
+        _events.clear()
+        _dropped_events = 0
+        _thread_names.clear()
+        _start_ns = time.perf_counter_ns()
+
+
+def get_dropped_events() -> int:
+    """
+    Number of events dropped since the trace was cleared, as max_events was reached.
+    """
+    return _dropped_events
+
+
+def _record(event: dict):
+    global _dropped_events
+    thread = threading.current_thread()
+    event["pid"] = os.getpid()
+    event["tid"] = thread.ident
+    with _lock:
+        _thread_names.setdefault(thread.ident, thread.name)
+        if len(_events) == _events.maxlen:
+            _dropped_events += 1
+        _events.append(event)
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    def __init__(self, name: str, category: str, args: dict):
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        end_ns = time.perf_counter_ns()
+        event = {
+            "name": self.name,
+            "cat": self.category,
+            "ph": "X",
+            "ts": (self.start_ns - _start_ns) / 1000,
+            "dur": (end_ns - self.start_ns) / 1000,
+        }
+        if exc_type is not None:
+            self.args["error"] = exc_type.__name__
+        if self.args:
+            event["args"] = self.args
+        _record(event)
+        return False
+
+
+def span(name: str, category: str = "a2f", **args):
+    """
+    Context manager recording a complete event around its block.
+    :param args: Extra values shown with the event.
+    """
+    if not _enabled:
+        return _NOOP_SPAN
+    return _Span(name, category, args)
+
+
+def traced(category: str = "a2f", name: str = None):
+    """
+    Decorator recording a span around each call of the function.
+    :param name: Span name, defaults to the qualified name of the function.
+    """
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            with _Span(span_name, category, {}):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def get_trace_events() -> list:
+    """
+    Get the recorded events, with the thread name metadata events.
+    """
+    with _lock:
+        pid = os.getpid()
+        metadata = [
+            {
+                "name": "thread_name",
+                "ph": "M",
+                "pid": pid,
+                "tid": tid,
+                "args": {"name": thread_name},
+            }
+            for tid, thread_name in _thread_names.items()
+        ]
+        return metadata + list(_events)
+
+
+def save_trace(path: str):
+    """
+    Save the recorded events as a Chrome trace-event JSON file.
+    """
+    if _dropped_events:
+        logging.warning(
+            f"Tracing: {_dropped_events} oldest events dropped, raise max_events "
+            "to keep them."
+        )
+    with open(path, "w") as f:
+        json.dump({"traceEvents": get_trace_events(), "displayTimeUnit": "ms"}, f)
@@ -0,0 +1,266 @@
+"""
+Gapless playback of back-to-back utterances in streaming mode.
+
+Audio2FaceStream.stream_audio() runs one utterance at a time: flush, push,
+wait for the frames, flush. UtteranceQueue instead keeps one PushAudioStream
+call open while utterances keep coming, and appends each new utterance to it,
+so the A2F player never runs dry between sentences.
+
+Frames are attributed by their position in the stream: with the audio of
+utterance i spanning samples [a, b) of the stream, it owns the frames
+[a * fps / sr, b * fps / sr).
+"""
+
+import logging
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+import audio2face_api.grpc.audio2face_pb2 as audio2face_pb2
+from audio2face_api.A2F import Audio2FaceStream
+
+
+class Utterance:
+    """An audio queued for playback, and the frames received for it."""
+
+    def __init__(self, utterance_id, audio_data: np.ndarray, sample_rate: int):
+        self.utterance_id = utterance_id
+        self.audio_data = audio_data
+        self.sample_rate = sample_rate
+        self.frames = []
+        # Frame range of the utterance in its stream, set once pushed
+        self.start_frame = None
+        self.end_frame = None
+        self.future = Future()
+        self.future.utterance_id = utterance_id
+
+    def _resolve(self):
+        if not self.future.done():
+            self.future.set_result(self.frames)
+
+
+class UtteranceQueue(threading.Thread):
+    """
+    Feeds queued utterances to the A2F player back to back.
+
+    The stream stays open while the player still has audio to play, and is
+    closed once it is about to run dry with nothing queued; the next
+    utterance opens a new one. The stream holds the Audio2FaceStream lock, so
+    stream_audio() calls from other threads wait for it. It is not bounded by
+    the push_timeout of the Audio2FaceStream, which applies to single audios.
+    """
+
+    def __init__(
+        self,
+        a2f: Audio2FaceStream,
+        on_frame=None,
+        linger_margin: float = 0.05,
+        settle_time: float = 1.0,
+    ):
+        """
+        :param a2f: An initialized Audio2FaceStream with use_livelink=True.
+        :param on_frame: Callable receiving (utterance_id, frame) for each
+            frame, on the LiveLink receive loop, so it must return quickly.
+        :param linger_margin: The stream is closed when less than this much
+            audio (in seconds) is left to play and the queue is empty.
+        :param settle_time: Max wait in seconds for the last frames of a
+            stream; utterances still missing frames are then resolved with the
+            frames received.
+        """
+        super().__init__(daemon=True, name="UtteranceQueue")
+        if not a2f.use_livelink or a2f.livelink_listener is None:
+            raise ValueError(
+                "UtteranceQueue: Requires use_livelink=True and init_A2F()."
+            )
+        self.a2f = a2f
+        self.on_frame = on_frame
+        self.linger_margin = linger_margin
+        self.settle_time = settle_time
+        self.condition = threading.Condition()
+        self._pending = deque()
+        self._active = deque()  # Pushed utterances still waiting for frames
+        self._stream_open = False
+        self._frame_count = 0  # Frames received in the current stream
+        self._stop_event = threading.Event()
+        self.streams_opened = 0
+        a2f.livelink_listener.add_consumer(self._on_frame)
+        self.start()
+
+    def submit(
+        self, audio_data: np.ndarray, sample_rate: int, utterance_id=None
+    ) -> Future:
+        """
+        Queue an utterance after the previous ones.
+        :param audio_data: Mono audio samples.
+        :param utterance_id: Tag of its frames, generated if None.
+        :return: Future resolved with the list of its frames once they are
+            all received, with an utterance_id attribute.
+        """
+        if utterance_id is None:
+            utterance_id = uuid.uuid4().hex
+        utterance = Utterance(
+            utterance_id, np.asarray(audio_data, dtype=np.float32), sample_rate
+        )
+        with self.condition:
+            # Checked under the condition, so that close() cannot miss it
+            if self._stop_event.is_set():
+                raise RuntimeError("UtteranceQueue: The queue is closed.")
+            self._pending.append(utterance)
+            self.condition.notify_all()
+        return utterance.future
+
+    def close(self, wait: bool = True):
+        """
+        Stop the queue. Queued utterances are played first if wait is True,
+        else they are cancelled.
+        """
+        with self.condition:
+            if not wait:
+                while self._pending:
+                    self._pending.popleft().future.cancel()
+            self._stop_event.set()
+            self.condition.notify_all()
+        self.join()
+        with self.condition:
+            # Left if the thread stopped on an error
+            while self._pending:
+                self._pending.popleft().future.cancel()
+        self.a2f.livelink_listener.remove_consumer(self._on_frame)
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(
+                    lambda: self._pending or self._stop_event.is_set()
+                )
+                if not self._pending:
+                    break
+                # Read now, close(wait=False) may empty the queue meanwhile
+                sample_rate = self._pending[0].sample_rate
+            with self.a2f.lock:
+                self._run_stream(sample_rate)
+
+    def _run_stream(self, sample_rate: int):
+        self.a2f.frames_buffer.flush()
+        with self.condition:
+            self._frame_count = 0
+            self._stream_open = True
+        self.streams_opened += 1
+        error = None
+        try:
+            # Open as long as utterances keep coming, push_timeout is per audio
+            self.a2f._call_push(
+                "PushAudioStream", self._requests(sample_rate), use_push_timeout=False
+            )
+        except Exception as e:
+            logging.error(f"UtteranceQueue: Stream failed: {e}")
+            error = e
+        with self.condition:
+            if error is None:
+                self.condition.wait_for(lambda: not self._active, self.settle_time)
+            self._stream_open = False
+            while self._active:
+                utterance = self._active.popleft()
+                if error is None:
+                    utterance._resolve()
+                elif not utterance.future.done():
+                    utterance.future.set_exception(error)
+        self.a2f.frames_buffer.flush()
+
+    def _next_utterance(self, sample_rate: int, pushed_samples: int, start_time):
+        """
+        Wait for the next utterance of the stream, while the player still has
+        audio to play.
+        :return: The utterance, None to close the stream.
+        """
+        with self.condition:
+            while True:
+                if self._pending:
+                    if self._pending[0].sample_rate != sample_rate:
+                        return None  # Needs a new start marker
+                    utterance = self._pending.popleft()
+                    utterance.start_frame = int(
+                        round(pushed_samples * self.a2f.fps / sample_rate)
+                    )
+                    utterance.end_frame = int(
+                        round(
+                            (pushed_samples + len(utterance.audio_data))
+                            * self.a2f.fps
+                            / sample_rate
+                        )
+                    )
+                    self._active.append(utterance)
+                    self._pop_done()  # Resolves an empty utterance
+                    return utterance
+                if start_time is None or self._stop_event.is_set():
+                    return None
+                left = pushed_samples / sample_rate - (time.monotonic() - start_time)
+                if left <= self.linger_margin:
+                    return None
+                self.condition.wait(left - self.linger_margin)
+
+    def _requests(self, sample_rate: int):
+        """
+        PushAudioStream requests: the start marker, then the chunks of the
+        utterances as they are queued.
+        """
+        yield audio2face_pb2.PushAudioStreamRequest(
+            start_marker=audio2face_pb2.PushAudioRequestStart(
+                samplerate=sample_rate,
+                instance_name=self.a2f.player_instance,
+                block_until_playback_is_finished=True,
+            )
+        )
+        recorder = self.a2f.recorder
+        if recorder is not None:
+            recorder.record_audio_start(sample_rate)
+        chunk_size = self.a2f.chunk_size
+        if self.a2f.chunk_sizer is not None:
+            chunk_size = self.a2f.chunk_sizer.min_chunk_samples(sample_rate)
+        pushed_samples = 0
+        start_time = None
+        while True:
+            utterance = self._next_utterance(sample_rate, pushed_samples, start_time)
+            if utterance is None:
+                return
+            logging.info(f"UtteranceQueue: Pushing utterance {utterance.utterance_id}")
+            audio_data = utterance.audio_data
+            for start in range(0, len(audio_data), chunk_size):
+                chunk = audio_data[start : start + chunk_size]
+                if recorder is not None:
+                    recorder.record_audio(chunk)
+                yield audio2face_pb2.PushAudioStreamRequest(audio_data=chunk.tobytes())
+                if start_time is None:
+                    start_time = time.monotonic()
+            pushed_samples += len(audio_data)
+
+    def _pop_done(self):
+        """
+        Resolve the utterances at the front whose frames were all received.
+        """
+        while self._active and self._active[0].end_frame <= self._frame_count:
+            self._active.popleft()._resolve()
+        self.condition.notify_all()
+
+    def _on_frame(self, frame):
+        with self.condition:
+            if not self._stream_open:
+                return
+            # The frames are kept by their utterance, the buffer of the stream
+            # would only grow until it is closed
+            self.a2f.frames_buffer.remove()
+            index = self._frame_count
+            self._frame_count += 1
+            owner = None
+            for utterance in self._active:
+                if utterance.start_frame <= index < utterance.end_frame:
+                    owner = utterance
+                    utterance.frames.append(frame)
+                    break
+            self._pop_done()
+        if owner is not None and self.on_frame is not None:
+            self.on_frame(owner.utterance_id, frame)
@@ -0,0 +1,268 @@
+import copy
+import logging
+
+import numpy as np
+import soundfile
+
+from audio2face_api.AudioFile import iter_audio_file_chunks
+
+
+def make_neutral_frame(frame):
+    """
+    Build a neutral frame from a received one: every "Weights" list of a dict
+    frame is set to zeros, decoded float32 rows are set to zeros.
+    """
+    if isinstance(frame, np.ndarray):
+        return np.zeros_like(frame)
+    neutral = copy.deepcopy(frame)
+    stack = [neutral]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key, value in node.items():
+                if key == "Weights" and isinstance(value, list):
+                    node[key] = [0.0] * len(value)
+                else:
+                    stack.append(value)
+        elif isinstance(node, list):
+            stack.extend(node)
+    return neutral
+
+
+class TrimPlan:
+    """
+    The regions of an audio signal kept by a SilenceTrimmer, and the mapping
+    between the timeline of the compacted signal and the original one.
+    """
+
+    def __init__(self, segments: np.ndarray, n_samples: int, sample_rate: int):
+        """
+        :param segments: (n, 2) array of the [start, end) sample ranges kept.
+        :param n_samples: Length of the original signal in samples.
+        """
+        self.segments = segments
+        self.n_samples = n_samples
+        self.sample_rate = sample_rate
+        lengths = segments[:, 1] - segments[:, 0]
+        # Position of each segment in the compacted signal
+        self.offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+        self.kept_samples = int(lengths.sum())
+
+    @property
+    def is_identity(self) -> bool:
+        """
+        True if the whole signal is kept.
+        """
+        return self.kept_samples == self.n_samples
+
+    @property
+    def removed_seconds(self) -> float:
+        return (self.n_samples - self.kept_samples) / self.sample_rate
+
+    def apply(self, audio_data: np.ndarray) -> np.ndarray:
+        """
+        Compact a signal by keeping only the planned segments.
+        """
+        if self.is_identity:
+            return audio_data
+        return np.concatenate([audio_data[start:end] for start, end in self.segments])
+
+    def frame_map(self, fps: float, n_frames: int = None) -> np.ndarray:
+        """
+        Index, in the frames generated for the compacted signal, of each frame of
+        the original timeline, -1 for the frames of a removed region.
+        :param n_frames: Number of frames generated for the compacted signal,
+            the indices are clipped to it.
+        """
+        n_original = int(round(self.n_samples / self.sample_rate * fps))
+        positions = np.arange(n_original) * (self.sample_rate / fps)
+        index = np.searchsorted(self.segments[:, 0], positions, side="right") - 1
+        valid = index >= 0
+        index = np.maximum(index, 0)
+        inside = valid & (positions < self.segments[index, 1])
+        compact_positions = self.offsets[index] + positions - self.segments[index, 0]
+        mapping = np.floor(compact_positions / self.sample_rate * fps).astype(np.int64)
+        if n_frames is not None:
+            mapping = np.minimum(mapping, n_frames - 1)
+        mapping[~inside] = -1
+        return mapping
+
+    def restore_frames(self, frames: list, fps: float, neutral_frame=None) -> list:
+        """
+        Place the frames generated for the compacted signal on the original
+        timeline, filling the removed regions with a neutral frame.
+        :param neutral_frame: Frame used for the removed regions, built from the
+            first frame with make_neutral_frame() if None.
+        """
+        if self.is_identity or not frames:
+            return frames
+        if neutral_frame is None:
+            neutral_frame = make_neutral_frame(frames[0])
+        mapping = self.frame_map(fps, len(frames))
+        return [frames[i] if i >= 0 else neutral_frame for i in mapping]
+
+    def restore_weights(self, weights: np.ndarray, fps: float) -> np.ndarray:
+        """
+        Same as restore_frames() for a (n_frames, n_poses) weight matrix, the
+        removed regions get zero weights.
+        """
+        weights = np.asarray(weights, dtype=np.float32)
+        if self.is_identity or len(weights) == 0:
+            return weights
+        mapping = self.frame_map(fps, len(weights))
+        restored = np.zeros((len(mapping), weights.shape[1]), dtype=np.float32)
+        restored[mapping >= 0] = weights[mapping[mapping >= 0]]
+        return restored
+
+
+class SilenceTrimmer:
+    """
+    Energy-based voice activity detection, used to remove the leading, trailing
+    and long internal silences of an audio before inference.
+
+    The signal is split into short frames, and a frame is voiced if its RMS
+    level is above threshold_db relative to the loudest frame (and above
+    floor_db). Silences shorter than min_silence_ms are kept, and keep_silence_ms
+    of silence is kept on each side of the voiced regions so onsets and
+    releases are not cut.
+    """
+
+    def __init__(
+        self,
+        frame_ms: float = 20.0,
+        threshold_db: float = -40.0,
+        floor_db: float = -60.0,
+        min_silence_ms: float = 400.0,
+        keep_silence_ms: float = 150.0,
+    ):
+        """
+        :param frame_ms: Length of the analysis frames in milliseconds.
+        :param threshold_db: Level of a voiced frame, relative to the loudest one.
+        :param floor_db: Absolute level (dBFS) under which a frame is always silent.
+        :param min_silence_ms: Shortest internal silence that is removed.
+        :param keep_silence_ms: Silence kept around each voiced region.
+        """
+        if frame_ms <= 0:
+            raise ValueError("SilenceTrimmer: frame_ms must be positive.")
+        self.frame_ms = frame_ms
+        self.threshold_db = threshold_db
+        self.floor_db = floor_db
+        self.min_silence_ms = min_silence_ms
+        self.keep_silence_ms = keep_silence_ms
+
+    def _frame_length(self, sample_rate: int) -> int:
+        return max(1, int(sample_rate * self.frame_ms / 1000))
+
+    def frame_levels(self, audio_data: np.ndarray, sample_rate: int) -> np.ndarray:
+        """
+        RMS level of each analysis frame, in dBFS.
+        """
+        frame_length = self._frame_length(sample_rate)
+        n_frames = -(-len(audio_data) // frame_length)
+        padded = np.zeros(n_frames * frame_length, dtype=np.float32)
+        padded[: len(audio_data)] = audio_data
+        frames = padded.reshape(n_frames, frame_length)
+        power = np.einsum("ij,ij->i", frames, frames) / frame_length
+        return 10 * np.log10(np.maximum(power, 1e-12))
+
+    def find_segments(
+        self, levels: np.ndarray, n_samples: int, sample_rate: int
+    ) -> np.ndarray:
+        """
+        Sample ranges to keep, from the frame levels of a signal.
+        :return: (n, 2) array of [start, end) sample ranges, empty if the whole
+            signal is silent.
+        """
+        if len(levels) == 0:
+            return np.zeros((0, 2), dtype=np.int64)
+        threshold = max(levels.max() + self.threshold_db, self.floor_db)
+        voiced = levels > threshold
+        if not voiced.any():
+            return np.zeros((0, 2), dtype=np.int64)
+
+        # Grow each voiced region by keep_silence_ms on both sides
+        keep = int(np.ceil(self.keep_silence_ms / self.frame_ms))
+        if keep > 0:
+            voiced_index = np.flatnonzero(voiced)
+            counts = np.zeros(len(voiced) + 1, dtype=np.int64)
+            np.add.at(counts, np.maximum(voiced_index - keep, 0), 1)
+            np.add.at(counts, np.minimum(voiced_index + keep + 1, len(voiced)), -1)
+            voiced = np.cumsum(counts[:-1]) > 0
+
+        # Run boundaries of the kept frames
+        edges = np.diff(np.concatenate(([0], voiced.astype(np.int8), [0])))
+        starts = np.flatnonzero(edges == 1)
+        ends = np.flatnonzero(edges == -1)
+
+        # Merge the regions separated by a short silence
+        min_gap = self.min_silence_ms / self.frame_ms
+        merge = (starts[1:] - ends[:-1]) < min_gap
+        starts = starts[np.concatenate(([True], ~merge))]
+        ends = ends[np.concatenate((~merge, [True]))]
+
+        frame_length = self._frame_length(sample_rate)
+        segments = np.stack([starts, ends], axis=1).astype(np.int64) * frame_length
+        np.minimum(segments, n_samples, out=segments)
+        return segments
+
+    def _make_plan(self, segments: np.ndarray, n_samples: int, sample_rate: int):
+        if len(segments) == 0:
+            logging.warning("SilenceTrimmer: No voice detected, keeping the audio.")
+            segments = np.array([[0, n_samples]], dtype=np.int64)
+        plan = TrimPlan(segments, n_samples, sample_rate)
+        logging.info(
+            f"SilenceTrimmer: Removed {plan.removed_seconds:.2f}s of silence "
+            f"out of {n_samples / sample_rate:.2f}s ({len(segments)} segments)."
+        )
+        return plan
+
+    def plan(self, audio_data: np.ndarray, sample_rate: int) -> TrimPlan:
+        """
+        Find the regions of an in-memory signal to keep.
+        """
+        levels = self.frame_levels(audio_data, sample_rate)
+        segments = self.find_segments(levels, len(audio_data), sample_rate)
+        return self._make_plan(segments, len(audio_data), sample_rate)
+
+    def plan_file(self, file_path: str) -> TrimPlan:
+        """
+        Find the regions of an audio file to keep, reading it block by block.
+        """
+        sample_rate = soundfile.info(file_path).samplerate
+        # Blocks made of whole analysis frames
+        block_size = self._frame_length(sample_rate) * 512
+        levels = []
+        n_samples = 0
+        for chunk in iter_audio_file_chunks(file_path, block_size):
+            levels.append(self.frame_levels(chunk, sample_rate))
+            n_samples += len(chunk)
+        levels = np.concatenate(levels) if levels else np.zeros(0)
+        segments = self.find_segments(levels, n_samples, sample_rate)
+        return self._make_plan(segments, n_samples, sample_rate)
+
+    def trim(self, audio_data: np.ndarray, sample_rate: int):
+        """
+        Remove the silences of a signal.
+        :return: Tuple (compacted signal, TrimPlan).
+        """
+        plan = self.plan(audio_data, sample_rate)
+        return plan.apply(audio_data), plan
+
+
+def iter_trimmed_file_chunks(file_path: str, plan: TrimPlan, chunk_size: int):
+    """
+    Read the regions of an audio file kept by a TrimPlan, as mono float32
+    chunks of at most chunk_size samples.
+    """
+    with soundfile.SoundFile(file_path, mode="r") as audio_file:
+        for start, end in plan.segments:
+            audio_file.seek(int(start))
+            remaining = int(end - start)
+            while remaining > 0:
+                block = audio_file.read(
+                    frames=min(chunk_size, remaining), dtype="float32", always_2d=True
+                )
+                if len(block) == 0:
+                    break
+                remaining -= len(block)
+                yield block.mean(axis=1, dtype=np.float32)
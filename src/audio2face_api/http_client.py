@@ -1,40 +1,154 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+
+from audio2face_api.A2F_CONFIG import DEFAULT_HTTP_TIMEOUT, LONG_HTTP_TIMEOUT
+from audio2face_api.Deadline import current_deadline
+from audio2face_api.Tracing import span
 
 
 class HttpClient:
 
-    def __init__(self, api_url: str = "http://localhost:8011"):
+    def __init__(
+        self,
+        api_url: str = "http://localhost:8011",
+        pool_size: int = 8,
+        timeout: float = DEFAULT_HTTP_TIMEOUT,
+        long_timeout: float = LONG_HTTP_TIMEOUT,
+    ):
         """
         Initializes the HttpClient with the server URL.
 
         :param server_url: The base URL of the server.
+        :param pool_size: Max number of pooled connections, and of requests sent
+            concurrently by post_many().
+        :param timeout: Timeout of each request in seconds, None for no limit.
+        :param long_timeout: Timeout of the long_running requests (exports,
+            emotion key generation), None for no limit.
+            Requests made under a Deadline with a time limit are also bounded
+            by its remaining time.
         """
         self.api_url = api_url
+        self.pool_size = pool_size
+        self.timeout = timeout
+        self.long_timeout = long_timeout
+
+        # Keep-alive connections shared by every request of this client
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_timeout(self, timeout: float = None, long_running: bool = False):
+        """
+        Timeout of a request: the given timeout, else the default of its kind,
+        bounded by the remaining time of the current deadline. Only requests
+        without a limit (long_timeout None) get the whole remaining time.
+        """
+        if timeout is None:
+            timeout = self.long_timeout if long_running else self.timeout
+        deadline = current_deadline()
+        if deadline is not None:
+            deadline.check()
+            return deadline.timeout(timeout)
+        return timeout
+
+    def _send(self, method, url, api_route, timeout, long_running=False, **kwargs):
+        timeout = self._get_timeout(timeout, long_running)
+        try:
+            with span(f"{method.upper()} {api_route}", "http"):
+                return getattr(self.session, method)(url, timeout=timeout, **kwargs)
+        except requests.Timeout as e:
+            deadline = current_deadline()
+            if deadline is not None and deadline.expired:
+                raise TimeoutError(
+                    f"HttpClient: Deadline exceeded during {api_route}."
+                ) from e
+            raise
 
-    def get(self, api_route):
+    def get(self, api_route, timeout: float = None):
         """
         Sends a GET request to the specified URL and returns the JSON response.
 
         :param url: The URL to send the GET request to.
+        :param timeout: Timeout in seconds, defaults to the client timeout.
         :return: JSON response from the server.
         """
         url = f"{self.api_url}/{api_route}"
-        response = requests.get(url)
+        response = self._send("get", url, api_route, timeout)
         response.raise_for_status()  # Raise an exception for HTTP errors
         return response.json()
 
-    def post(self, api_route, payload):
+    def post(
+        self, api_route, payload, timeout: float = None, long_running: bool = False
+    ):
         """
         Sends a POST request to the specified URL with the given payload and returns the JSON response.
 
         :param url: The URL to send the POST request to.
         :param payload: The data to send in the POST request body.
+        :param timeout: Timeout in seconds, defaults to the client timeout.
+        :param long_running: The request takes time proportional to the audio
+            (exports, emotion key generation), defaults to long_timeout.
         :return: JSON response from the server.
         """
         url = f"{self.api_url}/{api_route}"
-        response = requests.post(url, json=payload, headers="")
+        response = self._send(
+            "post", url, api_route, timeout, long_running, json=payload, headers=""
+        )
         response.raise_for_status()  # Raise an exception for HTTP errors
         try:
             return response.json()  # Ensure the response is in JSON format
         except requests.JSONDecodeError:
             raise ValueError("Response is not in JSON format")
+
+    def post_many(self, requests_batch):
+        """
+        Sends independent POST requests concurrently over the connection pool.
+
+        :param requests_batch: List of (api_route, payload) tuples. The requests
+            must not depend on each other, as their order on the server is not
+            guaranteed.
+        :return: List of JSON responses, in the order of the requests.
+        """
+        if len(requests_batch) <= 1:
+            return [self.post(route, payload) for route, payload in requests_batch]
+
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.pool_size, thread_name_prefix="HttpClient"
+                )
+        # The workers run under the deadline of the calling thread
+        deadline = current_deadline()
+        futures = [
+            self._executor.submit(self._post_under, deadline, route, payload)
+            for route, payload in requests_batch
+        ]
+        # Wait for every request before raising the first error, if any
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [future.result() for future in futures]
+
+    def _post_under(self, deadline, api_route, payload):
+        if deadline is None:
+            return self.post(api_route, payload)
+        with deadline:
+            return self.post(api_route, payload)
+
+    def close(self):
+        """
+        Close the pooled connections and the batch workers.
+        """
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+                self._executor = None
+        self.session.close()
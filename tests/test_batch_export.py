@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+from audio2face_api.BatchExport import (
+    Checkpoint,
+    ExportJob,
+    Progress,
+    _check_output_names,
+    read_manifest,
+)
+
+
+def test_read_manifest_formats(tmp_path):
+    audio_dir = tmp_path / "audio"
+    audio_dir.mkdir()
+    for name in ("b.wav", "a.wav", "notes.txt"):
+        (audio_dir / name).write_bytes(b"")
+
+    jobs = read_manifest(str(audio_dir))
+    assert [job.output_name for job in jobs] == ["a", "b"]
+
+    text = tmp_path / "list.txt"
+    text.write_text("# Comment\naudio/a.wav\n\naudio/b.wav\n", encoding="utf-8")
+    jobs = read_manifest(str(text))
+    assert [job.audio_path for job in jobs] == [
+        str(audio_dir / "a.wav"),
+        str(audio_dir / "b.wav"),
+    ]
+
+    jsonl = tmp_path / "list.jsonl"
+    jsonl.write_text(
+        json.dumps({"audio": "audio/a.wav", "output_name": "first"})
+        + "\n"
+        + json.dumps({"audio": "audio/b.wav"})
+        + "\n",
+        encoding="utf-8",
+    )
+    jobs = read_manifest(str(jsonl))
+    assert [job.output_name for job in jobs] == ["first", "b"]
+
+
+def test_duplicate_output_names_are_rejected(tmp_path):
+    jobs = [
+        ExportJob(str(tmp_path / "one" / "take.wav")),
+        ExportJob(str(tmp_path / "two" / "take.wav")),
+    ]
+    with pytest.raises(ValueError):
+        _check_output_names(jobs)
+    _check_output_names([jobs[0], ExportJob(jobs[1].audio_path, "take_2")])
+
+
+def test_checkpoint_resumes_after_a_cut_line(tmp_path):
+    path = str(tmp_path / "checkpoint.jsonl")
+    done_job = ExportJob("a.wav")
+    failed_job = ExportJob("b.wav")
+    checkpoint = Checkpoint(path)
+    checkpoint.record(done_job, "done", seconds=1.0)
+    checkpoint.record(failed_job, "failed", error="boom")
+    checkpoint.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "c.wav|c", "sta')  # Cut by a crash
+
+    checkpoint = Checkpoint(path)
+    assert checkpoint.done == {done_job.key}
+    checkpoint.record(failed_job, "done")
+    checkpoint.close()
+    # The record after the cut line is read back
+    assert Checkpoint(path).done == {done_job.key, failed_job.key}
+
+
+def test_progress_rate_and_eta():
+    progress = Progress(total=50000, window=10)
+    assert "ETA --" in progress.format()
+    for success in (True, True, False):
+        progress.add(success)
+    assert (progress.done, progress.failed) == (2, 1)
+
+    # 0.5 clips/s with 49900 clips left: more than a day
+    progress.rate = lambda: 0.5
+    progress.done, progress.failed = 100, 0
+    assert progress.format() == (
+        "100/50000 done, 0 failed, 30.0 clips/min, ETA 27:43:20"
+    )
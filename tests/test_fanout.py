@@ -0,0 +1,52 @@
+import socket
+import time
+
+import numpy as np
+
+from audio2face_api.FanOut import BinaryFrameDecoder, BinaryFrameEncoder, FrameHub
+from audio2face_api.LiveLink import HEADER_SIZE
+
+
+def _recv_exact(conn: socket.socket, size: int) -> bytes:
+    data = bytearray()
+    while len(data) < size:
+        received = conn.recv(size - len(data))
+        assert received, "Subscriber connection closed"
+        data += received
+    return bytes(data)
+
+
+def _recv_message(conn: socket.socket) -> bytes:
+    size = int.from_bytes(_recv_exact(conn, HEADER_SIZE), "big")
+    return _recv_exact(conn, size)
+
+
+def test_tcp_subscribers_decode_delta_stream():
+    n_frames = 60
+    rng = np.random.default_rng(0)
+    frames = rng.random((n_frames, 52), dtype=np.float32)
+
+    hub = FrameHub()
+    host, port = hub.serve_tcp(
+        encoder_factory=lambda: BinaryFrameEncoder(delta=True, keyframe_interval=30)
+    )
+    clients = [socket.create_connection((host, port), timeout=5) for _ in range(2)]
+    try:
+        deadline = time.monotonic() + 5
+        while len(hub.subscribers) < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert len(hub.subscribers) == 2
+
+        for frame in frames:
+            hub.publish(frame)
+
+        for client in clients:
+            decoder = BinaryFrameDecoder()
+            for expected in frames:
+                row = decoder.decode(_recv_message(client))
+                assert row is not None
+                np.testing.assert_allclose(row, expected, atol=1e-4)
+    finally:
+        for client in clients:
+            client.close()
+        hub.close()
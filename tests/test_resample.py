@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from audio2face_api.Resample import CUBIC, LINEAR, StreamResampler, resample_weights
+
+
+def _weights(n_frames: int = 47, n_poses: int = 5) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.random((n_frames, n_poses), dtype=np.float32)
+
+
+def _stream(resampler: StreamResampler, frames) -> list:
+    out = []
+    for frame in frames:
+        out += resampler.push(frame)
+    return out + resampler.flush()
+
+
+@pytest.mark.parametrize("mode", [LINEAR, CUBIC])
+@pytest.mark.parametrize("src_fps, dst_fps", [(30, 60), (30, 120), (30, 50)])
+def test_stream_matches_whole_clip(mode, src_fps, dst_fps):
+    weights = _weights()
+    expected = resample_weights(weights, src_fps, dst_fps, mode)
+
+    streamed = np.stack(_stream(StreamResampler(src_fps, dst_fps, mode), weights))
+
+    assert streamed.shape == expected.shape
+    np.testing.assert_allclose(streamed, expected, atol=1e-5)
+
+
+def test_stream_of_frame_dicts_keeps_their_fields():
+    weights = _weights(10, 3)
+    names = ["a", "b", "c"]
+    frames = [
+        {"Audio2Face": {"Facial": {"Names": names, "Weights": row.tolist()}}}
+        for row in weights
+    ]
+
+    out = _stream(StreamResampler(30, 60, LINEAR, clip=(0.0, 1.0)), frames)
+
+    assert all(frame["Audio2Face"]["Facial"]["Names"] == names for frame in out)
+    streamed = np.array([frame["Audio2Face"]["Facial"]["Weights"] for frame in out])
+    np.testing.assert_allclose(
+        streamed, resample_weights(weights, 30, 60, LINEAR), atol=1e-5
+    )
+    # The source frames are not modified
+    assert frames[0]["Audio2Face"]["Facial"]["Weights"] == weights[0].tolist()
+
+
+def test_stream_lag():
+    weights = _weights(4, 2)
+    linear = StreamResampler(30, 60, LINEAR)
+    cubic = StreamResampler(30, 60, CUBIC)
+    # Linear outputs the frames between two source frames once the second one
+    # arrives, cubic needs one more source frame
+    assert [len(linear.push(w)) for w in weights] == [0, 2, 2, 2]
+    assert [len(cubic.push(w)) for w in weights] == [0, 0, 2, 2]
@@ -0,0 +1,84 @@
+import threading
+from concurrent.futures import CancelledError
+
+import pytest
+
+from audio2face_api.Scheduler import (
+    PRIORITY_BATCH,
+    PRIORITY_INTERACTIVE,
+    EndpointScheduler,
+    SessionScheduler,
+)
+
+
+def test_sessions_start_by_priority_then_arrival():
+    scheduler = SessionScheduler(max_concurrent=1)
+    release = threading.Event()
+    order = []
+    try:
+        blocker = scheduler.submit(release.wait, 5)
+        futures = [
+            scheduler.submit(order.append, "batch-1", priority=PRIORITY_BATCH),
+            scheduler.submit(order.append, "batch-2", priority=PRIORITY_BATCH),
+            scheduler.submit(order.append, "live-1", priority=PRIORITY_INTERACTIVE),
+            scheduler.submit(order.append, "live-2", priority=PRIORITY_INTERACTIVE),
+        ]
+        assert scheduler.get_stats()["queue_depth"] == 4
+        release.set()
+        blocker.result(5)
+        for future in futures:
+            future.result(5)
+    finally:
+        scheduler.close()
+    assert order == ["live-1", "live-2", "batch-1", "batch-2"]
+    stats = scheduler.get_stats()
+    assert stats["completed"] == 5 and stats["running"] == 0
+
+
+def test_slot_timeout_and_close():
+    scheduler = SessionScheduler(max_concurrent=1)
+    with scheduler.slot():
+        with pytest.raises(TimeoutError):
+            with scheduler.slot(timeout=0.05):
+                pass
+        assert scheduler.get_stats()["queue_depth"] == 0
+
+        queued = scheduler.submit(lambda: None)
+        scheduler.close(wait=False)
+        assert queued.cancelled()
+    with pytest.raises(RuntimeError):
+        scheduler.submit(lambda: None)
+
+
+def test_slot_cancelled_by_close():
+    scheduler = SessionScheduler(max_concurrent=1)
+    errors = []
+
+    def wait_for_slot():
+        try:
+            with scheduler.slot():
+                pass
+        except CancelledError as e:
+            errors.append(e)
+
+    with scheduler.slot():
+        thread = threading.Thread(target=wait_for_slot)
+        thread.start()
+        while scheduler.get_stats()["queue_depth"] == 0:
+            pass
+        scheduler.close(wait=False)
+        thread.join(5)
+    assert len(errors) == 1
+
+
+def test_endpoint_scheduler_prefers_the_resident_scene():
+    scheduler = EndpointScheduler(["http://a", "http://b"])
+    first = scheduler.acquire("/scenes/x.usd")
+    second = scheduler.acquire("/scenes/y.usd")
+    assert first != second
+    scheduler.release(first)
+    scheduler.release(second)
+    # Both endpoints are idle, each job goes where its scene is
+    assert scheduler.acquire("/scenes/y.usd") == second
+    assert scheduler.acquire("/scenes/x.usd") == first
+    assert scheduler.get_stats()["affinity_hits"] == 2
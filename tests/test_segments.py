@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from audio2face_api.Segments import compare_weights, plan_segments, stitch_segments
+
+SAMPLE_RATE = 16000
+FPS = 30
+
+
+def _reference(n_frames: int, n_poses: int = 4) -> np.ndarray:
+    t = np.arange(n_frames)[:, None] / FPS
+    return (0.5 + 0.5 * np.sin(t + np.arange(n_poses))).astype(np.float32)
+
+
+def _segment_results(reference, segments, bias=None):
+    results = []
+    for i, (start, end) in enumerate(segments):
+        first = int(round(start / SAMPLE_RATE * FPS))
+        last = int(round(end / SAMPLE_RATE * FPS))
+        weights = reference[first:last].copy()
+        if bias is not None:
+            weights += bias[i]
+        results.append(weights)
+    return results
+
+
+def _seams(segments):
+    return [
+        (
+            int(round(segments[i + 1][0] / SAMPLE_RATE * FPS)),
+            int(round(segments[i][1] / SAMPLE_RATE * FPS)),
+        )
+        for i in range(len(segments) - 1)
+    ]
+
+
+def test_plan_segments_covers_the_signal():
+    n_samples = 95 * SAMPLE_RATE
+    segments = plan_segments(n_samples, SAMPLE_RATE, 30.0, 1.0)
+    assert segments[0][0] == 0 and segments[-1][1] == n_samples
+    for (_, end), (start, _) in zip(segments, segments[1:]):
+        assert end - start == SAMPLE_RATE  # 1 s of overlap
+    assert plan_segments(SAMPLE_RATE, SAMPLE_RATE, 30.0, 1.0) == [(0, SAMPLE_RATE)]
+    with pytest.raises(ValueError):
+        plan_segments(n_samples, SAMPLE_RATE, 1.0, 1.0)
+
+
+def test_stitching_matching_segments_is_exact():
+    n_samples = 95 * SAMPLE_RATE
+    segments = plan_segments(n_samples, SAMPLE_RATE, 30.0, 1.0)
+    reference = _reference(95 * FPS)
+
+    stitched = stitch_segments(
+        _segment_results(reference, segments), segments, SAMPLE_RATE, FPS, n_samples
+    )
+
+    metrics = compare_weights(stitched, reference, _seams(segments))
+    assert metrics["frame_count_diff"] == 0
+    assert metrics["max_error"] < 1e-5
+    assert metrics["seam_max_error"] < 1e-5
+
+
+def test_seams_crossfade_between_diverging_segments():
+    n_samples = 95 * SAMPLE_RATE
+    segments = plan_segments(n_samples, SAMPLE_RATE, 30.0, 1.0)
+    reference = _reference(95 * FPS)
+    bias = [0.0, 0.1, -0.1, 0.05]
+
+    stitched = stitch_segments(
+        _segment_results(reference, segments, bias),
+        segments,
+        SAMPLE_RATE,
+        FPS,
+        n_samples,
+    )
+    error = stitched - reference
+
+    seams = _seams(segments)
+    for i, (start, end) in enumerate(seams):
+        # Outside the overlaps, each segment is taken as it is
+        next_start = seams[i + 1][0] if i + 1 < len(seams) else len(error)
+        np.testing.assert_allclose(error[end:next_start], bias[i + 1], atol=1e-5)
+        # Over an overlap, the error moves monotonically from one segment to
+        # the next one, without a jump
+        fade = error[start - 1 : end + 1, 0]
+        steps = np.diff(fade) * np.sign(bias[i + 1] - bias[i])
+        assert (steps >= -1e-5).all()
+        assert steps.max() <= abs(bias[i + 1] - bias[i]) / (end - start) + 1e-5
+    np.testing.assert_allclose(error[: seams[0][0]], bias[0], atol=1e-5)
@@ -0,0 +1,42 @@
+import json
+
+import numpy as np
+
+from audio2face_api.Sinks import BackgroundSinkWriter, JsonlSink
+
+
+def _write(sink, frames):
+    writer = BackgroundSinkWriter([sink], flush_interval=0.05)
+    writer.start()
+    for frame in frames:
+        writer.put(frame)
+    writer.stop()
+    writer.join()
+    assert writer.frames_written == len(frames)
+    assert writer.frames_dropped == 0
+
+
+def test_jsonl_sink_writes_one_line_per_frame(tmp_path):
+    path = tmp_path / "frames.jsonl"
+    frames = [
+        {"Audio2Face": {"Facial": {"Weights": [0.1 * i, 0.5]}}} for i in range(10)
+    ]
+    frames.append(np.array([1.0, 2.0], dtype=np.float32))
+    sink = JsonlSink(str(path))
+    _write(sink, frames)
+    sink.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == frames[:-1] + [[1.0, 2.0]]
+
+
+def test_sink_stays_open_for_the_next_writer(tmp_path):
+    path = tmp_path / "frames.jsonl"
+    sink = JsonlSink(str(path))
+    _write(sink, [{"frame": 0}])
+    # A restarted stream writes to the same sink with a new writer
+    _write(sink, [{"frame": 1}])
+    sink.close()
+
+    lines = path.read_text(encoding="utf-8").splitlines()
+    assert [json.loads(line) for line in lines] == [{"frame": 0}, {"frame": 1}]
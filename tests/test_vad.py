@@ -0,0 +1,63 @@
+import numpy as np
+
+from audio2face_api.VAD import SilenceTrimmer
+
+SAMPLE_RATE = 16000
+FPS = 30
+
+
+def _speech_with_pauses():
+    """0.5 s silence, 1 s tone, 1 s silence, 1 s tone, 0.5 s silence."""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    tone = (0.5 * np.sin(2 * np.pi * 220 * t)).astype(np.float32)
+    silence = np.zeros(SAMPLE_RATE // 2, dtype=np.float32)
+    audio = np.concatenate([silence, tone, silence, silence, tone, silence])
+    voiced = [(0.5, 1.5), (2.5, 3.5)]  # In seconds
+    return audio, voiced
+
+
+def test_trim_removes_the_silences():
+    audio, _ = _speech_with_pauses()
+    trimmer = SilenceTrimmer(keep_silence_ms=100, min_silence_ms=400)
+    trimmed, plan = trimmer.trim(audio, SAMPLE_RATE)
+
+    assert len(plan.segments) == 2
+    assert len(trimmed) == plan.kept_samples
+    # Each tone is kept with at most keep_silence_ms of silence on each side
+    assert 2.0 <= plan.kept_samples / SAMPLE_RATE <= 2.0 + 4 * 0.1 + 0.04
+    assert np.isclose(plan.removed_seconds, len(audio) / SAMPLE_RATE - 2.0, atol=0.5)
+
+
+def test_restore_weights_keeps_the_original_timing():
+    audio, voiced = _speech_with_pauses()
+    trimmer = SilenceTrimmer(keep_silence_ms=100, min_silence_ms=400)
+    trimmed, plan = trimmer.trim(audio, SAMPLE_RATE)
+
+    # Frames of the compacted audio, each holding its own time in that audio
+    n_compact = int(round(len(trimmed) / SAMPLE_RATE * FPS))
+    compact_times = (np.arange(n_compact) / FPS).astype(np.float32)
+    weights = np.stack([compact_times, np.ones(n_compact, np.float32)], axis=1)
+
+    restored = plan.restore_weights(weights, FPS)
+
+    assert len(restored) == int(round(len(audio) / SAMPLE_RATE * FPS))
+    for index, (time_compact, active) in enumerate(restored):
+        original_time = index / FPS
+        inside = [
+            (start, end)
+            for start, end in plan.segments / SAMPLE_RATE
+            if start <= original_time < end
+        ]
+        if not inside:
+            # Removed regions are neutral
+            assert active == 0.0 and time_compact == 0.0
+            continue
+        start, _ = inside[0]
+        segment = np.flatnonzero(plan.segments[:, 0] / SAMPLE_RATE == start)[0]
+        expected = plan.offsets[segment] / SAMPLE_RATE + original_time - start
+        assert active == 1.0
+        assert abs(time_compact - expected) <= 1 / FPS + 1e-6
+    # The voiced regions are never neutral
+    for start, end in voiced:
+        frames = restored[int(np.ceil(start * FPS)) : int(end * FPS)]
+        assert (frames[:, 1] == 1.0).all()